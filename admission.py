@@ -0,0 +1,114 @@
+# admission.py
+
+from utils.clock import monotonic
+from collections import deque
+from protocol import Protocol
+from utils.rate_limit import TokenBucketMap
+
+
+class AdmissionController:
+    """
+    Admission control and load shedding for the requests received by an Agent.
+
+    Incoming datagrams are queued by priority (SET before GET before anything else)
+    in a queue with a global depth limit. Optionally, each source host has a token
+    bucket limiting how many requests per second it may get admitted.
+
+    When a datagram cannot be admitted it is "shed": the caller gets it back so that
+    an overload error reply can be sent, telling the manager to back off.
+    """
+
+    PRIORITY_SET = 0
+    PRIORITY_GET = 1
+    PRIORITY_OTHER = 2   # respostas, notificações e PDUs malformados
+
+    # Motivos de descarte (também usados como sufixo dos contadores)
+    SHED_RATE_LIMITED = "rate_limited"
+    SHED_QUEUE_FULL = "queue_full"
+
+    def __init__(self, max_queue_depth: int = 1024, request_rate: float = None,
+                 request_burst: float = None, counters: dict = None, clock=monotonic):
+        """
+        :param max_queue_depth: maximum number of requests waiting to be processed
+        :param request_rate: requests per second admitted from each source host (None = unlimited)
+        :param request_burst: requests a source host may get admitted back-to-back (defaults to request_rate)
+        :param counters: dict where the admission counters are kept (e.g. Agent.counters)
+        :param clock: function returning the current time in seconds (monotonic)
+        """
+        self.max_queue_depth = max_queue_depth
+        self.limiter = None
+        if request_rate is not None:
+            burst = request_burst if request_burst is not None else max(request_rate, 1)
+            self.limiter = TokenBucketMap(request_rate, burst, clock=clock)
+
+        self.queues = (deque(), deque(), deque())
+        self.depth = 0
+
+        self.counters = counters if counters is not None else {}
+        for name in ("admitted", "shed_rate_limited", "shed_queue_full", "queue_high_watermark"):
+            self.counters.setdefault(name, 0)
+
+    def __len__(self) -> int:
+        return self.depth
+
+    def classify(self, data: bytes) -> int:
+        """
+        Returns the priority of a datagram, looking only at its message type byte.
+        """
+        tag_len = len(Protocol.TAG)
+        if not data.startswith(Protocol.TAG):
+            return self.PRIORITY_OTHER
+        msg_type = data[tag_len:tag_len + 1]
+        if msg_type == b'S':
+            return self.PRIORITY_SET
+        if msg_type == b'G':
+            return self.PRIORITY_GET
+        return self.PRIORITY_OTHER
+
+    def offer(self, data: bytes, addr) -> tuple | None:
+        """
+        Tries to enqueue a datagram.
+        :param data: raw datagram received
+        :param addr: (host, port) of the sender
+        :return: None if nothing was shed, otherwise a tuple (data, addr, reason) with the
+                 datagram that was dropped (the incoming one or a lower priority one
+                 evicted to make room).
+        """
+        priority = self.classify(data)
+
+        if self.limiter is not None and priority != self.PRIORITY_OTHER \
+                and not self.limiter.consume(addr[0]):
+            self.counters["shed_rate_limited"] += 1
+            return data, addr, self.SHED_RATE_LIMITED
+
+        shed = None
+        if self.depth >= self.max_queue_depth:
+            # Fila cheia: um pedido mais prioritário expulsa o mais recente de menor prioridade
+            for lower in range(len(self.queues) - 1, priority, -1):
+                if self.queues[lower]:
+                    evicted_data, evicted_addr = self.queues[lower].pop()
+                    self.depth -= 1
+                    shed = (evicted_data, evicted_addr, self.SHED_QUEUE_FULL)
+                    break
+            else:
+                self.counters["shed_queue_full"] += 1
+                return data, addr, self.SHED_QUEUE_FULL
+            self.counters["shed_queue_full"] += 1
+
+        self.queues[priority].append((data, addr))
+        self.depth += 1
+        self.counters["admitted"] += 1
+        if self.depth > self.counters["queue_high_watermark"]:
+            self.counters["queue_high_watermark"] = self.depth
+        return shed
+
+    def pop(self) -> tuple:
+        """
+        Removes and returns the next (data, addr) to process: highest priority first,
+        arrival order within the same priority.
+        """
+        for queue in self.queues:
+            if queue:
+                self.depth -= 1
+                return queue.popleft()
+        raise IndexError("pop from an empty admission queue")
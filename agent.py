@@ -1,12 +1,18 @@
 # agent.py
 
+import os
 import socket
-import uuid
 from protocol import Protocol
+from admission import AdmissionController
+from notifications import SubscriptionManager
 from l_mibvs import MIB
+from mib_store import SnapshotFormatError
 from utils.timestamp_utils import generate_uptime_timestamp
-from exceptions import LSNMPvSError
+from exceptions import LSNMPvSError, DecodingError, OverloadError
 from utils.value_type_utils import get_value_type_from_iid
+from utils.rate_limit import TokenBucketMap
+from utils.clock import monotonic
+from devices.drivers import SensorReader
 
 class Agent:
     """
@@ -15,35 +21,179 @@ class Agent:
     Optionally can send Notification PDUs (traps) to a manager.
     """
 
-    INVALID_MESSAGE_ID = 'invalid\0'
+    INVALID_MESSAGE_ID = 'invalid000000000'
+
+    # Device objects carried by each beacon: id, type, beaconRate and upTime
+    BEACON_IIDS = [[1, 1], [1, 2], [1, 3], [1, 7]]
 
     def __init__(self, host='localhost', port=16100,
-                 sensors=None, actuators=None,
-                 manager_address=None):
+                 sensors=None, actuators=None, device_file=None,
+                 manager_address=None,
+                 error_reply_rate=10.0, error_reply_burst=20,
+                 request_rate=None, request_burst=None, max_queue_depth=1024,
+                 notification_window=0.5, atomic_sets=False,
+                 snapshot_path=None, snapshot_interval=60.0,
+                 journal_path=None, journal_commit_interval=0.05, capture_path=None,
+                 profile_dir="profiles", profile_max_seconds=60.0, sensor_read_workers=8,
+                 shared_mib_name=None, sensor_feed=None, sensor_reader=None, sock=None):
         """
         :param host: UDP address to bind to
         :param port: UDP port to listen on
         :param sensors: list of Sensor instances to register
         :param actuators: list of Actuator instances to register
+        :param device_file: JSONL or CSV file with more devices to register (see devices.loader)
         :param manager_address: tuple (host, port) for sending notifications
+        :param error_reply_rate: error replies per second allowed to each source host
+        :param error_reply_burst: error replies a source host may get back-to-back
+        :param request_rate: requests per second admitted from each source host (None = unlimited)
+        :param request_burst: requests a source host may get admitted back-to-back
+        :param max_queue_depth: maximum number of received requests waiting to be processed
+        :param notification_window: seconds during which fired subscription values are
+                                    coalesced into a single notification
+        :param atomic_sets: if True, a SET PDU is all-or-nothing: when any of its values is
+                            invalid, none is applied
+        :param snapshot_path: file where the MIB is periodically saved; if it exists at startup
+                              the MIB is restored from it (warm restart) and only the sensors /
+                              actuators not in it are registered
+        :param snapshot_interval: seconds between MIB snapshots
+        :param journal_path: file of the SET journal; changes journaled since the last snapshot
+                             are replayed at startup
+        :param journal_commit_interval: maximum seconds a SET waits before being fsync'ed
+        :param capture_path: file where every datagram received is recorded (see capture.py),
+                             to be replayed later with replay.py
+        :param profile_dir: directory where profiling sessions write their results; a session
+                            is started by SETting Device field 1.11 (profiling) to 1 (cProfile),
+                            2 (sampling) or 3 (tracemalloc) and stopped by SETting it to 0
+        :param profile_max_seconds: a profiling session is stopped after this many seconds
+        :param sensor_read_workers: threads reading sensors with a driver (see devices.drivers):
+                                    the sensors of a range GET are read concurrently, each
+                                    within the timeout of its driver
+        :param shared_mib_name: if given, the numeric columns of the MIB are published in a
+                                shared memory segment with this name, for local readers
+                                (see shared_mib.py)
+        :param sensor_feed: file of a sensor feed written by another process (see devices.feed):
+                            the sensors in it read their values from it
+        :param sensor_reader: SensorReader to use instead of one of its own (e.g. one shared
+                              by the agents of an AgentHost, bounding the threads of all)
+        :param sock: socket already bound (or an endpoint of a shared socket, see agent_host.py)
+                     to use instead of binding one to host:port
         """
         self.host = host
         self.port = port
         self.mib = MIB()
+        self.mib.sensor_reader = sensor_reader or SensorReader(sensor_read_workers)
         self.protocol = Protocol()
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock.bind((self.host, self.port))
+        if sock is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind((self.host, self.port))
+        self.sock = sock
 
         # Address of the manager for notifications (optional)
         self.manager_address = manager_address
+        self.atomic_sets = atomic_sets
+
+        # Self-monitoring counters
+        self.counters = {
+            "error_replies": 0,             # error replies sent for undecodable PDUs
+            "suppressed_error_replies": 0,  # error replies dropped by the rate limiter
+        }
+
+        # Pre-encoded error replies (one per error code): only the uptime is patched in.
+        # São iguais em todos os agentes, por isso são partilhados (ver _shared_error_templates)
+        self._error_templates = self._shared_error_templates(self.protocol)
+        self.error_limiter = TokenBucketMap(error_reply_rate, error_reply_burst)
+
+        # Admission control / load shedding of incoming requests
+        self.admission = AdmissionController(
+            max_queue_depth=max_queue_depth,
+            request_rate=request_rate,
+            request_burst=request_burst,
+            counters=self.counters
+        )
+
+        # Change-driven notifications (subscriptions registered with subscribe())
+        self.subscriptions = SubscriptionManager(
+            self.mib, self._notify, coalesce_window=notification_window
+        )
+
+        # Warm restart from the last MIB snapshot, if there is one
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.next_snapshot = monotonic() + snapshot_interval
+        warm = False
+        if snapshot_path and os.path.exists(snapshot_path):
+            try:
+                self.mib.load_snapshot(snapshot_path)
+                warm = True
+            except SnapshotFormatError as e:
+                print(f"Ignoring MIB snapshot: {e}")
 
-        # Register provided sensors and actuators in the MIB
+        # Register provided sensors and actuators in the MIB (those restored from the snapshot
+        # take their place, with the restored state, see MIB.adopt_device)
         if sensors:
-            for s in sensors:
-                self.mib.register_sensor(s)
+            for position, s in enumerate(sensors):
+                if not (warm and self.mib.adopt_device(s, position)):
+                    self.mib.register_sensor(s)
         if actuators:
-            for a in actuators:
-                self.mib.register_actuator(a)
+            for position, a in enumerate(actuators):
+                if not (warm and self.mib.adopt_device(a, position)):
+                    self.mib.register_actuator(a)
+        if device_file:
+            from devices.loader import load_devices   # só importado (csv, json) quando usado
+            load_devices(self.mib, device_file, skip_existing=warm)
+
+        # Sensor values fed by an external producer through a memory-mapped file (optional)
+        self.sensor_feed = None
+        if sensor_feed:
+            from devices.feed import attach_feed
+            self.sensor_feed = attach_feed(self.mib.sensors.values(), sensor_feed).feed
+
+        # Journal of the SETs applied since the last snapshot: replayed, then kept up to date
+        self.journal = None
+        if journal_path:
+            from journal import SetJournal
+            self.journal = SetJournal(journal_path, commit_interval=journal_commit_interval)
+            self._replay_journal()
+            self.mib.add_observer(self.journal.record)
+            self.journal.start()
+
+        # Profiling sessions controlled by Device field 1.11 (see profiling.py)
+        self.profile_dir = profile_dir
+        self.profile_max_seconds = profile_max_seconds
+        self.profiling = None
+        self.stopped_profiles = []   # sessões paradas cujos resultados ainda não foram escritos
+        self.mib.add_observer(self._on_mib_change)
+
+        # BeaconScheduler run by housekeeping() in the thread of listen(), the same one that
+        # applies the SETs of beaconRate (see main.py); an AgentHost drives its own instead
+        self.beacons = None
+
+        # Export of the MIB to shared memory for local readers (optional)
+        self.shared_mib = None
+        if shared_mib_name:
+            from shared_mib import SharedMIBWriter
+            self.shared_mib = SharedMIBWriter(self.mib, shared_mib_name)
+
+        # Capture of the traffic received (optional)
+        self.capture = None
+        if capture_path:
+            from capture import CaptureWriter
+            self.capture = CaptureWriter(capture_path)
+
+    _ERROR_TEMPLATES = None
+
+    @classmethod
+    def _shared_error_templates(cls, protocol: Protocol) -> dict:
+        """
+        Returns the pre-encoded error replies for INVALID_MESSAGE_ID, built by the first
+        agent and shared by every agent of the process.
+        """
+        if cls._ERROR_TEMPLATES is None:
+            cls._ERROR_TEMPLATES = {
+                error.code: protocol.encode_error_template(cls.INVALID_MESSAGE_ID, error.code)
+                for error in LSNMPvSError.__subclasses__()
+            }
+        return cls._ERROR_TEMPLATES
 
     def _map_exception_to_code(self, exc: LSNMPvSError) -> int:
         """
@@ -54,30 +204,240 @@ class Agent:
     def listen(self):
         """
         Main loop: receive requests and send back responses.
+        Every datagram waiting in the socket is drained into the admission queue before
+        the next request is served, so backlogged SETs overtake GETs and excess load is
+        shed with an explicit overload error instead of being silently dropped by the kernel.
         """
         while True:
-            data, addr = self.sock.recvfrom(4096)
-            reply = self.handle_request(data)
+            if len(self.admission) == 0:
+                if self.capture:
+                    self.capture.flush()
+                # Espera por pedidos, acordando a tempo de avaliar as subscrições e gravar a MIB
+                self.sock.settimeout(self._idle_timeout())
+                try:
+                    data, addr = self.sock.recvfrom(4096)
+                    self._admit(data, addr)
+                except (socket.timeout, BlockingIOError):
+                    pass
+            self._drain_socket()
+            self.serve_one()
+            self.housekeeping()
+
+    def serve_one(self) -> bool:
+        """
+        Answers the next admitted request, if there is one.
+        :return: True if a request was served.
+        """
+        if len(self.admission) == 0:
+            return False
+        data, addr = self.admission.pop()
+        reply = self.handle_request(data, addr)
+        if reply:
+            self.sock.sendto(reply, addr)
+        return True
+
+    def housekeeping(self):
+        """
+        Periodic work of the main loop: subscriptions, beacons, MIB snapshots, profiling
+        sessions and the shared memory export (published when the MIB changed).
+        Call it at least every _idle_timeout() seconds when driving the agent from another loop.
+        """
+        self.subscriptions.poll()
+        if self.beacons is not None:
+            self.beacons.run_pending()
+        if self.shared_mib:
+            self.shared_mib.publish()
+        self._save_snapshot_if_due()
+        if self.profiling is not None and self.profiling.expired():
+            self.mib.set_device_value(11, 0)
+        self.write_profiles()
+
+    def write_profiles(self):
+        """
+        Writes the results of the profiling sessions stopped since the last call. Stopping a
+        session happens inside a SET (under the MIB writers' lock), so the slow part is left
+        to the main loop.
+        """
+        while self.stopped_profiles:
+            for path in self.stopped_profiles.pop(0).write():
+                print(f"Profiling results written to {path}")
+
+    def _idle_timeout(self) -> float | None:
+        """
+        Seconds the main loop may block waiting for a request (None = no deadline).
+        """
+        timeout = self.subscriptions.time_until_next()
+        if self.snapshot_path:
+            until_snapshot = max(0.0, self.next_snapshot - monotonic())
+            timeout = until_snapshot if timeout is None else min(timeout, until_snapshot)
+        if self.profiling is not None:
+            until_stop = self.profiling.time_left()
+            timeout = until_stop if timeout is None else min(timeout, until_stop)
+        if self.beacons is not None and len(self.beacons.wheel):
+            tick = self.beacons.wheel.tick
+            timeout = tick if timeout is None else min(timeout, tick)
+        if self.stopped_profiles:
+            timeout = 0.0
+        return timeout
+
+    def _replay_journal(self, batch_size: int = 1024):
+        """
+        Re-applies the journaled SETs on top of the MIB restored from the snapshot.
+        Entries that no longer apply (e.g. unknown actuators) are skipped.
+        """
+        batch = []
+        for iid, value in self.journal.replay():
+            if iid == [1, 11]:
+                continue   # as sessões de profiling não sobrevivem a um restart
+            batch.append((iid, value))
+            if len(batch) >= batch_size:
+                self.mib.set_values_by_iid(batch)
+                batch = []
+        if batch:
+            self.mib.set_values_by_iid(batch)
+
+    def _on_mib_change(self, iid: list[int], value):
+        """
+        MIB observer: starts / stops a profiling session when Device field 1.11 changes.
+        """
+        if iid == [1, 11]:
+            self._set_profiling(value)
+
+    def _set_profiling(self, mode: int):
+        """
+        Stops the running profiling session (its results are written by housekeeping) and
+        starts a new one in the thread calling it (the one running listen()) unless `mode`
+        is 0. If the new session cannot start, field 1.11 goes back to 0.
+        """
+        if self.profiling is not None:
+            session, self.profiling = self.profiling, None
+            session.stop()
+            self.stopped_profiles.append(session)
+        if mode:
+            from profiling import SESSIONS, TracemallocSession
+            options = {"focus": self.handle_request.__func__} if SESSIONS[mode] is TracemallocSession else {}
+            session = SESSIONS[mode](self.profile_dir, self.profile_max_seconds, **options)
+            try:
+                session.start()
+            except Exception as e:   # p.ex. outro profiler já ativo neste processo
+                print(f"Cannot start the profiling session: {e}")
+                self.mib.set_device_value(11, 0)
+                return
+            self.profiling = session
+
+    def _save_snapshot_if_due(self):
+        """
+        Saves the MIB snapshot every snapshot_interval seconds.
+        """
+        if not self.snapshot_path or monotonic() < self.next_snapshot:
+            return
+        with self.mib.write_batch():
+            self.mib.save_snapshot(self.snapshot_path)
+            if self.journal:
+                # tudo o que estava no journal já está no snapshot
+                self.journal.reset()
+        self.next_snapshot = monotonic() + self.snapshot_interval
+
+    def _drain_socket(self):
+        """
+        Reads, without blocking, every datagram already waiting in the socket
+        and passes it through admission control.
+        """
+        blocking = self.sock.getblocking()
+        self.sock.setblocking(False)
+        try:
+            while True:
+                try:
+                    data, addr = self.sock.recvfrom(4096)
+                except (BlockingIOError, InterruptedError):
+                    break
+                self._admit(data, addr)
+        finally:
+            if blocking:
+                self.sock.setblocking(True)
+
+    def _admit(self, data: bytes, addr):
+        """
+        Offers a datagram to the admission queue and answers whatever gets shed.
+        """
+        if self.capture:
+            self.capture.record(data, addr)
+        shed = self.admission.offer(data, addr)
+        if shed is not None:
+            shed_data, shed_addr, _ = shed
+            reply = self._overload_reply(shed_data, shed_addr)
             if reply:
-                self.sock.sendto(reply, addr)
+                self.sock.sendto(reply, shed_addr)
+
+    def _overload_reply(self, data: bytes, addr) -> bytes:
+        """
+        Builds the reply for a request that was shed: an error response with the
+        OverloadError code, carrying the request's Message-Identifier when it can be read.
+        Requests that cannot even be peeked at get the generic error reply.
+        """
+        try:
+            msg_type, message_id = self.protocol.peek_header(data)
+        except (LSNMPvSError, UnicodeDecodeError):
+            return self._error_reply(OverloadError.code, addr)
+        if msg_type not in ('G', 'S'):
+            return b''
+        return self._error_reply(OverloadError.code, addr, message_id)
 
-    def handle_request(self, data: bytes) -> bytes:
+    def _error_reply(self, code: int, addr=None, message_id: str = None) -> bytes:
+        """
+        Builds the error response for an undecodable PDU from its pre-encoded template.
+        Replies to each source host are rate limited; when the limit is exceeded
+        no reply is produced (empty bytes) and the suppression is counted.
+        :param message_id: Message-Identifier to answer to (defaults to INVALID_MESSAGE_ID)
+        """
+        if addr is not None and not self.error_limiter.consume(addr[0]):
+            self.counters["suppressed_error_replies"] += 1
+            return b''
+        if message_id is not None:
+            template = self.protocol.encode_error_template(message_id, code)
+        else:
+            template = self._error_templates.get(code)
+            if template is None:
+                template = self.protocol.encode_error_template(self.INVALID_MESSAGE_ID, code)
+                self._error_templates[code] = template
+        head, tail = template
+        self.counters["error_replies"] += 1
+        return head + self.protocol.encode_timestamp('R', generate_uptime_timestamp(self.mib.start_time)) + tail
+
+    def _encode_value(self, iid: list[int], raw) -> tuple[str, list[str]]:
+        """
+        Converts a raw value read from the MIB into the (val_type, val_parts) pair used in PDUs.
+        """
+        expected = get_value_type_from_iid(iid)
+
+        # Empacota raw → (val_type, val_parts)
+        if expected is int:
+            return 'I', [str(raw)]
+        elif expected is str:
+            return 'S', [raw]
+        elif expected == "timestamp":
+            return 'T', raw.split(':')
+        elif expected == "list":
+            # intervalo/tabela → lista de escalares (pode vir vazia, ex.: histórico)
+            val_type = 'S' if raw and isinstance(raw[0], str) else 'I'
+            return val_type, [str(x) for x in raw]
+        else:
+            raise LSNMPvSError(f"Tipo não suportado: {expected}")
+
+    def handle_request(self, data: bytes, addr=None) -> bytes:
         """
         Decode incoming PDU, perform GET or SET on the MIB, and return a Response PDU.
+        :param data: raw datagram received
+        :param addr: (host, port) of the sender, used to rate limit error replies
         """
         try:
             decoded = self.protocol.decode_message(data)
         except LSNMPvSError as e:
             # Malformed PDU: return a generic error response
-            code = self._map_exception_to_code(e)
-            return self.protocol.encode_message(
-                msg_type='R',
-                timestamp=generate_uptime_timestamp(self.mib.start_time),
-                message_id=self.INVALID_MESSAGE_ID,
-                iid_list=[],
-                value_list=[],
-                error_list=[code]
-            )
+            return self._error_reply(self._map_exception_to_code(e), addr)
+        except UnicodeDecodeError:
+            # Non-ASCII bytes in a field: treated as any other decoding error
+            return self._error_reply(DecodingError.code, addr)
 
         msg_type = decoded['type']
         message_id = decoded['message_id']
@@ -88,28 +448,13 @@ class Agent:
         # Handle GET requests
         if msg_type == 'G':
             print(f"Received GET request with message_id: {message_id}, iid_list: {iid_list}")
+            # todos os IIDs do pedido são lidos da mesma versão da MIB, mesmo com SETs concorrentes
+            snapshot = self.mib.snapshot()
             for iid in iid_list:
                 try:
-                    print("MIB STATUS: ", self.mib.get_mib_state())
-                    raw = self.mib.get_value_by_iid(iid)
+                    raw = self.mib.get_value_by_iid(iid, snapshot)
                     print(f"RAW value for IID {iid}: {raw}")
-                    expected = get_value_type_from_iid(iid)
-
-                    # Empacota raw → (val_type, val_parts)
-                    if expected is int:
-                        val_type, val_parts = 'I', [str(raw)]
-                    elif expected is str:
-                        val_type, val_parts = 'S', [raw]
-                    elif expected == "timestamp":
-                        val_type, val_parts = 'T', raw.split(':')
-                    elif expected == "list":
-                        # intervalo/tabela → lista de escalares
-                        first = raw[0]
-                        val_type = 'I' if isinstance(first, int) else 'S'
-                        val_parts = [str(x) for x in raw]
-                    else:
-                        raise LSNMPvSError(f"Tipo não suportado: {expected}")
-
+                    val_type, val_parts = self._encode_value(iid, raw)
                     values.append((val_type, val_parts))
                     errors.append(0)
 
@@ -130,16 +475,13 @@ class Agent:
         # Handle SET requests
         elif msg_type == 'S':
             new_values = decoded.get('value_list', [])
-            for iid, (val_type, val_parts) in zip(iid_list, new_values):
-                raw_value = val_parts[0] if val_parts else None
-                print(f"raw_value for IID {iid}: {raw_value}")
-                try:
-                    self.mib.set_value_by_iid(iid, raw_value)
-                    values.append((val_type, val_parts))
-                    errors.append(0)
-                except LSNMPvSError as e:
-                    values.append((val_type, val_parts))
-                    errors.append(self._map_exception_to_code(e))
+            pairs = [(iid, val_parts[0] if val_parts else None)
+                     for iid, (_, val_parts) in zip(iid_list, new_values)]
+            # validados todos primeiro e aplicados num único commit (um timestamp, uma versão)
+            results = self.mib.set_values_by_iid(pairs, atomic=self.atomic_sets)
+            for (val_type, val_parts), error in zip(new_values, results):
+                values.append((val_type, val_parts))
+                errors.append(0 if error is None else self._map_exception_to_code(error))
             print(f"Received SET request with message_id: {message_id}, iid_list: {iid_list}, values: {values}")
             return self.protocol.encode_message(
                 msg_type='R',
@@ -153,14 +495,60 @@ class Agent:
         # Other message types are currently ignored
         return b''
 
-    def send_notification(self, iid_list, value_list, error_list):
+    def subscribe(self, iids, condition, value, address=None, sample_interval=1.0) -> int:
         """
-        Optionally send a Notification (trap) PDU to the manager via broadcast/unicast.
+        Registers a manager's interest in a list of IIDs: a Notification PDU is sent
+        only when the condition ("delta", "threshold" or "period") fires.
+        :param address: (host, port) of the manager; defaults to manager_address
+        :return: subscription identifier, to be used with unsubscribe()
+        """
+        address = address or self.manager_address
+        if not address:
+            raise ValueError("No address to send notifications to.")
+        return self.subscriptions.subscribe(iids, condition, value, address, sample_interval)
+
+    def unsubscribe(self, sub_id: int):
+        """
+        Cancels a subscription made with subscribe().
+        """
+        self.subscriptions.unsubscribe(sub_id)
+
+    def _notify(self, address, iid_list, raw_values):
+        """
+        Sends one notification with the values fired by the subscriptions of `address`.
+        """
+        values = []
+        errors = []
+        for iid, raw in zip(iid_list, raw_values):
+            try:
+                values.append(self._encode_value(iid, raw))
+                errors.append(0)
+            except LSNMPvSError as e:
+                values.append(('I', ['0']))
+                errors.append(self._map_exception_to_code(e))
+        self.send_notification(iid_list, values, errors, address)
+
+    def send_beacon(self):
+        """
+        Sends a beacon: a Notification PDU announcing the device to the manager.
+        Beacons are sent every device_info["beaconRate"] seconds by a BeaconScheduler.
         """
         if not self.manager_address:
             return
+        iid_list = [list(iid) for iid in self.BEACON_IIDS]
+        raw_values = [self.mib.get_value_by_iid(iid) for iid in iid_list]
+        self._notify(self.manager_address, iid_list, raw_values)
+
+    def send_notification(self, iid_list, value_list, error_list, address=None):
+        """
+        Optionally send a Notification (trap) PDU to the manager via broadcast/unicast.
+        :param address: (host, port) to send to; defaults to manager_address
+        """
+        address = address or self.manager_address
+        if not address:
+            return
         # Generate a unique Message-Identifier for the notification
-        notif_id = uuid.uuid4().hex[:15] + '\0'
+        notif_id = os.urandom(8).hex()
         pdu = self.protocol.encode_message(
             msg_type='N',
             timestamp=generate_uptime_timestamp(self.mib.start_time),
@@ -169,4 +557,4 @@ class Agent:
             value_list=value_list,
             error_list=error_list
         )
-        self.sock.sendto(pdu, self.manager_address)
+        self.sock.sendto(pdu, address)
@@ -0,0 +1,352 @@
+# agent_host.py
+"""
+Runs many agents in one process, all served by a single thread over a selectors loop.
+
+Two ways of giving each agent an address:
+    one socket per agent   every agent binds its own port (base_port, base_port + 1, ...);
+                           simple, but each agent costs a file descriptor
+    shared socket          a single socket bound to one port on every local address; each
+                           agent has its own IP (e.g. 127.1.0.1, 127.1.0.2, ... on loopback)
+                           and datagrams are demultiplexed by their destination address
+                           (IP_PKTINFO, Linux only), so thousands of agents need one descriptor
+
+The devices of the agents created by spawn() are copies of the same templates, sharing
+their id / type strings; the pre-encoded error replies are shared by all agents (see Agent).
+
+Uso: python agent_host.py --agents 1000 [--base-port 20000 | --shared-port 16100 --network 127.1.0.0]
+                          [--sensors 2] [--actuators 2] [--manager host:port]
+"""
+
+import argparse
+import heapq
+import ipaddress
+import selectors
+import socket
+import struct
+import sys
+import threading
+import time
+from utils.clock import monotonic
+from agent import Agent
+from devices.drivers import SensorReader
+from devices.sensor import Sensor
+from devices.actuator import Actuator
+
+# IP_PKTINFO não é exposto pelo módulo socket em todas as versões (8 em Linux)
+IP_PKTINFO = getattr(socket, "IP_PKTINFO", 8)
+# struct in_pktinfo: índice da interface, endereço local (origem ao enviar), endereço de destino
+IN_PKTINFO = struct.Struct("=i4s4s")
+
+
+class SharedSocket:
+    """
+    UDP socket bound to one port on every local address, shared by agents with different IPs.
+    """
+
+    def __init__(self, port: int, bind: str = "0.0.0.0"):
+        """
+        :param port: UDP port of every agent (0 = any free port)
+        :param bind: local address to bind to (every address by default)
+        """
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.IPPROTO_IP, IP_PKTINFO, 1)
+        self.sock.bind((bind, port))
+        self.sock.setblocking(False)
+        self.port = self.sock.getsockname()[1]
+        self.agents = {}   # IP local (str) -> agente
+        self.unknown_destination = 0
+
+    def endpoint(self, ip: str) -> "Endpoint":
+        return Endpoint(self, ip)
+
+    def receive(self):
+        """
+        Iterates over the datagrams waiting in the socket as (data, source address, destination IP).
+        """
+        ancillary_size = socket.CMSG_SPACE(IN_PKTINFO.size)
+        while True:
+            try:
+                data, ancillary, _, addr = self.sock.recvmsg(65536, ancillary_size)
+            except (BlockingIOError, InterruptedError):
+                return
+            destination = None
+            for level, kind, value in ancillary:
+                if level == socket.IPPROTO_IP and kind == IP_PKTINFO:
+                    destination = socket.inet_ntoa(IN_PKTINFO.unpack(value[:IN_PKTINFO.size])[2])
+            yield data, addr, destination
+
+    def sendto(self, data: bytes, addr, source_ip: str):
+        pktinfo = IN_PKTINFO.pack(0, socket.inet_aton(source_ip), bytes(4))
+        return self.sock.sendmsg([data], [(socket.IPPROTO_IP, IP_PKTINFO, pktinfo)], 0, addr)
+
+    def close(self):
+        self.sock.close()
+
+
+class Endpoint:
+    """
+    The part of a SharedSocket used by one agent: behaves like the agent's own socket for
+    sending (replies, beacons, notifications leave from the agent's IP), while receiving is
+    done by the AgentHost, which hands each datagram to the agent it is addressed to.
+    """
+    __slots__ = ("shared", "ip")
+
+    def __init__(self, shared: SharedSocket, ip: str):
+        self.shared = shared
+        self.ip = ip
+
+    def sendto(self, data: bytes, addr):
+        return self.shared.sendto(data, addr, self.ip)
+
+    def recvfrom(self, bufsize: int):
+        raise BlockingIOError   # os datagramas chegam pelo AgentHost
+
+    def getsockname(self) -> tuple[str, int]:
+        return self.ip, self.shared.port
+
+    def getblocking(self) -> bool:
+        return False
+
+    def setblocking(self, flag: bool):
+        pass
+
+    def settimeout(self, value):
+        pass
+
+    def close(self):
+        self.shared.agents.pop(self.ip, None)
+
+
+def clone_devices(templates) -> list:
+    """
+    Copies sensor / actuator templates for one agent: each agent gets its own devices (their
+    values change independently), sharing the id and type strings (and sensor drivers) of
+    the templates.
+    """
+    clones = []
+    for template in templates:
+        clone = type(template)(template.id, template.type, template.min_value, template.max_value)
+        if getattr(template, "driver", None) is not None:
+            clone.driver = template.driver
+        clones.append(clone)
+    return clones
+
+
+class AgentHost:
+    """
+    Serves any number of agents from one thread: a selectors loop waits on every agent
+    socket (or shared socket) at once, and the periodic work of each agent (subscriptions,
+    snapshots, profiling) is scheduled in a heap by the deadline the agent reports, so idle
+    agents cost nothing per loop iteration.
+    """
+
+    def __init__(self, beacons=None, clock=monotonic, sensor_read_workers=8):
+        """
+        :param beacons: BeaconScheduler sending the beacons of the agents (optional)
+        :param clock: function returning the current time in seconds (monotonic)
+        :param sensor_read_workers: threads of the SensorReader shared by the agents created
+                                    by spawn() (see devices.drivers)
+        """
+        self.selector = selectors.DefaultSelector()
+        self.beacons = beacons
+        self.clock = clock
+        self.agents = []
+        self.shared_sockets = []
+        self.watched = []     # outros sockets do loop (ver watch)
+        self.timers = []      # heap de (instante, id(agent), agent) do próximo housekeeping
+        self.due = {}         # id(agent) -> instante em timers ainda válido
+        self.requests_served = 0
+        # um só leitor (e pool de threads) para os sensores com driver de todos os agentes
+        self.sensor_reader = SensorReader(sensor_read_workers)
+
+    def __len__(self) -> int:
+        return len(self.agents)
+
+    def add(self, agent: Agent):
+        """
+        Starts serving an agent. Its socket is made non-blocking (and must not be used by
+        agent.listen() from then on).
+        """
+        if isinstance(agent.sock, Endpoint):
+            shared = agent.sock.shared
+            if shared not in self.shared_sockets:
+                self.shared_sockets.append(shared)
+                self.selector.register(shared.sock, selectors.EVENT_READ, shared)
+            shared.agents[agent.sock.ip] = agent
+        else:
+            agent.sock.setblocking(False)
+            self.selector.register(agent.sock, selectors.EVENT_READ, agent)
+        self.agents.append(agent)
+        if self.beacons is not None and agent.manager_address:
+            self.beacons.add_agent(agent)
+        self._schedule(agent)
+
+    def watch(self, sock, callback):
+        """
+        Calls callback() from the loop whenever `sock` is readable, e.g. the ManagerClient of
+        proxies (see proxy.py). The socket is still closed by its owner.
+        """
+        self.selector.register(sock, selectors.EVENT_READ, callback)
+        self.watched.append(sock)
+
+    def spawn(self, count: int, sensors=(), actuators=(), host: str = "127.0.0.1", base_port: int = 0,
+              shared_port: int = None, network: str = "127.1.0.0", **options) -> list[Agent]:
+        """
+        Creates and adds `count` agents with copies of the same devices.
+        :param sensors: Sensor templates (see clone_devices)
+        :param actuators: Actuator templates
+        :param host: address of the agents with one socket each
+        :param base_port: port of the first agent with one socket each (0 = any free port each)
+        :param shared_port: if given, agents share one socket on this port, agent i getting the
+                            IP network + i (network must be routed locally, e.g. in 127.0.0.0/8)
+        :param options: other Agent arguments (manager_address, notification_window, ...);
+                        the agents share the host's sensor_reader unless one is given
+        :return: The agents created.
+        """
+        options.setdefault("sensor_reader", self.sensor_reader)
+        shared = SharedSocket(shared_port) if shared_port is not None else None
+        first_ip = ipaddress.IPv4Address(network)
+        agents = []
+        for i in range(count):
+            if shared is not None:
+                ip = str(first_ip + len(self.agents) + 1)
+                agent = Agent(host=ip, port=shared.port, sock=shared.endpoint(ip), sensors=clone_devices(sensors),
+                              actuators=clone_devices(actuators), **options)
+            else:
+                port = base_port + i if base_port else 0
+                agent = Agent(host=host, port=port, sensors=clone_devices(sensors),
+                              actuators=clone_devices(actuators), **options)
+            agent.mib.device_info["id"] = f"agent{len(self.agents) + 1}"
+            self.add(agent)
+            agents.append(agent)
+        return agents
+
+    def _schedule(self, agent: Agent):
+        """
+        Schedules the next housekeeping of an agent, if it needs one.
+        """
+        timeout = agent._idle_timeout()
+        if timeout is None:
+            return
+        key = id(agent)
+        due = self.clock() + timeout
+        if key in self.due and self.due[key] <= due:
+            return
+        self.due[key] = due
+        heapq.heappush(self.timers, (due, key, agent))
+
+    def _serve(self, agent: Agent):
+        while agent.serve_one():
+            self.requests_served += 1
+        agent.housekeeping()
+        self._schedule(agent)
+
+    def run_once(self, timeout: float = None) -> int:
+        """
+        Waits for requests (at most `timeout` seconds, or until the next agent deadline)
+        and serves every agent that received any.
+        :return: Number of requests served.
+        """
+        served = self.requests_served
+        wait = timeout
+        if self.timers:
+            until_timer = max(0.0, self.timers[0][0] - self.clock())
+            wait = until_timer if wait is None else min(wait, until_timer)
+        if self.beacons is not None and len(self.beacons):
+            wait = self.beacons.wheel.tick if wait is None else min(wait, self.beacons.wheel.tick)
+
+        active = {}
+        for key, _ in self.selector.select(wait):
+            if isinstance(key.data, SharedSocket):
+                shared = key.data
+                for data, addr, destination in shared.receive():
+                    agent = shared.agents.get(destination)
+                    if agent is None:
+                        shared.unknown_destination += 1
+                        continue
+                    agent._admit(data, addr)
+                    active[id(agent)] = agent
+            elif isinstance(key.data, Agent):
+                key.data._drain_socket()
+                active[id(key.data)] = key.data
+            else:
+                key.data()
+        for agent in active.values():
+            self._serve(agent)
+
+        now = self.clock()
+        while self.timers and self.timers[0][0] <= now:
+            due, key, agent = heapq.heappop(self.timers)
+            if self.due.get(key) != due:
+                continue   # reagendado entretanto
+            del self.due[key]
+            self._serve(agent)
+        if self.beacons is not None:
+            self.beacons.run_pending()
+        return self.requests_served - served
+
+    def serve_forever(self, stop_event: threading.Event = None, poll_interval: float = 0.5):
+        """
+        Runs the loop until `stop_event` is set (checked at least every poll_interval seconds).
+        """
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            self.run_once(poll_interval)
+
+    def close(self):
+        for agent in self.agents:
+            if not isinstance(agent.sock, Endpoint):
+                self.selector.unregister(agent.sock)
+            agent.sock.close()
+        for shared in self.shared_sockets:
+            self.selector.unregister(shared.sock)
+            shared.close()
+        for sock in self.watched:
+            self.selector.unregister(sock)
+        self.selector.close()
+        self.sensor_reader.close()
+        self.agents = []
+        self.shared_sockets = []
+        self.watched = []
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--agents", type=int, default=1000)
+    parser.add_argument("--host", default="127.0.0.1", help="address of the agents with one socket each")
+    parser.add_argument("--base-port", type=int, default=20000, help="port of the first agent (one socket each)")
+    parser.add_argument("--shared-port", type=int, help="share one socket on this port (Linux)")
+    parser.add_argument("--network", default="127.1.0.0", help="agent i gets this address + i (shared socket)")
+    parser.add_argument("--sensors", type=int, default=2, help="sensors per agent")
+    parser.add_argument("--actuators", type=int, default=2, help="actuators per agent")
+    parser.add_argument("--manager", help="host:port of the manager receiving beacons")
+    args = parser.parse_args(argv)
+
+    beacons = None
+    manager = None
+    if args.manager:
+        from scheduler import BeaconScheduler
+        host, _, port = args.manager.rpartition(":")
+        manager = (host or "localhost", int(port))
+        beacons = BeaconScheduler()
+    sensors = [Sensor(f"s{i + 1}", "temperature", 0, 40) for i in range(args.sensors)]
+    actuators = [Actuator(f"a{i + 1}", "light", 0, 1) for i in range(args.actuators)]
+
+    agent_host = AgentHost(beacons)
+    start = time.perf_counter()
+    agents = agent_host.spawn(args.agents, sensors, actuators, host=args.host, base_port=args.base_port,
+                              shared_port=args.shared_port, network=args.network, manager_address=manager)
+    first, last = agents[0].sock.getsockname(), agents[-1].sock.getsockname()
+    print(f"{len(agents)} agents ({first[0]}:{first[1]} ... {last[0]}:{last[1]}) "
+          f"started in {time.perf_counter() - start:.2f} s", file=sys.stderr)
+    try:
+        agent_host.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        agent_host.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+# benchmarks/bench_agent_host.py
+"""
+Many agents in one process (AgentHost): spawn time, memory per agent and GET latency.
+
+N agents are spawned with copies of the same devices, either with one socket each or
+sharing one socket (--shared, one loopback address per agent, Linux only). Memory per agent
+is measured twice: Python allocations still held after spawning (tracemalloc) and the growth
+of the process maximum resident set size. The host then serves the agents from one thread
+while loadgen sends GETs round-robin to all of them.
+
+Uso: python benchmarks/bench_agent_host.py [--agents 10000] [--shared] [--rate 2000] [--duration 3]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import contextlib
+import resource
+import threading
+import time
+import tracemalloc
+from agent_host import AgentHost
+from devices.sensor import Sensor
+from devices.actuator import Actuator
+from loadgen import run, PERCENTILES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--agents", type=int, default=10000)
+    parser.add_argument("--shared", action="store_true", help="one shared socket (127.1.0.0/16)")
+    parser.add_argument("--sensors", type=int, default=2)
+    parser.add_argument("--actuators", type=int, default=2)
+    parser.add_argument("--rate", type=float, default=2000.0, help="GET requests per second")
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--no-tracemalloc", action="store_true", help="skip the Python allocation count")
+    args = parser.parse_args()
+
+    limit = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+    if not args.shared and args.agents + 64 > limit:
+        print(f"{args.agents} sockets exceed the file descriptor limit ({limit}): "
+              "raise it (ulimit -n) or use --shared", file=sys.stderr)
+        return 2
+
+    sensors = [Sensor(f"s{i + 1}", "temperature", 0, 40) for i in range(args.sensors)]
+    actuators = [Actuator(f"a{i + 1}", "light", 0, 1) for i in range(args.actuators)]
+    out = sys.stdout
+    # os agentes imprimem cada pedido: a saída é descartada enquanto são medidos
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        host = AgentHost()
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if not args.no_tracemalloc:
+            tracemalloc.start()
+        start = time.perf_counter()
+        agents = host.spawn(args.agents, sensors, actuators, shared_port=0 if args.shared else None)
+        spawn_time = time.perf_counter() - start
+        traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        tracemalloc.stop()
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        stop = threading.Event()
+        server = threading.Thread(target=host.serve_forever, args=(stop, 0.1), daemon=True)
+        server.start()
+        result = run([agent.sock.getsockname() for agent in agents], args.rate, args.duration,
+                     [[1, 1]], timeout=2.0)
+        stop.set()
+        server.join()
+        host.close()
+
+    mode = "one shared socket" if args.shared else "one socket per agent"
+    print(f"{args.agents:,} agents ({mode}), spawned in {spawn_time:.2f} s "
+          f"({spawn_time / args.agents * 1e6:.0f} us/agent)", file=out)
+    if traced is not None:
+        print(f"  python allocations  {traced / args.agents / 1024:8.2f} KiB/agent", file=out)
+    print(f"  max RSS growth      {(rss_after - rss_before) / args.agents:8.2f} KiB/agent", file=out)
+    counters, histogram = result["counters"], result["histogram"]
+    sent = counters.get("sent", 0)
+    print(f"  GETs: sent {sent:,} at {sent / result['duration']:,.0f}/s, received {counters.get('received', 0):,}, "
+          f"lost {counters.get('lost', 0):,}", file=out)
+    if histogram.count:
+        print("  latency: " + ", ".join(f"p{p:g} {histogram.percentile(p) / 1000:.2f} ms"
+                                        for p in PERCENTILES), file=out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+# benchmarks/bench_beacons.py
+"""
+CPU cost of driving the beacons of many agents with a single BeaconScheduler.
+
+Agents are lightweight stand-ins (no sockets): the benchmark measures scheduling
+overhead only. Virtual time is advanced tick by tick as a real loop would, and the
+CPU time spent is compared with the simulated duration.
+
+Uso: python benchmarks/bench_beacons.py [--agents 10000] [--rate 60] [--seconds 600]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import random
+import time
+from scheduler import BeaconScheduler
+
+
+class VirtualClock:
+    def __init__(self): self.now = 0.0
+    def __call__(self): return self.now
+
+
+class StubMIB:
+    def __init__(self, rate):
+        self.device_info = {"beaconRate": rate}
+    def add_observer(self, callback): pass
+
+
+class StubAgent:
+    def __init__(self, rate):
+        self.mib = StubMIB(rate)
+        self.beacons = 0
+    def send_beacon(self): self.beacons += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--agents", type=int, default=10000)
+    parser.add_argument("--rate", type=int, default=60, help="beaconRate of every agent (s)")
+    parser.add_argument("--seconds", type=int, default=600, help="simulated duration (s)")
+    parser.add_argument("--tick", type=float, default=0.1)
+    args = parser.parse_args()
+
+    clock = VirtualClock()
+    scheduler = BeaconScheduler(tick=args.tick, clock=clock, rng=random.Random(0))
+    agents = [StubAgent(args.rate) for _ in range(args.agents)]
+
+    cpu_start = time.process_time()
+    for a in agents:
+        scheduler.add_agent(a)
+    setup = time.process_time() - cpu_start
+
+    cpu_start = time.process_time()
+    steps = int(args.seconds / args.tick)
+    per_tick = 0
+    for _ in range(steps):
+        clock.now += args.tick
+        per_tick = max(per_tick, scheduler.run_pending())
+    cpu = time.process_time() - cpu_start
+
+    print(f"agents:                {args.agents}")
+    print(f"setup CPU:             {setup * 1000:.1f} ms")
+    print(f"simulated:             {args.seconds} s ({steps} ticks)")
+    print(f"beacons sent:          {scheduler.beacons_sent}")
+    print(f"max beacons per tick:  {per_tick}")
+    print(f"scheduler CPU:         {cpu:.3f} s ({cpu / args.seconds * 100:.2f}% of one core)")
+    print(f"CPU per beacon:        {cpu / max(scheduler.beacons_sent, 1) * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
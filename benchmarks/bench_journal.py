@@ -0,0 +1,68 @@
+# benchmarks/bench_journal.py
+"""
+SET throughput of a MIB with and without the SET journal, for several commit intervals.
+
+SETs go through MIB.set_value_by_iid, as the agent applies them, while the journal's
+background flusher group-commits them (as in an Agent with journal_path).
+
+Uso: python benchmarks/bench_journal.py [--actuators 100] [--sets 50000] [--repeat 3]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import contextlib
+import tempfile
+import time
+from l_mibvs import MIB
+from devices.actuator import Actuator
+from journal import SetJournal
+
+
+def run(args, commit_interval=None) -> tuple[float, int]:
+    mib = MIB()
+    for i in range(args.actuators):
+        mib.register_actuator(Actuator(f"a{i}", "light", 0, 100))
+    journal = None
+    directory = tempfile.mkdtemp()
+    if commit_interval is not None:
+        journal = SetJournal(os.path.join(directory, "set.journal"), commit_interval=commit_interval)
+        mib.add_observer(journal.record)
+        journal.start()
+
+    start = time.perf_counter()
+    for n in range(args.sets):
+        mib.set_value_by_iid([3, 3, n % args.actuators + 1], str(n % 100))
+    if journal:
+        journal.close()
+    elapsed = time.perf_counter() - start
+    commits = journal.commits if journal else 0
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+    return args.sets / elapsed, commits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--actuators", type=int, default=100)
+    parser.add_argument("--sets", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per configuration (best is kept)")
+    args = parser.parse_args()
+
+    def best(interval=None):
+        return max((run(args, interval) for _ in range(args.repeat)), key=lambda r: r[0])
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        baseline, _ = best()
+        results = [(interval, *best(interval)) for interval in (0.0, 0.01, 0.05)]
+
+    print(f"{'no journal':>16}: {baseline:10.0f} SET/s")
+    for interval, rate, commits in results:
+        print(f"{f'commit {interval * 1000:.0f} ms':>16}: {rate:10.0f} SET/s  "
+              f"({(1 - rate / baseline) * 100:5.1f}% slower, {commits} fsyncs)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_loader.py
+"""
+Time and memory of registering devices from a JSONL/CSV file with devices.loader.
+
+A file with --devices definitions (half sensors, half actuators) is generated in a
+temporary directory and loaded into an empty MIB. With --memory, tracemalloc reports
+the loader's transient memory: the peak minus what the MIB keeps once loading ends,
+which should depend on --batch-size, not on the number of devices.
+
+Uso: python benchmarks/bench_loader.py [--devices 1000000] [--format jsonl|csv] [--batch-size 10000] [--memory]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import contextlib
+import gc
+import json
+import tempfile
+import time
+import tracemalloc
+from l_mibvs import MIB
+from devices.loader import load_devices
+
+
+def write_file(path: str, n: int, fmt: str):
+    with open(path, "w") as f:
+        if fmt == "csv":
+            f.write("kind,id,type,min_value,max_value\n")
+        for i in range(n):
+            kind = "sensor" if i % 2 == 0 else "actuator"
+            if fmt == "csv":
+                f.write(f"{kind},{kind}-{i},light,0,100\n")
+            else:
+                f.write(json.dumps({"kind": kind, "id": f"{kind}-{i}", "type": "light",
+                                    "min_value": 0, "max_value": 100}) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--devices", type=int, default=1000000)
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--memory", action="store_true", help="trace memory (slower)")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), f"devices.{args.format}")
+    write_file(path, args.devices, args.format)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        mib = MIB()
+        if args.memory:
+            tracemalloc.start()
+        gc.disable()   # como no arranque do agente (main.py)
+        start = time.perf_counter()
+        registered = load_devices(mib, path, batch_size=args.batch_size)
+        elapsed = time.perf_counter() - start
+        gc.enable()
+        if args.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    size = os.path.getsize(path)
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+    print(f"file:        {size / 1e6:.1f} MB ({args.format})")
+    print(f"registered:  {registered} devices in {elapsed:.2f} s ({registered / elapsed:.0f} devices/s)")
+    if args.memory:
+        print(f"MIB memory:  {current / 1e6:.1f} MB")
+        print(f"transient:   {(peak - current) / 1e6:.1f} MB above the loaded MIB")
+
+
+if __name__ == "__main__":
+    main()
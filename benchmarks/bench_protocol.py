@@ -0,0 +1,68 @@
+# benchmarks/bench_protocol.py
+"""
+Micro-benchmark of Protocol.decode_message for valid and malformed PDUs.
+
+Malformed traffic must be rejected at least as fast as valid traffic is decoded,
+otherwise a flood of garbage datagrams can starve real requests.
+
+Uso: python benchmarks/bench_protocol.py [-n ITERATIONS]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import timeit
+from protocol import Protocol
+from exceptions import LSNMPvSError
+
+TAG = Protocol.TAG
+TIMESTAMP = b"T\0" + b"7\0" + b"01\0" + b"01\0" + b"2024\0" + b"12\0" + b"00\0" + b"00\0" + b"000\0"
+MESSAGE_ID = b"abcdefgh12345678\0"
+IID = b"D\0" + b"3\0" + b"2\0" + b"3\0" + b"1\0"
+
+
+def build_cases() -> dict:
+    """
+    Builds the PDUs used in the benchmark, keyed by a short description.
+    """
+    valid_get = TAG + b"G" + TIMESTAMP + MESSAGE_ID + b"1\0" + IID + b"0\0" + b"0\0"
+    valid_get_32 = TAG + b"G" + TIMESTAMP + MESSAGE_ID + b"32\0" + IID * 32 + b"0\0" + b"0\0"
+    return {
+        "valid GET (1 IID)": valid_get,
+        "valid GET (32 IIDs)": valid_get_32,
+        "bad TAG": b"x" * len(valid_get),
+        "bad message type": TAG + b"X" + valid_get[len(TAG) + 1:],
+        "truncated": valid_get[:len(TAG) + 4],
+        "huge IID count": TAG + b"G" + TIMESTAMP + MESSAGE_ID + b"999999999\0" + IID + b"0\0" + b"0\0",
+        "huge IID count, padded": TAG + b"G" + TIMESTAMP + MESSAGE_ID + b"400\0" + IID * 399 + b"D\0",
+    }
+
+
+def bench_case(protocol: Protocol, raw: bytes, iterations: int) -> float:
+    """
+    Decodes the same PDU repeatedly, swallowing protocol errors.
+    :return: Decodes per second.
+    """
+    def run():
+        try:
+            protocol.decode_message(raw)
+        except LSNMPvSError:
+            pass
+    elapsed = timeit.timeit(run, number=iterations)
+    return iterations / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    protocol = Protocol()
+    for name, raw in build_cases().items():
+        rate = bench_case(protocol, raw, args.iterations)
+        print(f"{name:<28} {len(raw):>6} bytes  {rate:>12,.0f} decodes/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# benchmarks/bench_proxy.py
+"""
+Load on a downstream agent polled by many managers, directly and through a caching proxy.
+
+--managers clients poll the same IIDs of one agent, one request after the other for
+--duration seconds, first straight at the agent and then through a ProxyAgent with each
+--ttl. Reported: requests answered, requests that reached the agent and mean latency.
+
+Uso: python benchmarks/bench_proxy.py [--managers 50] [--duration 2] [--ttl 0.1 --ttl 1]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import contextlib
+import threading
+import time
+from agent import Agent
+from devices.sensor import Sensor
+from devices.actuator import Actuator
+from manager import ManagerClient
+from proxy import ProxyAgent
+
+IIDS = [[2, 3, 0, 0], [3, 3, 0, 0], [1, 7]]
+
+
+class CountingAgent(Agent):
+    """
+    Agent counting the requests it answers.
+    """
+
+    def handle_request(self, data: bytes, addr=None) -> bytes:
+        self.counters["requests"] = self.counters.get("requests", 0) + 1
+        return super().handle_request(data, addr)
+
+
+def poll(address: tuple, managers: list, duration: float) -> tuple[int, float]:
+    """
+    Managers take turns sending GETs to `address` for `duration` seconds.
+    :return: (requests answered, mean latency in ms)
+    """
+    answered = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        for client in managers:
+            client.get(address, IIDS)
+            answered += 1
+    return answered, (time.perf_counter() - start) / answered * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--managers", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=2.0)
+    parser.add_argument("--ttl", type=float, action="append", help="seconds (repeatable; default 0.1 and 1)")
+    args = parser.parse_args()
+
+    out = sys.stdout
+    # os agentes imprimem cada pedido: a saída é descartada enquanto é medido
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        downstream = CountingAgent(host="127.0.0.1", port=0,
+                                   sensors=[Sensor(f"s{i + 1}", "temperature", 0, 40) for i in range(8)],
+                                   actuators=[Actuator(f"a{i + 1}", "light", 0, 1) for i in range(8)])
+        threading.Thread(target=downstream.listen, daemon=True).start()
+        managers = [ManagerClient(bind=("127.0.0.1", 0)) for _ in range(args.managers)]
+
+        rows = []
+        answered, latency = poll(downstream.sock.getsockname(), managers, args.duration)
+        rows.append(("direct", answered, downstream.counters.pop("requests"), latency))
+        for ttl in args.ttl or [0.1, 1.0]:
+            proxy = ProxyAgent(downstream.sock.getsockname(), ttl=ttl, host="127.0.0.1", port=0)
+            threading.Thread(target=proxy.listen, daemon=True).start()
+            answered, latency = poll(proxy.sock.getsockname(), managers, args.duration)
+            rows.append((f"proxy, ttl {ttl:g} s", answered, downstream.counters.pop("requests"), latency))
+
+    print(f"{args.managers} managers polling {IIDS} for {args.duration:g} s", file=out)
+    print(f"  {'':<18} {'answered':>9} {'at agent':>9} {'agent/s':>8} {'ms':>6}", file=out)
+    for name, answered, at_agent, latency in rows:
+        print(f"  {name:<18} {answered:9} {at_agent:9} {at_agent / args.duration:8.1f} {latency:6.2f}", file=out)
+
+
+if __name__ == "__main__":
+    main()
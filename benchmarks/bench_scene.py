@@ -0,0 +1,47 @@
+# benchmarks/bench_scene.py
+"""
+Cost of a "scene change" SET touching many actuators: one set_value_by_iid per IID
+versus a single batched set_values_by_iid commit.
+
+Uso: python benchmarks/bench_scene.py [--actuators 500] [--repeat 20]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import contextlib
+import time
+from l_mibvs import MIB
+from devices.actuator import Actuator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--actuators", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        mib = MIB()
+        for i in range(args.actuators):
+            mib.register_actuator(Actuator(f"a{i}", "light", 0, 100))
+
+        results = {}
+        for mode in ("one by one", "batched"):
+            start = time.perf_counter()
+            for r in range(args.repeat):
+                pairs = [([3, 3, i], str(r % 100)) for i in range(1, args.actuators + 1)]
+                if mode == "batched":
+                    mib.set_values_by_iid(pairs)
+                else:
+                    for iid, value in pairs:
+                        mib.set_value_by_iid(iid, value)
+            results[mode] = (time.perf_counter() - start) / args.repeat
+
+    for mode, elapsed in results.items():
+        print(f"{mode:>10}: {elapsed * 1000:8.2f} ms per scene of {args.actuators} actuators")
+
+
+if __name__ == "__main__":
+    main()
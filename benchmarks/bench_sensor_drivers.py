@@ -0,0 +1,71 @@
+# benchmarks/bench_sensor_drivers.py
+"""
+Range GETs of sensors behind slow drivers: serial reads vs. concurrent reads (SensorReader).
+
+Every sensor has a SimulatedLatencyDriver (or its asyncio version) taking --latency seconds
+per read. A GET of the whole status column ([2, 3, 0, 0]) is answered by an agent reading
+the sensors one after the other (no reader) and by agents whose SensorReader has 1, 4, 16
+and 64 threads.
+
+Uso: python benchmarks/bench_sensor_drivers.py [--sensors 32] [--latency 0.01] [--rounds 5]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import contextlib
+import statistics
+import time
+from agent import Agent
+from devices.sensor import Sensor
+from devices.drivers import SensorReader, SimulatedLatencyDriver, AsyncSimulatedLatencyDriver
+from protocol import Protocol
+from utils.timestamp_utils import generate_date_timestamp
+
+
+def measure(agent: Agent, request: bytes, rounds: int) -> float:
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        agent.handle_request(request)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sensors", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.01, help="seconds per sensor read")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        request = Protocol().encode_message("G", generate_date_timestamp(), "bench00000000001", [[2, 3, 0, 0]])
+    cases = [("serial", SimulatedLatencyDriver, None)]
+    cases += [(f"pool {n} threads", SimulatedLatencyDriver, n) for n in (1, 4, 16, 64)]
+    cases += [("asyncio", AsyncSimulatedLatencyDriver, 1)]
+
+    print(f"GET [2, 3, 0, 0] of {args.sensors} sensors, {args.latency * 1000:g} ms per read")
+    print(f"  {'':<18} {'median ms':>10} {'speedup':>8}")
+    serial = None
+    for name, driver_class, workers in cases:
+        sensors = [Sensor(f"s{i + 1}", "temperature", 0, 40) for i in range(args.sensors)]
+        driver = driver_class(latency=args.latency, timeout=60.0)
+        for sensor in sensors:
+            sensor.driver = driver
+        # o agente imprime cada pedido: a saída é descartada enquanto é medido
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            agent = Agent(host="127.0.0.1", port=0, sensors=sensors)
+            agent.mib.sensor_reader = SensorReader(workers) if workers else None
+            agent.handle_request(request)   # aquecimento (cria os threads)
+            elapsed = measure(agent, request, args.rounds)
+        if agent.mib.sensor_reader is not None:
+            agent.mib.sensor_reader.close()
+        agent.sock.close()
+        serial = serial or elapsed
+        print(f"  {name:<18} {elapsed * 1000:10.1f} {serial / elapsed:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
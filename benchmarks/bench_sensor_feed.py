@@ -0,0 +1,97 @@
+# benchmarks/bench_sensor_feed.py
+"""
+Sensor values from a memory-mapped feed written by another process.
+
+A producer process writes samples of --sensors sensors into a feed (devices.feed) as fast
+as it can, while the agent answers GETs of the whole status column ([2, 3, 0, 0]) served
+from it. Reported: the producer's write rate, the cost of reading one sample, and the GET
+against the same GET of sensors without driver (random values).
+
+Uso: python benchmarks/bench_sensor_feed.py [--sensors 32] [--rounds 2000]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import contextlib
+import statistics
+import subprocess
+import tempfile
+import time
+from agent import Agent
+from devices.sensor import Sensor
+from devices.feed import SensorFeedWriter
+from protocol import Protocol
+from utils.timestamp_utils import generate_date_timestamp
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Produtor: escreve amostras de todos os sensores até ser terminado; imprime as amostras por segundo
+PRODUCER = """
+import sys, time
+sys.path.insert(0, sys.argv[1])
+from devices.feed import SensorFeedWriter
+writer = SensorFeedWriter.attach(sys.argv[2])
+slots = range(len(writer.slots))
+count, start = 0, time.perf_counter()
+try:
+    while True:
+        for slot in slots:
+            writer.write_slot(slot, count % 41, count)
+        count += len(slots)
+except KeyboardInterrupt:
+    print(count / (time.perf_counter() - start))
+"""
+
+
+def per_call_us(function, rounds: int) -> float:
+    samples = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            function()
+        samples.append((time.perf_counter() - start) / rounds * 1e6)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sensors", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    ids = [f"s{i + 1}" for i in range(args.sensors)]
+    with tempfile.TemporaryDirectory() as directory, \
+            open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        path = os.path.join(directory, "sensors.feed")
+        SensorFeedWriter(path, ids).close()
+        producer = subprocess.Popen([sys.executable, "-c", PRODUCER, ROOT, path], stdout=subprocess.PIPE, text=True)
+        request = Protocol().encode_message("G", generate_date_timestamp(), "bench00000000001", [[2, 3, 0, 0]])
+
+        # o agente imprime cada pedido: a saída é descartada enquanto é medido
+        fed = Agent(host="127.0.0.1", port=0, sensors=[Sensor(i, "temperature", 0, 40) for i in ids],
+                    sensor_feed=path)
+        plain = Agent(host="127.0.0.1", port=0, sensors=[Sensor(i, "temperature", 0, 40) for i in ids])
+        while fed.sensor_feed.count(ids[-1]) == 0:
+            time.sleep(0.01)
+        latest = per_call_us(lambda: fed.sensor_feed.latest(ids[0]), args.rounds)
+        get_fed = per_call_us(lambda: fed.handle_request(request), max(1, args.rounds // 10))
+        get_plain = per_call_us(lambda: plain.handle_request(request), max(1, args.rounds // 10))
+
+        producer.send_signal(2)   # SIGINT: o produtor imprime o seu ritmo
+        rate = float(producer.communicate()[0])
+        for agent in (fed, plain):
+            agent.mib.sensor_reader.close()
+            agent.sock.close()
+        fed.sensor_feed.close()
+
+    print(f"{args.sensors} sensors")
+    print(f"  producer writes                        {rate:12,.0f} samples/s")
+    print(f"  SensorFeed.latest()                    {latest:12.2f} us")
+    print(f"  GET [2, 3, 0, 0], values from the feed {get_fed:12.1f} us")
+    print(f"  GET [2, 3, 0, 0], random values        {get_plain:12.1f} us")
+
+
+if __name__ == "__main__":
+    main()
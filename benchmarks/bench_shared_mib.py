@@ -0,0 +1,82 @@
+# benchmarks/bench_shared_mib.py
+"""
+Reading the actuator status column: GET over UDP loopback vs. the shared memory export.
+
+An agent with --devices actuators (and as many sensors) serves GETs of [3, 3, 0, 0] from a
+thread while a local client reads the same column (a) with a GET round trip and (b) with a
+SharedMIBReader, and (c) reads every exported value at once. The cost of a publication on
+the agent side is measured too.
+
+Uso: python benchmarks/bench_shared_mib.py [--devices 100] [--reads 2000]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import contextlib
+import socket
+import statistics
+import threading
+import time
+from agent import Agent
+from devices.sensor import Sensor
+from devices.actuator import Actuator
+from protocol import Protocol
+from shared_mib import SharedMIBReader
+from utils.timestamp_utils import generate_date_timestamp
+
+
+def per_call_us(function, reads: int) -> float:
+    samples = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(reads):
+            function()
+        samples.append((time.perf_counter() - start) / reads * 1e6)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--devices", type=int, default=100, help="sensors and actuators of the agent")
+    parser.add_argument("--reads", type=int, default=2000)
+    args = parser.parse_args()
+
+    out = sys.stdout
+    # o agente imprime cada pedido: a saída é descartada enquanto é medido
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        agent = Agent(host="127.0.0.1", port=0,
+                      sensors=[Sensor(f"s{i}", "temperature", 0, 40) for i in range(args.devices)],
+                      actuators=[Actuator(f"a{i}", "light", 0, 1) for i in range(args.devices)],
+                      shared_mib_name=f"lsnmp-bench-{os.getpid()}")
+        threading.Thread(target=agent.listen, daemon=True).start()
+        protocol = Protocol()
+        request = protocol.encode_message("G", generate_date_timestamp(), "bench00000000001", [[3, 3, 0, 0]])
+        client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        client.connect(agent.sock.getsockname())
+        client.settimeout(2.0)
+
+        def udp_get():
+            client.send(request)
+            return protocol.decode_message(client.recv(65536))["value_list"][0][1]
+
+        reader = SharedMIBReader(agent.shared_mib.name)
+        assert [int(v) for v in udp_get()] == reader.actuator_status()
+        udp = per_call_us(udp_get, args.reads)
+        column = per_call_us(reader.actuator_status, args.reads)
+        full = per_call_us(reader.read, max(1, args.reads // 10))
+        publish = per_call_us(lambda: agent.shared_mib.publish(force=True), max(1, args.reads // 10))
+        reader.close()
+        client.close()
+        agent.shared_mib.close()
+
+    print(f"{args.devices} sensors + {args.devices} actuators", file=out)
+    print(f"  GET [3, 3, 0, 0] over UDP loopback   {udp:10.1f} us", file=out)
+    print(f"  shared memory, actuator column      {column:10.1f} us  ({udp / column:,.0f}x)", file=out)
+    print(f"  shared memory, every value          {full:10.1f} us", file=out)
+    print(f"  agent: one publication               {publish:10.1f} us", file=out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# benchmarks/bench_snapshot.py
+"""
+GET throughput of snapshot (MVCC) reads versus a single shared lock, under concurrent SETs.
+
+Reader threads answer multi-IID GETs over the actuators table while writer threads keep
+changing actuator values. In "lock" mode every GET and SET takes the same lock (the
+simplest way of getting consistent multi-IID reads); in "snapshot" mode writers only
+exclude each other and readers answer each GET from MIB.snapshot(). Every GET checks
+that all the IIDs it read belong to the same version (all statuses equal).
+
+Uso: python benchmarks/bench_snapshot.py [--actuators 1000] [--readers 4] [--writers 1] [--seconds 3]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import contextlib
+import threading
+import time
+from l_mibvs import MIB
+from devices.actuator import Actuator
+
+
+def run(mode: str, args) -> tuple[int, int, int]:
+    mib = MIB()
+    for i in range(args.actuators):
+        mib.register_actuator(Actuator(f"a{i}", "light", 0, 1_000_000))
+    n = args.actuators
+    iids = [[3, 3, 1], [3, 3, n // 2 or 1], [3, 3, n]]
+    lock = threading.Lock()
+    stop = threading.Event()
+    gets = [0] * args.readers
+    sets = [0] * args.writers
+    torn = [0] * args.readers
+
+    def reader(k):
+        while not stop.is_set():
+            if mode == "lock":
+                with lock:
+                    values = [mib.get_value_by_iid(iid) for iid in iids]
+            else:
+                snapshot = mib.snapshot()
+                values = [mib.get_value_by_iid(iid, snapshot) for iid in iids]
+            if len(set(values)) != 1:
+                torn[k] += 1
+            gets[k] += 1
+
+    def writer(k):
+        value = 0
+        while not stop.is_set():
+            value += 1
+            # um "SET" que altera os três atuadores lidos pelos GETs
+            if mode == "lock":
+                with lock:
+                    for iid in iids:
+                        mib.set_value_by_iid(iid, str(value))
+            else:
+                with mib.write_batch():
+                    for iid in iids:
+                        mib.set_value_by_iid(iid, str(value))
+            sets[k] += 1
+
+    threads = [threading.Thread(target=reader, args=(k,)) for k in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(k,)) for k in range(args.writers)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return sum(gets), sum(sets), sum(torn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--actuators", type=int, default=1000)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=1)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    for mode in ("lock", "snapshot"):
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            gets, sets, torn = run(mode, args)
+        print(f"{mode:>8}: {gets / args.seconds:10.0f} GET/s  {sets / args.seconds:8.0f} SET/s  torn reads: {torn}")
+
+
+if __name__ == "__main__":
+    main()
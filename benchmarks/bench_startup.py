@@ -0,0 +1,88 @@
+# benchmarks/bench_startup.py
+"""
+Cold start time of the agent: `python main.py --check`, in fresh interpreters.
+
+Each run starts a new interpreter that builds the agent from a configuration and exits.
+The wall time of the whole process and the startup time reported by main.py are
+collected, along with the modules that take longest to import (python -X importtime).
+Exits with status 1 when the median wall time exceeds --budget-ms, so it can guard
+startup regressions in CI.
+
+Bytecode is cached in a temporary directory (PYTHONPYCACHEPREFIX), as in a deployed
+agent; use --no-bytecode-cache to include compiling every module.
+
+Uso: python benchmarks/bench_startup.py [--runs 10] [--budget-ms 300] [--top 10]
+"""
+import sys
+import os
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import tempfile
+import time
+
+
+def run_once(env: dict, config: str) -> tuple[float, float]:
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "main.py"), "--check", "--config", config],
+                            env=env, cwd=ROOT, capture_output=True, text=True, check=True)
+    wall = (time.perf_counter() - start) * 1000
+    reported = float(re.search(r"started in ([\d.]+) ms", result.stderr).group(1))
+    return wall, reported
+
+
+def import_times(env: dict, top: int) -> list[tuple[int, str]]:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import agent"],
+                            env=env, cwd=ROOT, capture_output=True, text=True, check=True)
+    times = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)", line)
+        if match and len(match.group(3)) <= 3:   # módulos importados diretamente por agent
+            times.append((int(match.group(2)), match.group(4)))
+    return sorted(times, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=300.0, help="maximum median wall time")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to show")
+    parser.add_argument("--no-bytecode-cache", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    config = os.path.join(workdir, "agent.json")
+    with open(config, "w") as f:
+        json.dump({"port": 0}, f)
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    if args.no_bytecode_cache:
+        env["PYTHONDONTWRITEBYTECODE"] = "1"
+    else:
+        env["PYTHONPYCACHEPREFIX"] = os.path.join(workdir, "pycache")
+        run_once(env, config)   # preenche a cache de bytecode
+
+    results = [run_once(env, config) for _ in range(args.runs)]
+    wall = statistics.median(r[0] for r in results)
+    reported = statistics.median(r[1] for r in results)
+
+    print(f"runs:                {args.runs}")
+    print(f"process wall time:   {wall:.1f} ms (median, min {min(r[0] for r in results):.1f} ms)")
+    print(f"startup in main.py:  {reported:.1f} ms (median)")
+    print(f"slowest imports of agent (cumulative):")
+    for micros, module in import_times(env, args.top):
+        print(f"  {micros / 1000:8.1f} ms  {module}")
+
+    if wall > args.budget_ms:
+        print(f"FAIL: median startup {wall:.1f} ms exceeds the budget of {args.budget_ms:.0f} ms")
+        sys.exit(1)
+    print(f"OK: within the budget of {args.budget_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
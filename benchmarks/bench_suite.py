@@ -0,0 +1,204 @@
+# benchmarks/bench_suite.py
+"""
+Benchmark suite of the protocol, the MIB and the agent, with JSON results and baseline comparison.
+
+Cases:
+    protocol.decode / protocol.encode   GET PDUs carrying 1, 8, 32 and 128 IIDs
+    mib.get.<kind>.<devices>            MIB.get_value_by_iid with 10, 1k and 100k sensors and
+                                        actuators; kind is scalar (a Device field), indexed
+                                        (one row) or range (32 rows)
+    agent.get / agent.set               request / response round trips over loopback UDP
+
+Every case is run in several rounds; the time per operation of the best round is the
+result (the least disturbed by the rest of the machine), the median of the rounds is kept
+to show the noise. Results are written as JSON; with --baseline, each case is compared with
+the same case of a previous result file and the script exits with status 1 when any case got
+slower by more than --threshold.
+
+Uso: python benchmarks/bench_suite.py [--output results.json] [--baseline baseline.json]
+                                      [--threshold 0.10] [--filter mib.] [--quick]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import contextlib
+import json
+import platform
+import socket
+import statistics
+import threading
+import time
+import timeit
+from protocol import Protocol
+from l_mibvs import MIB
+from agent import Agent
+from devices.sensor import Sensor
+from devices.actuator import Actuator
+
+PDU_SIZES = (1, 8, 32, 128)
+MIB_SIZES = (10, 1_000, 100_000)
+RANGE_ROWS = 32
+MESSAGE_ID = "bench00000000000"
+DATE_TIMESTAMP = "01:01:2024:12:00:00:000"   # pedidos (G / S)
+UPTIME_TIMESTAMP = "0:00:00:01:000"          # respostas (R)
+
+
+def measure(func, rounds: int, min_time: float) -> dict:
+    """
+    Times `func` in `rounds` rounds, each calling it enough times to last about `min_time` seconds.
+    :return: Result of the case: best and median microseconds per operation, operations per second.
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    per_op = [t / number * 1e6 for t in timer.repeat(repeat=rounds, number=number)]
+    best = min(per_op)
+    return {"us_per_op": round(best, 3), "median_us_per_op": round(statistics.median(per_op), 3),
+            "ops_per_sec": round(1e6 / best, 1), "iterations": number * rounds}
+
+
+def get_pdu(protocol: Protocol, n_iids: int) -> bytes:
+    iids = [[3, 3, i % 8 + 1] for i in range(n_iids)]
+    return protocol.encode_message("G", DATE_TIMESTAMP, MESSAGE_ID, iids)
+
+
+def protocol_cases(args):
+    protocol = Protocol()
+    for n in PDU_SIZES:
+        raw = get_pdu(protocol, n)
+        iids = [[3, 3, i % 8 + 1] for i in range(n)]
+        values, errors = [("I", ["0"])] * n, [0] * n
+        yield f"protocol.decode.{n}", len(raw), lambda raw=raw: protocol.decode_message(raw)
+        yield f"protocol.encode.{n}", len(raw), lambda iids=iids, values=values, errors=errors: \
+            protocol.encode_message("R", UPTIME_TIMESTAMP, MESSAGE_ID, iids, values, errors)
+
+
+def build_mib(devices: int) -> MIB:
+    """
+    MIB with `devices` sensors and `devices` actuators.
+    """
+    mib = MIB()
+    mib.register_many([Sensor(f"s{i}", "temperature", 0, 100) for i in range(devices)])
+    mib.register_many([Actuator(f"a{i}", "light", 0, 1) for i in range(devices)])
+    return mib
+
+
+def mib_cases(args):
+    for n in MIB_SIZES:
+        mib = build_mib(n)
+        middle = n // 2 + 1
+        last = min(n, middle + RANGE_ROWS - 1)
+        # os GETs do agente leem sempre através de um snapshot da MIB
+        iids = {
+            "scalar": [1, 1],
+            "indexed": [3, 3, middle],
+            "range": [3, 3, last - RANGE_ROWS + 1 if last >= RANGE_ROWS else 1, last],
+            "sensor.indexed": [2, 4, middle],
+            "sensor.range": [2, 4, last - RANGE_ROWS + 1 if last >= RANGE_ROWS else 1, last],
+        }
+        for kind, iid in iids.items():
+            yield f"mib.get.{kind}.{n}", n, lambda mib=mib, iid=iid: mib.get_value_by_iid(iid, mib.snapshot())
+
+
+@contextlib.contextmanager
+def running_agent(devices: int):
+    """
+    Agent with `devices` sensors and actuators listening on a loopback port, served by a daemon thread.
+    """
+    agent = Agent(host="127.0.0.1", port=0,
+                  sensors=[Sensor(f"s{i}", "temperature", 0, 100) for i in range(devices)],
+                  actuators=[Actuator(f"a{i}", "light", 0, 1) for i in range(devices)],
+                  error_reply_rate=1e9, error_reply_burst=10**9)
+    threading.Thread(target=agent.listen, daemon=True).start()
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    client.settimeout(5.0)
+    client.connect(agent.sock.getsockname())
+    try:
+        yield client
+    finally:
+        client.close()
+
+
+def agent_cases(args):
+    protocol = Protocol()
+    get = get_pdu(protocol, 1)
+    set_ = protocol.encode_message("S", DATE_TIMESTAMP, MESSAGE_ID, [[3, 3, 1]], [("I", ["1"])])
+    with running_agent(10) as client:
+        def round_trip(raw):
+            client.send(raw)
+            client.recv(4096)
+        yield "agent.get.10", len(get), lambda: round_trip(get)
+        yield "agent.set.10", len(set_), lambda: round_trip(set_)
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Compares the cases present in both result files.
+    :return: Names of the cases slower than the baseline by more than `threshold` (a fraction).
+    """
+    regressions = []
+    old_cases = baseline.get("cases", {})
+    print(f"\n{'case':<28} {'baseline':>12} {'now':>12} {'change':>8}")
+    for name, case in results["cases"].items():
+        old = old_cases.get(name)
+        if old is None:
+            print(f"{name:<28} {'-':>12} {case['us_per_op']:>10.2f}us {'new':>8}")
+            continue
+        change = case["us_per_op"] / old["us_per_op"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<28} {old['us_per_op']:>10.2f}us {case['us_per_op']:>10.2f}us {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default="bench_results.json", help="JSON file for the results")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="slowdown (fraction of the baseline) reported as a regression")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this text")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="shorter rounds (noisier)")
+    args = parser.parse_args()
+    min_time = 0.05 if args.quick else 0.2
+
+    results = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "cases": {},
+    }
+    for group in (protocol_cases, mib_cases, agent_cases):
+        # a MIB e o agente imprimem cada operação: a saída é descartada enquanto são medidos
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            measured = {}
+            # cada caso é medido assim que é gerado, enquanto o seu MIB / agente existe
+            for name, size, func in group(args):
+                if args.filter in name:
+                    measured[name] = dict(measure(func, args.rounds, min_time), size=size)
+        for name, case in measured.items():
+            print(f"{name:<28} {case['us_per_op']:>10.2f} us/op  {case['ops_per_sec']:>12,.0f} ops/s")
+        results["cases"].update(measured)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than the baseline by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
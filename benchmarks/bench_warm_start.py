@@ -0,0 +1,68 @@
+# benchmarks/bench_warm_start.py
+"""
+Cold start (registering every device) versus warm start (loading a MIB snapshot).
+
+The cold start builds a MIB and registers the devices one by one, as the agent does from
+code; the snapshot is then saved and the warm start maps it back. The time of the first
+GET after each start is also shown, since a warm start defers decoding devices until
+they are accessed.
+
+Uso: python benchmarks/bench_warm_start.py [--devices 100000] [--path /tmp/mib.snap]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import contextlib
+import tempfile
+import time
+from l_mibvs import MIB
+from devices.sensor import Sensor
+from devices.actuator import Actuator
+
+
+def first_get(mib: MIB, n_actuators: int) -> float:
+    start = time.perf_counter()
+    mib.get_value_by_iid([3, 3, n_actuators], mib.snapshot())
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--devices", type=int, default=100000, help="total devices (half sensors, half actuators)")
+    parser.add_argument("--path", default=os.path.join(tempfile.gettempdir(), "bench_mib.snap"))
+    args = parser.parse_args()
+    n_sensors = args.devices // 2
+    n_actuators = args.devices - n_sensors
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        mib = MIB()
+        for i in range(n_sensors):
+            mib.register_sensor(Sensor(f"sensor-{i}", "temperature", -20, 50))
+        for i in range(n_actuators):
+            mib.register_actuator(Actuator(f"actuator-{i}", "light", 0, 100))
+        cold = time.perf_counter() - start
+        cold_get = first_get(mib, n_actuators)
+
+        start = time.perf_counter()
+        mib.save_snapshot(args.path)
+        save = time.perf_counter() - start
+
+        start = time.perf_counter()
+        warm_mib = MIB()
+        warm_mib.load_snapshot(args.path)
+        warm = time.perf_counter() - start
+        warm_get = first_get(warm_mib, n_actuators)
+
+    size = os.path.getsize(args.path)
+    os.remove(args.path)
+    print(f"devices:          {args.devices} ({n_sensors} sensors, {n_actuators} actuators)")
+    print(f"snapshot:         {size / 1e6:.1f} MB, saved in {save * 1000:.1f} ms")
+    print(f"cold start:       {cold * 1000:10.1f} ms   first GET {cold_get * 1000:8.1f} ms")
+    print(f"warm start:       {warm * 1000:10.1f} ms   first GET {warm_get * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
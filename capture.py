@@ -0,0 +1,143 @@
+# capture.py
+"""
+Capture files of the datagrams received by an agent, for replaying real traffic.
+
+Layout (little-endian), append-only:
+    MAGIC                               once, at the start of the file
+    RECORD + host + datagram            one per datagram received
+
+A record holds the reception time (ns since the epoch), the source port, the lengths of
+the source host and of the datagram. Malformed datagrams are recorded as received, so a
+capture reproduces the real mix of GETs, SETs and garbage. A crash can only leave a
+partial record at the end, which readers ignore; recording again appends to the file.
+"""
+
+import mmap
+import os
+import struct
+import time
+from collections import namedtuple
+
+MAGIC = b"LSNMPCP1"
+# instante de receção (ns), porta de origem, comprimento do host, comprimento do datagrama
+RECORD = struct.Struct("<qHBH")
+
+CaptureRecord = namedtuple("CaptureRecord", "time_ns addr data")
+
+
+class CaptureFormatError(ValueError):
+    """
+    The file is not a capture written by CaptureWriter.
+    """
+
+
+class CaptureWriter:
+    """
+    Appends received datagrams to a capture file.
+
+    Records go through a buffered file, so recording costs a memory copy per datagram; the
+    agent calls flush() before waiting for the next request, so the file is up to date
+    whenever the agent is idle.
+    """
+
+    def __init__(self, path: str, buffer_size: int = 256 * 1024, clock=time.time_ns):
+        """
+        :param path: capture file (created, or appended to if it already is a capture)
+        :param buffer_size: bytes buffered before being written
+        :param clock: function returning the current time in ns
+        """
+        self.path = path
+        self.clock = clock
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    raise CaptureFormatError(f"{path} is not a traffic capture.")
+            _truncate_partial_record(path)
+        self.file = open(path, "ab", buffering=buffer_size)
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        self.records = 0
+
+    def record(self, data: bytes, addr=None):
+        """
+        Appends a datagram received from `addr` (host, port).
+        """
+        host, port = (addr[0], addr[1]) if addr else ("", 0)
+        host_b = host.encode("ascii")[:255]
+        data = data[:0xFFFF]
+        self.file.write(RECORD.pack(self.clock(), port, len(host_b), len(data)))
+        self.file.write(host_b)
+        self.file.write(data)
+        self.records += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def _records(mm, start: int = len(MAGIC)):
+    """
+    Iterates over the records of a mapped capture as (record, end offset), stopping at a
+    partial record.
+    """
+    pos = start
+    size = len(mm)
+    while pos + RECORD.size <= size:
+        time_ns, port, host_len, data_len = RECORD.unpack_from(mm, pos)
+        host_start = pos + RECORD.size
+        end = host_start + host_len + data_len
+        if end > size:
+            break
+        host = mm[host_start:host_start + host_len].decode("ascii")
+        yield CaptureRecord(time_ns, (host, port) if host else None, mm[host_start + host_len:end]), end
+        pos = end
+
+
+def _truncate_partial_record(path: str):
+    """
+    Cuts a record left half-written by a crash off the end of a capture, so that records
+    appended afterwards can be read.
+    """
+    with open(path, "r+b") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= len(MAGIC):
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            valid = len(MAGIC)
+            for _, end in _records(mm):
+                valid = end
+        if valid < size:
+            f.truncate(valid)
+
+
+class CaptureReader:
+    """
+    Reads a capture through mmap: records are decoded one at a time and the pages of the
+    file are only read from disk as they are reached, so captures larger than the memory
+    can be replayed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < len(MAGIC):
+                raise CaptureFormatError(f"{path} is too short to be a traffic capture.")
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:len(MAGIC)] != MAGIC:
+            self.mm.close()
+            raise CaptureFormatError(f"{path} is not a traffic capture.")
+
+    def __iter__(self):
+        for record, _ in _records(self.mm):
+            yield record
+
+    def close(self):
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,6 +1,7 @@
 from dataclasses import dataclass, field
-import time
 from utils.timestamp_utils import generate_date_timestamp
+from utils.version_utils import VersionCounter
+from utils.clock import wall_time
 
 @dataclass
 class Actuator:
@@ -14,16 +15,25 @@ class Actuator:
     max_value: int
     status: int = field(default=0, init=False)
     last_control_time: str = field(default=None, init=False)
-    start_time: float = field(default_factory=time.time, init=False)
+    start_time: float = field(default_factory=wall_time, init=False)
 
-    def configure_value(self, value: int) -> bool:
+    def __post_init__(self):
+        # não são campos da dataclass: os campos definem os objetos da tabela de atuadores na MIB
+        self.version_counter = VersionCounter()   # substituído pelo da tabela quando registado na MIB
+        self.version = 0
+
+    def configure_value(self, value: int, timestamp: str = None, version: int = None) -> bool:
         '''
         Sets the actuator to a specific value within its range.
         Updates the state based on the value.
+        :param timestamp: last_control_time to record (defaults to now)
+        :param version: version already taken from the table counter (batched SETs share one);
+                        by default the next version is taken
         '''
         if self.min_value <= value <= self.max_value:
             self.status = value
-            self.last_control_time = generate_date_timestamp()
+            self.last_control_time = timestamp or generate_date_timestamp()
+            self.version = version if version is not None else self.version_counter.bump()
             return True
         return False
 
@@ -0,0 +1,205 @@
+import random
+import threading
+import time
+from collections import Counter
+from exceptions import LSNMPvSError, SensorTimeoutError, SensorReadError
+# asyncio e concurrent.futures só são importados quando usados (o agente importa este módulo no arranque)
+
+
+class SensorDriver:
+    '''
+    Source of the readings of a sensor. Sensor.read_value() delegates to the driver set in
+    sensor.driver; drivers only return the raw value, the sensor records it.
+    Attributes:
+        timeout (float): Seconds a read may take when made through a SensorReader
+            (None = no limit).
+        blocking (bool): Whether reads wait on a device; a SensorReader makes the reads of
+            non-blocking drivers (e.g. memory reads, see devices.feed) in the calling thread.
+    '''
+
+    blocking = True
+
+    def __init__(self, timeout: float = None):
+        self.timeout = timeout
+
+    def read(self, sensor) -> int:
+        '''
+        Reads the current value of `sensor` (blocking).
+        '''
+        raise NotImplementedError
+
+
+class AsyncSensorDriver(SensorDriver):
+    '''
+    Driver whose reads are coroutines: a SensorReader runs them concurrently on one event
+    loop thread instead of taking a pool thread per read.
+    '''
+
+    async def read_async(self, sensor) -> int:
+        raise NotImplementedError
+
+    def read(self, sensor) -> int:
+        import asyncio
+        return asyncio.run(self.read_async(sensor))
+
+
+class RandomDriver(SensorDriver):
+    '''
+    Random values within the range of the sensor (what a sensor without driver reads).
+    '''
+
+    def read(self, sensor) -> int:
+        return random.randint(sensor.min_value, sensor.max_value)
+
+
+class SimulatedLatencyDriver(SensorDriver):
+    '''
+    Random values that take `latency` seconds to read (± `jitter`, a fraction of the latency),
+    as from a slow bus: for benchmarks and tests of timeouts and concurrent reads.
+    '''
+
+    def __init__(self, latency: float = 0.01, jitter: float = 0.0, timeout: float = None, rng=None):
+        super().__init__(timeout)
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = rng or random.Random()
+
+    def _delay(self) -> float:
+        return self.latency * (1 + self.rng.uniform(-self.jitter, self.jitter)) if self.jitter else self.latency
+
+    def read(self, sensor) -> int:
+        time.sleep(self._delay())
+        return self.rng.randint(sensor.min_value, sensor.max_value)
+
+
+class AsyncSimulatedLatencyDriver(AsyncSensorDriver, SimulatedLatencyDriver):
+    '''
+    SimulatedLatencyDriver whose reads wait with asyncio.sleep().
+    '''
+
+    async def read_async(self, sensor) -> int:
+        import asyncio
+        await asyncio.sleep(self._delay())
+        return self.rng.randint(sensor.min_value, sensor.max_value)
+
+
+class SensorReader:
+    '''
+    Reads sensors through their drivers on behalf of the MIB: with the timeout of each
+    driver and, for the sensors of a range, concurrently. Synchronous drivers run in a
+    bounded thread pool and asynchronous ones on a single event loop thread, both created
+    on the first read that needs them. Drivers only produce values: the sensors are updated
+    by the calling thread, as with a plain read_value().
+    Sensors without a driver, or with a non-blocking one, are read in the calling thread.
+    Attributes:
+        max_workers (int): Threads of the pool (reads of synchronous drivers running at once).
+        counters (Counter): "timeouts" and "errors" of the reads.
+    '''
+
+    def __init__(self, max_workers: int = 8):
+        self.max_workers = max_workers
+        self.counters = Counter()
+        self._pool = None
+        self._loop = None
+        self._inflight = {}   # id(sensor) -> Future da leitura ainda em curso (não é repetida)
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        if self._pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="sensor-read")
+        return self._pool
+
+    def _event_loop(self):
+        import asyncio
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="sensor-read-async", daemon=True).start()
+            return self._loop
+
+    def _submit(self, sensor):
+        '''
+        Starts reading a sensor, or returns the read of it still in flight (a read that
+        timed out keeps its thread busy: it is not started again until it finishes).
+        '''
+        future = self._inflight.get(id(sensor))
+        if future is not None and not future.done():
+            return future
+        driver = sensor.driver
+        if isinstance(driver, AsyncSensorDriver):
+            import asyncio
+            future = asyncio.run_coroutine_threadsafe(driver.read_async(sensor), self._event_loop())
+        else:
+            future = self._executor().submit(driver.read, sensor)
+        self._inflight[id(sensor)] = future
+        return future
+
+    def read(self, sensor) -> int:
+        '''
+        Samples one sensor (see read_many()).
+        :return: The value read.
+        '''
+        driver = sensor.driver
+        if driver is None or (driver.timeout is None and driver.blocking and not isinstance(driver, AsyncSensorDriver)):
+            return sensor.read_value()
+        if not driver.blocking:
+            try:
+                return sensor.read_value()
+            except SensorTimeoutError:
+                self.counters["timeouts"] += 1
+                raise
+        return self.read_many([sensor])[0]
+
+    def read_many(self, sensors) -> list[int]:
+        '''
+        Samples the sensors, reading through their drivers all at once.
+        :return: The values read, in the order of `sensors`.
+        :raises SensorTimeoutError: if a read takes longer than the timeout of its driver (or a
+            non-blocking driver has no value yet); the sensors read in time are updated anyway.
+        :raises SensorReadError: if a driver fails or returns something that is not a number
+        '''
+        from concurrent.futures import TimeoutError as FutureTimeoutError
+        started = time.monotonic()
+        futures = [self._submit(sensor) if sensor.driver is not None and sensor.driver.blocking else None
+                   for sensor in sensors]
+        values = []
+        late = []
+        for sensor, future in zip(sensors, futures):
+            if future is None:
+                try:
+                    values.append(sensor.read_value())
+                except SensorTimeoutError as e:   # driver sem leitura disponível (não bloqueante)
+                    self.counters["timeouts"] += 1
+                    late.append(e)
+                    values.append(None)
+                continue
+            timeout = sensor.driver.timeout
+            try:
+                value = future.result(None if timeout is None else max(0.0, started + timeout - time.monotonic()))
+            except FutureTimeoutError:
+                self.counters["timeouts"] += 1
+                late.append(SensorTimeoutError(f"Reading of sensor {sensor.id} timed out after {timeout} s."))
+                values.append(None)
+                continue
+            except Exception as e:
+                self.counters["errors"] += 1
+                self._inflight.pop(id(sensor), None)
+                if isinstance(e, LSNMPvSError):
+                    raise
+                # erros do driver (ex.: OSError do barramento) são um código de erro na resposta
+                raise SensorReadError(f"Reading of sensor {sensor.id} failed: {e!r}") from e
+            self._inflight.pop(id(sensor), None)
+            values.append(sensor.record_value(value))
+        if late:
+            raise SensorTimeoutError(str(late[0]) if len(late) == 1
+                                     else f"{str(late[0]).rstrip('.')} (and {len(late) - 1} more).")
+        return values
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
@@ -0,0 +1,277 @@
+import mmap
+import os
+from exceptions import SensorTimeoutError
+from devices.drivers import SensorDriver
+from utils.clock import wall_time_ns
+
+# Ficheiro de feed: magic, cabeçalho, ids dos sensores e, por sensor, um contador de
+# amostras seguido de um anel de pares (time_ns, valor); tudo int64 little-endian.
+MAGIC = b"LSNMPSF1"
+HEADER_SLOTS = 4
+RING_SIZE, SENSORS, ID_SIZE, RETIRED = range(HEADER_SLOTS)
+DEFAULT_ID_SIZE = 32
+
+
+class FeedFormatError(ValueError):
+    '''
+    The file is not a sensor feed, or the producer wrote more than a reader could follow.
+    '''
+
+
+def _offsets(sensors: int, id_size: int) -> tuple[int, int]:
+    '''
+    Byte offsets of the id directory and of the sample rings.
+    '''
+    ids = len(MAGIC) + 8 * HEADER_SLOTS
+    return ids, ids + sensors * id_size
+
+
+def _sensor_ids(mm, header, ids: int) -> dict:
+    '''
+    Reads the id directory of a mapped feed.
+    :return: Index of each sensor id.
+    '''
+    id_size = header[ID_SIZE]
+    return {mm[ids + i * id_size:ids + (i + 1) * id_size].rstrip(b"\0").decode("utf-8"): i
+            for i in range(header[SENSORS])}
+
+
+class SensorFeedWriter:
+    '''
+    Producer side of a sensor feed: a file mapped in memory where an external process (a
+    simulator, a bus poller) appends the samples of a fixed set of sensors, each into its
+    own ring. Writing a sample is three stores into the mapping, without syscalls.
+    Creating a feed over an existing one replaces the file and marks the old one retired,
+    so readers holding it switch to the new file on their next read.
+    Attributes:
+        path (str): File of the feed.
+        ring_size (int): Samples kept per sensor (the reader only needs the last one).
+        slots (dict): Index of each sensor id in the feed.
+    '''
+
+    def __init__(self, path: str, sensor_ids, ring_size: int = 64, id_size: int = DEFAULT_ID_SIZE):
+        if ring_size < 2:
+            raise ValueError("A feed needs at least 2 samples per sensor.")
+        if id_size <= 0 or id_size % 8:
+            raise ValueError("The id size must be a positive multiple of 8.")
+        self.path = path
+        self.ring_size = ring_size
+        self.slots = {}
+        encoded = []
+        for sensor_id in sensor_ids:
+            data = str(sensor_id).encode("utf-8")
+            if len(data) > id_size or sensor_id in self.slots:
+                raise ValueError(f"Sensor id {sensor_id!r} is too long or repeated.")
+            self.slots[sensor_id] = len(encoded)
+            encoded.append(data)
+        self.stride = 1 + 2 * ring_size
+        ids, rings = _offsets(len(encoded), id_size)
+        size = rings + 8 * self.stride * len(encoded)
+
+        # escrito num ficheiro temporário e renomeado: um leitor nunca vê um feed a meio
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w+b") as f:
+            f.truncate(size)
+            self._mm = mmap.mmap(f.fileno(), size)
+        self._mm[:len(MAGIC)] = MAGIC
+        header = memoryview(self._mm)[len(MAGIC):ids].cast("q")
+        header[RING_SIZE], header[SENSORS], header[ID_SIZE], header[RETIRED] = ring_size, len(encoded), id_size, 0
+        header.release()
+        for index, data in enumerate(encoded):
+            self._mm[ids + index * id_size:ids + index * id_size + len(data)] = data
+        self.data = memoryview(self._mm)[rings:].cast("q")
+        self._mm.flush()
+        try:
+            previous = SensorFeed._map(path, writable=True)
+        except (OSError, FeedFormatError):
+            previous = None
+        os.replace(temporary, path)
+        if previous is not None:
+            old, header, _, _ = previous
+            header[RETIRED] = 1
+            header.release()
+            old.close()
+
+    @classmethod
+    def attach(cls, path: str) -> "SensorFeedWriter":
+        '''
+        Opens an existing feed to write to it, keeping its sensors and samples (e.g. a
+        producer restarting, or one feed created ahead of its producer).
+        :raises FeedFormatError: if the file is not a feed
+        '''
+        mm, header, ids, rings = SensorFeed._map(path, writable=True)
+        writer = cls.__new__(cls)
+        writer.path = path
+        writer.ring_size = header[RING_SIZE]
+        writer.stride = 1 + 2 * writer.ring_size
+        writer.slots = _sensor_ids(mm, header, ids)
+        header.release()
+        writer._mm = mm
+        writer.data = memoryview(mm)[rings:].cast("q")
+        return writer
+
+    def write(self, sensor_id: str, value: int, time_ns: int = None):
+        '''
+        Appends a sample of a sensor (time_ns = producer time; by default now, in ns since the epoch).
+        '''
+        self.write_slot(self.slots[sensor_id], value, wall_time_ns() if time_ns is None else time_ns)
+
+    def write_slot(self, slot: int, value: int, time_ns: int = 0):
+        '''
+        Appends a sample of the sensor at index `slot` (see slots): the fast path of write().
+        '''
+        data = self.data
+        base = slot * self.stride
+        count = data[base]
+        position = base + 1 + 2 * (count % self.ring_size)
+        data[position] = time_ns
+        data[position + 1] = value
+        data[base] = count + 1   # publicada só depois de escrita (ver SensorFeed.latest)
+
+    def close(self, unlink: bool = False):
+        if self._mm is None:
+            return
+        self.data.release()
+        self._mm.close()
+        self._mm = None
+        if unlink:
+            os.unlink(self.path)
+
+
+class SensorFeed:
+    '''
+    Reader side of a sensor feed (see SensorFeedWriter). The file stays mapped: the last
+    sample of a sensor is read straight from the producer's pages (no copy of the feed and
+    no syscall per read). A sample is published by the producer after writing it, and a
+    read that the producer lapped while it took place is retried; as with shared_mib.py,
+    this relies on stores not being reordered (x86).
+    Attributes:
+        path (str): File of the feed.
+        ring_size (int): Samples kept per sensor.
+        slots (dict): Index of each sensor id in the feed.
+    '''
+
+    def __init__(self, path: str, max_retries: int = 1000):
+        self.path = path
+        self.max_retries = max_retries
+        self._mm = None
+        self._open()
+
+    @staticmethod
+    def _map(path: str, writable: bool = False):
+        '''
+        Maps a feed file (read-only, unless `writable`).
+        :return: (mmap, header, ids offset, rings offset).
+        :raises FeedFormatError: if the file is not a feed
+        '''
+        with open(path, "r+b" if writable else "rb") as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+            except ValueError:
+                raise FeedFormatError(f"{path} is empty.")
+        if len(mm) < len(MAGIC) + 8 * HEADER_SLOTS or mm[:len(MAGIC)] != MAGIC:
+            mm.close()
+            raise FeedFormatError(f"{path} is not a sensor feed.")
+        header = memoryview(mm)[len(MAGIC):len(MAGIC) + 8 * HEADER_SLOTS].cast("q")
+        ids, rings = _offsets(header[SENSORS], header[ID_SIZE])
+        if len(mm) < rings + 8 * header[SENSORS] * (1 + 2 * header[RING_SIZE]):
+            header.release()
+            mm.close()
+            raise FeedFormatError(f"{path} is truncated.")
+        return mm, header, ids, rings
+
+    def _open(self):
+        mm, header, ids, rings = self._map(self.path)
+        self.ring_size = header[RING_SIZE]
+        self.stride = 1 + 2 * self.ring_size
+        self.slots = _sensor_ids(mm, header, ids)
+        self._release()
+        self._mm, self._header = mm, header
+        self.data = memoryview(mm)[rings:].cast("q")
+
+    def _release(self):
+        if self._mm is not None:
+            self.data.release()
+            self._header.release()
+            self._mm.close()
+            self._mm = None
+
+    def latest(self, sensor_id: str):
+        '''
+        Last sample of a sensor.
+        :return: (value, time_ns), or None if the producer has not written one yet (or the
+            sensor is not in the feed).
+        :raises FeedFormatError: if the producer keeps lapping the reader
+        '''
+        if self._header[RETIRED]:
+            self._open()   # o produtor recriou o feed
+        slot = self.slots.get(sensor_id)
+        if slot is None:
+            return None
+        data = self.data
+        base = slot * self.stride
+        limit = self.ring_size - 1   # escritas até a amostra lida ser reescrita
+        for _ in range(self.max_retries):
+            count = data[base]
+            if count == 0:
+                return None
+            position = base + 1 + 2 * ((count - 1) % self.ring_size)
+            time_ns, value = data[position], data[position + 1]
+            if data[base] - count < limit:
+                return value, time_ns
+        raise FeedFormatError(f"Sensor {sensor_id} of {self.path} is written faster than it can be read.")
+
+    def count(self, sensor_id: str) -> int:
+        '''
+        Samples written of a sensor since the feed was created.
+        '''
+        if self._header[RETIRED]:
+            self._open()
+        slot = self.slots.get(sensor_id)
+        return 0 if slot is None else self.data[slot * self.stride]
+
+    def close(self):
+        self._release()
+
+    def __enter__(self) -> "SensorFeed":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MmapFeedDriver(SensorDriver):
+    '''
+    Driver reading the last sample of each sensor from a sensor feed (see SensorFeed).
+    Reads are memory accesses, so a SensorReader makes them in the calling thread.
+    Attributes:
+        feed (SensorFeed): Feed the values come from.
+    '''
+
+    blocking = False
+
+    def __init__(self, feed: SensorFeed | str, timeout: float = None):
+        super().__init__(timeout)
+        self.feed = SensorFeed(feed) if isinstance(feed, str) else feed
+
+    def read(self, sensor) -> int:
+        '''
+        :raises SensorTimeoutError: if the producer has not written a sample of `sensor` yet
+        '''
+        sample = self.feed.latest(sensor.id)
+        if sample is None:
+            raise SensorTimeoutError(f"Feed {self.feed.path} has no sample of sensor {sensor.id} yet.")
+        return sample[0]
+
+
+def attach_feed(sensors, feed: SensorFeed | str) -> MmapFeedDriver:
+    '''
+    Sets a MmapFeedDriver of `feed` as the driver of the sensors that are in it (the others
+    keep theirs).
+    :return: The driver.
+    '''
+    driver = MmapFeedDriver(feed)
+    for sensor in sensors:
+        if sensor.id in driver.feed.slots:
+            sensor.driver = driver
+    return driver
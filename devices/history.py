@@ -0,0 +1,108 @@
+from array import array
+
+NS_PER_MINUTE = 60 * 1_000_000_000
+
+
+class SampleHistory:
+    '''
+    Fixed-capacity ring buffer of (monotonic_ns, value) samples, backed by typed arrays,
+    with per-minute min/max/avg rollups kept in a second ring.
+    Memory is allocated once, at construction: 16 bytes per sample plus 40 bytes per rollup minute.
+    Samples must be appended in non-decreasing time order (as read from utils.clock.monotonic_ns()).
+    Attributes:
+        capacity (int): Maximum number of samples kept (older ones are overwritten).
+        rollup_capacity (int): Maximum number of minutes kept in the rollups.
+    '''
+
+    def __init__(self, capacity: int = 128, rollup_capacity: int = 60):
+        if capacity <= 0 or rollup_capacity <= 0:
+            raise ValueError("History capacities must be positive.")
+        self.capacity = capacity
+        self.times = array('q', [0]) * capacity
+        self.values = array('q', [0]) * capacity
+        self.count = 0
+        self.head = 0   # posição onde será escrita a próxima amostra
+
+        self.rollup_capacity = rollup_capacity
+        self.rollup_minute = array('q', [0]) * rollup_capacity
+        self.rollup_min = array('q', [0]) * rollup_capacity
+        self.rollup_max = array('q', [0]) * rollup_capacity
+        self.rollup_sum = array('q', [0]) * rollup_capacity
+        self.rollup_count = array('q', [0]) * rollup_capacity
+        self.rollups = 0
+        self.rollup_head = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, ts_ns: int, value: int):
+        '''
+        Stores a sample, overwriting the oldest one when the buffer is full,
+        and folds it into the rollup of its minute.
+        '''
+        self.times[self.head] = ts_ns
+        self.values[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+        minute = ts_ns // NS_PER_MINUTE
+        last = (self.rollup_head - 1) % self.rollup_capacity
+        if self.rollups and self.rollup_minute[last] == minute:
+            if value < self.rollup_min[last]:
+                self.rollup_min[last] = value
+            if value > self.rollup_max[last]:
+                self.rollup_max[last] = value
+            self.rollup_sum[last] += value
+            self.rollup_count[last] += 1
+            return
+        slot = self.rollup_head
+        self.rollup_minute[slot] = minute
+        self.rollup_min[slot] = value
+        self.rollup_max[slot] = value
+        self.rollup_sum[slot] = value
+        self.rollup_count[slot] = 1
+        self.rollup_head = (slot + 1) % self.rollup_capacity
+        if self.rollups < self.rollup_capacity:
+            self.rollups += 1
+
+    def _first_since(self, keys: array, count: int, head: int, capacity: int, key: int) -> int:
+        '''
+        Binary search over a ring in logical (oldest → newest) order.
+        :return: Logical position of the first entry whose key is >= `key`.
+        '''
+        start = (head - count) % capacity
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if keys[(start + mid) % capacity] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def since(self, ts_ns: int):
+        '''
+        Iterates over the samples taken at or after `ts_ns`, oldest first.
+        The position of the first sample is found by binary search and only the
+        matching samples are visited; nothing is copied.
+        :return: Generator of (monotonic_ns, value) tuples.
+        '''
+        first = self._first_since(self.times, self.count, self.head, self.capacity, ts_ns)
+        start = (self.head - self.count) % self.capacity
+        for i in range(first, self.count):
+            pos = (start + i) % self.capacity
+            yield self.times[pos], self.values[pos]
+
+    def rollups_since(self, ts_ns: int):
+        '''
+        Iterates over the minute rollups of the minutes that end after `ts_ns`, oldest first.
+        :return: Generator of (minute_start_ns, min, max, avg) tuples.
+        '''
+        minute = ts_ns // NS_PER_MINUTE
+        first = self._first_since(self.rollup_minute, self.rollups, self.rollup_head, self.rollup_capacity, minute)
+        start = (self.rollup_head - self.rollups) % self.rollup_capacity
+        for i in range(first, self.rollups):
+            pos = (start + i) % self.rollup_capacity
+            yield (self.rollup_minute[pos] * NS_PER_MINUTE, self.rollup_min[pos], self.rollup_max[pos],
+                   self.rollup_sum[pos] / self.rollup_count[pos])
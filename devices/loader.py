@@ -0,0 +1,129 @@
+import csv
+import json
+from itertools import islice
+from devices.sensor import Sensor
+from devices.actuator import Actuator
+
+# Colunas (CSV) / chaves (JSONL) de cada definição de dispositivo
+DEVICE_FIELDS = ("kind", "id", "type", "min_value", "max_value")
+DEVICE_KINDS = {"sensor": Sensor, "actuator": Actuator}
+
+
+class DeviceDefinitionError(ValueError):
+    '''
+    A row of a device file does not define a valid sensor or actuator.
+    Attributes:
+        line (int): Line of the file where the row is.
+    '''
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+
+
+def read_rows(path: str):
+    '''
+    Streams the rows of a device file, one at a time (the file is never loaded whole).
+    The format is chosen by extension: .csv (with a header line naming DEVICE_FIELDS),
+    otherwise JSON Lines (one object per line; blank lines are skipped).
+    :return: Generator of (line number, dict) tuples.
+    '''
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line, text in enumerate(f, 1):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except json.JSONDecodeError as e:
+                raise DeviceDefinitionError(line, f"invalid JSON ({e.msg}).")
+            if not isinstance(row, dict):
+                raise DeviceDefinitionError(line, "expected a JSON object.")
+            yield line, row
+
+
+def _row_error(line: int, row: dict) -> DeviceDefinitionError:
+    '''
+    Explains why a row is not a valid device definition.
+    '''
+    missing = [name for name in DEVICE_FIELDS if row.get(name) in (None, "")]
+    if missing:
+        return DeviceDefinitionError(line, f"missing {', '.join(missing)}.")
+    if str(row["kind"]).strip().lower() not in DEVICE_KINDS:
+        return DeviceDefinitionError(line, f"unknown kind {row['kind']!r} (expected sensor or actuator).")
+    try:
+        int(row["min_value"]), int(row["max_value"])
+    except (TypeError, ValueError):
+        return DeviceDefinitionError(line, "min_value and max_value must be integers.")
+    return DeviceDefinitionError(line, "min_value is greater than max_value.")
+
+
+def parse_device(line: int, row: dict) -> Sensor | Actuator:
+    '''
+    Validates one row and builds the device it defines.
+    :raises DeviceDefinitionError: if a field is missing or invalid
+    '''
+    try:
+        kind = DEVICE_KINDS.get(row["kind"]) or DEVICE_KINDS.get(str(row["kind"]).strip().lower())
+        device_id, device_type = row["id"], row["type"]
+        min_value, max_value = int(row["min_value"]), int(row["max_value"])
+    except (KeyError, TypeError, ValueError):
+        raise _row_error(line, row)
+    if kind is None or device_id in (None, "") or device_type in (None, "") or min_value > max_value:
+        raise _row_error(line, row)
+    return kind(str(device_id), str(device_type), min_value, max_value)
+
+
+def parse_devices(rows, errors: list = None):
+    '''
+    Turns (line, row) tuples into devices.
+    :param errors: if given, invalid rows are skipped and their DeviceDefinitionError appended
+                   to it; otherwise the first invalid row raises
+    :return: Generator of Sensor / Actuator objects.
+    '''
+    for line, row in rows:
+        try:
+            yield parse_device(line, row)
+        except DeviceDefinitionError as e:
+            if errors is None:
+                raise
+            errors.append(e)
+
+
+def batched(iterable, size: int):
+    '''
+    Groups an iterable in lists of at most `size` items.
+    '''
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def load_devices(mib, path: str, batch_size: int = 10000, errors: list = None,
+                 skip_existing: bool = False) -> int:
+    '''
+    Registers every device defined in a JSONL or CSV file, streaming it through a
+    generator pipeline (read → validate → batch → MIB.register_many): only one batch
+    is held in memory at a time and the MIB counters are updated once per batch.
+    Loading millions of devices is much faster with the cyclic garbage collector paused
+    (its passes over the growing MIB make the load superlinear); that is left to the
+    process, as main.py does at startup.
+    :param mib: MIB where the devices are registered
+    :param path: .jsonl or .csv file with one device per row (see DEVICE_FIELDS)
+    :param batch_size: devices registered per call to register_many
+    :param errors: list collecting invalid rows instead of stopping at the first one
+    :param skip_existing: skip devices whose id is already registered (e.g. after a warm restart)
+    :return: Number of devices registered.
+    '''
+    devices = parse_devices(read_rows(path), errors)
+    if skip_existing:
+        devices = (d for d in devices
+                   if d.id not in (mib.sensors if isinstance(d, Sensor) else mib.actuators))
+    registered = 0
+    for batch in batched(devices, batch_size):
+        registered += mib.register_many(batch)
+    return registered
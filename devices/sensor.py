@@ -1,13 +1,17 @@
 from dataclasses import dataclass, field
 import random
-import time
 from utils.timestamp_utils import generate_date_timestamp
+from devices.history import SampleHistory
+from utils.version_utils import VersionCounter
+from utils.clock import wall_time, monotonic_ns
+from exceptions import LSNMPvSError, SensorReadError
 
 @dataclass
 class Sensor:
     '''
     Class that simulates a virtual home automation sensor.
-    Can generate random values within a defined range.
+    Generates random values within a defined range, or reads them through a driver
+    (see devices.drivers).
     Attributes:
         id (str): Unique identifier for the sensor.
         type (str): Type of the sensor (e.g., temperature, humidity).
@@ -16,8 +20,16 @@ class Sensor:
         current_value (int): The last value read by the sensor.
         last_sampling_time (str): Timestamp of the last reading.
         start_time (float): Time when the sensor was initialized.
+        history (SampleHistory): Ring buffer with the last samples and minute rollups
+            (not a MIB object; allocated on the first reading).
+        version (int): Version of the last reading, taken from version_counter (not a MIB object).
+        driver (SensorDriver): Source of the readings (not a MIB object; None = random values).
     '''
 
+    # Capacidade do histórico de cada sensor (amostras e minutos de rollup)
+    HISTORY_CAPACITY = 128
+    HISTORY_ROLLUP_MINUTES = 60
+
     id: str
     type: str
     min_value: int
@@ -25,18 +37,51 @@ class Sensor:
     current_value: int = field(default=None, init=False)
     status: float = field(default=None, init=False)
     last_sampling_time: str = field(default=None, init=False)
-    start_time: float = field(default_factory=time.time, init=False)
+    start_time: float = field(default_factory=wall_time, init=False)
+
+    def __post_init__(self):
+        # não são campos da dataclass: os campos definem os objetos da tabela de sensores na MIB
+        self.history = None
+        self.version_counter = VersionCounter()   # substituído pelo da tabela quando registado na MIB
+        self.version = 0
+        self.driver = None
 
     def read_value(self) -> int:
         ''' 
-        Simulates reading a value from the sensor.
-        Generates a random value within the defined range and updates the last sampling time.
+        Reads a value from the sensor: through its driver or, without one, a random value
+        within the defined range.
         :return: The current value read by the sensor.
+        :raises SensorReadError: if the driver fails (e.g. an OSError of the bus)
+        '''
+        if self.driver is not None:
+            try:
+                value = self.driver.read(self)
+            except LSNMPvSError:
+                raise
+            except Exception as e:
+                raise SensorReadError(f"Reading of sensor {self.id} failed: {e!r}") from e
+            return self.record_value(value)
+        return self.record_value(random.randint(self.min_value, self.max_value))
+
+    def record_value(self, value: int) -> int:
+        '''
+        Records a value read from the sensor: status, last sampling time, history and version.
+        Non-integer readings (e.g. 21.5 from a driver) are rounded to the nearest integer.
+        :return: The value recorded.
+        :raises SensorReadError: if the value is not a number
         '''
-        self.current_value = random.randint(self.min_value, self.max_value)
+        try:
+            value = int(round(value))
+        except (TypeError, ValueError, OverflowError):
+            raise SensorReadError(f"Sensor {self.id} read an invalid value: {value!r}.")
+        self.current_value = value
         intervalo = self.max_value - self.min_value
         self.status = int(((self.current_value - self.min_value) / intervalo) * 100) if intervalo > 0 else 0
         self.last_sampling_time = generate_date_timestamp()
+        if self.history is None:
+            self.history = SampleHistory(self.HISTORY_CAPACITY, self.HISTORY_ROLLUP_MINUTES)
+        self.history.append(monotonic_ns(), self.current_value)
+        self.version = self.version_counter.bump()
         return self.current_value
 
     def get_state(self) -> dict:
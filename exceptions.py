@@ -46,3 +46,18 @@ class NoDevicesRegisteredError(LSNMPvSError):
     """Nenhum sensor ou atuador registado (código 9)."""
     code = 9
     pass
+
+class OverloadError(LSNMPvSError):
+    """Agente sobrecarregado, pedido descartado; o gestor deve abrandar (código 10)."""
+    code = 10
+    pass
+
+class SensorTimeoutError(LSNMPvSError):
+    """Leitura de um sensor excedeu o tempo limite do seu driver (código 11)."""
+    code = 11
+    pass
+
+class SensorReadError(LSNMPvSError):
+    """Leitura de um sensor falhou no seu driver ou devolveu um valor inválido (código 12)."""
+    code = 12
+    pass
@@ -0,0 +1,277 @@
+# journal.py
+
+import os
+import struct
+import threading
+import time
+import zlib
+
+# cabeçalho de cada frame (um por commit): crc32 e tamanho do payload
+FRAME_HEADER = struct.Struct("<II")
+
+
+class SetJournal:
+    """
+    Append-only journal of the SETs applied to a MIB, for crash recovery between snapshots.
+
+    Every change is appended to an in-memory buffer; the buffer is encoded as one frame
+    (the changes plus a single checksum), written and fsync'ed ("group commit") when it is
+    `commit_interval` seconds old or holds about `commit_bytes`,
+    so a burst of SETs costs one fsync. Changes applied less than `commit_interval`
+    seconds before a crash may be lost.
+
+    Commits are made by a background flusher thread after start() (fsync releases the
+    GIL, so SETs keep being applied meanwhile), or by calling commit_if_due() from an
+    event loop.
+
+    Files (all next to `path`):
+        path            active segment, receiving new records
+        path.sealed     segment being compacted
+        path.compacted  last value of every IID in the older segments
+
+    When the active segment grows past `compact_bytes` it is sealed and compacted in a
+    background thread. replay() reads compacted, sealed and active, in that order.
+    """
+
+    def __init__(self, path: str, commit_interval: float = 0.05, commit_bytes: int = 64 * 1024,
+                 compact_bytes: int = 4 * 1024 * 1024, clock=time.monotonic):
+        """
+        :param path: file of the active segment
+        :param commit_interval: maximum seconds a change waits in memory before being fsync'ed
+        :param commit_bytes: buffered bytes that force a commit
+        :param compact_bytes: size of the active segment that triggers a compaction
+        :param clock: function returning the current time in seconds (monotonic)
+        """
+        self.path = path
+        self.sealed_path = path + ".sealed"
+        self.compacted_path = path + ".compacted"
+        self.commit_interval = commit_interval
+        self.commit_bytes = commit_bytes
+        self.compact_bytes = compact_bytes
+        self.clock = clock
+
+        self.lock = threading.Lock()      # protege o buffer (caminho dos SETs)
+        self.io_lock = threading.Lock()   # serializa escritas, compactações e reset dos ficheiros
+        self.buffer = []            # (iid, value) ainda não gravados
+        self.buffered_bytes = 0     # estimativa do tamanho codificado de buffer
+        self.pending_since = None   # instante da alteração mais antiga ainda não gravada
+        self._truncate_torn_tail()
+        self.file = open(path, "ab")
+        self.size = self.file.tell()
+        self.compactor = None
+        self.flusher = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self.commits = 0
+        self.records = 0
+
+    @staticmethod
+    def encode(changes) -> bytes:
+        """
+        Encodes (iid, value) changes as one frame: header + "iid\\0value\\0..." (values
+        cannot contain NUL, the protocol's own separator).
+        """
+        payload = "".join(f"{'.'.join(map(str, iid))}\0{value}\0" for iid, value in changes).encode("utf-8")
+        return FRAME_HEADER.pack(zlib.crc32(payload), len(payload)) + payload
+
+    @staticmethod
+    def _decode(data: bytes):
+        """
+        Iterates over the changes in `data` as (iid, value, end of their frame), stopping
+        at the first incomplete or corrupted frame (the tail of a crashed write).
+        """
+        pos = 0
+        while pos + FRAME_HEADER.size <= len(data):
+            crc, length = FRAME_HEADER.unpack_from(data, pos)
+            start = pos + FRAME_HEADER.size
+            payload = data[start:start + length]
+            if len(payload) != length or zlib.crc32(payload) != crc:
+                break
+            pos = start + length
+            parts = payload.decode("utf-8").split("\0")
+            for i in range(0, len(parts) - 1, 2):
+                yield [int(x) for x in parts[i].split(".")], parts[i + 1], pos
+
+    @classmethod
+    def read_records(cls, path: str):
+        """
+        Iterates over the (iid, value) records of a journal file, oldest first.
+        """
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            data = f.read()
+        for iid, value, _ in cls._decode(data):
+            yield iid, value
+
+    def _truncate_torn_tail(self):
+        """
+        Cuts a frame left half-written by a crash off the active segment, so that the
+        frames appended from now on are not hidden behind it.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r+b") as f:
+            data = f.read()
+            valid = 0
+            for _, _, end in self._decode(data):
+                valid = end
+            if valid < len(data):
+                f.truncate(valid)
+
+    def record(self, iid: list[int], value):
+        """
+        Appends a change (signature of a MIB observer: mib.add_observer(journal.record)).
+        """
+        with self.lock:
+            if self.pending_since is None:
+                self.pending_since = self.clock()
+            self.buffer.append((iid, value))
+            self.buffered_bytes += 3 * len(iid) + 8
+            self.records += 1
+            full = self.buffered_bytes >= self.commit_bytes
+        if full:
+            if self.flusher is not None:
+                self._wake.set()
+            else:
+                self.commit()
+
+    def start(self):
+        """
+        Starts the background flusher thread, which commits every commit_interval seconds
+        (or as soon as commit_bytes are buffered).
+        """
+        if self.flusher is None:
+            self._stop.clear()
+            self.flusher = threading.Thread(target=self._run_flusher, daemon=True)
+            self.flusher.start()
+
+    def _run_flusher(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.commit_interval)
+            self._wake.clear()
+            self.commit()
+
+    def time_until_commit(self) -> float | None:
+        """
+        Seconds until the buffered changes must be committed, or None if there are none.
+        """
+        since = self.pending_since
+        if since is None:
+            return None
+        return max(0.0, since + self.commit_interval - self.clock())
+
+    def commit_if_due(self) -> bool:
+        """
+        Commits the buffered changes if the oldest one waited commit_interval seconds.
+        :return: True if a commit was made.
+        """
+        if self.pending_since is None or self.clock() - self.pending_since < self.commit_interval:
+            return False
+        self.commit()
+        return True
+
+    def commit(self):
+        """
+        Writes and fsyncs the buffered changes (group commit), compacting if the active
+        segment grew too large.
+        """
+        with self.io_lock:
+            with self.lock:
+                if not self.buffer:
+                    return
+                changes, self.buffer = self.buffer, []
+                self.buffered_bytes = 0
+                self.pending_since = None
+            # novos SETs continuam a ser registados enquanto este grupo é gravado
+            data = self.encode(changes)
+            self.file.write(data)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.size += len(data)
+            self.commits += 1
+            compact = self.size >= self.compact_bytes
+        if compact:
+            self.compact_async()
+
+    def compact_async(self) -> threading.Thread | None:
+        """
+        Seals the active segment and compacts it in a background thread.
+        :return: The compaction thread, or None if a compaction is already running.
+        """
+        with self.io_lock:
+            if self.compactor is not None and self.compactor.is_alive():
+                return None
+            if os.path.exists(self.sealed_path):
+                # compactação anterior interrompida: termina-a antes de selar outro segmento
+                self.compactor = threading.Thread(target=self._compact, daemon=True)
+            else:
+                self.file.close()
+                os.replace(self.path, self.sealed_path)
+                self.file = open(self.path, "ab")
+                self.size = 0
+                self.compactor = threading.Thread(target=self._compact, daemon=True)
+            self.compactor.start()
+            return self.compactor
+
+    def _compact(self):
+        """
+        Merges compacted + sealed into a new compacted file, keeping the last value per IID.
+        """
+        latest = {}
+        for path in (self.compacted_path, self.sealed_path):
+            for iid, value in self.read_records(path):
+                key = tuple(iid)
+                latest.pop(key, None)   # mantém a ordem da última alteração
+                latest[key] = value
+        tmp_path = self.compacted_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.encode(latest.items()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.compacted_path)
+        os.remove(self.sealed_path)
+
+    def replay(self):
+        """
+        Iterates over every journaled change, oldest first, to be applied on top of the
+        last snapshot at startup. Buffered changes not yet committed are not included.
+        """
+        self.wait_compaction()
+        for path in (self.compacted_path, self.sealed_path, self.path):
+            yield from self.read_records(path)
+
+    def wait_compaction(self):
+        compactor = self.compactor
+        if compactor is not None:
+            compactor.join()
+
+    def reset(self):
+        """
+        Discards every journaled change. Call it right after saving a snapshot that contains
+        them (with the MIB writers' lock held, so that no change is lost in between).
+        """
+        self.wait_compaction()
+        with self.io_lock, self.lock:
+            self.buffer = []
+            self.buffered_bytes = 0
+            self.pending_since = None
+            self.file.truncate(0)
+            os.fsync(self.file.fileno())
+            self.size = 0
+            for path in (self.sealed_path, self.compacted_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def close(self):
+        """
+        Stops the flusher and commits whatever is still buffered.
+        """
+        if self.flusher is not None:
+            self._stop.set()
+            self._wake.set()
+            self.flusher.join()
+            self.flusher = None
+        self.commit()
+        self.wait_compaction()
+        self.file.close()
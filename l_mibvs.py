@@ -1,11 +1,133 @@
-import time
+import operator
+import threading
+import functools
+from contextlib import contextmanager
+from collections import namedtuple
+from collections.abc import Sequence
+from itertools import chain, islice
+from types import MappingProxyType
 from devices.sensor import Sensor
 from devices.actuator import Actuator
 from utils.timestamp_utils import generate_date_timestamp, generate_uptime_timestamp
 from utils.format_utils import validate_date_format, is_valid_int
 from utils.iid_utils import parse_iid
+from utils.version_utils import VersionCounter
+from utils.clock import wall_time, monotonic_ns
+from mib_store import LazyDeviceTable, save_snapshot, load_snapshot
 from dataclasses import fields
-from exceptions import DecodingError, InvalidTagError, UnknownMessageTypeError, DuplicateMessageError, InvalidIIDError, InvalidValueTypeError, UnsupportedValueError, IIDValueMismatchError, NoDevicesRegisteredError
+from exceptions import LSNMPvSError, DecodingError, InvalidTagError, UnknownMessageTypeError, DuplicateMessageError, InvalidIIDError, InvalidValueTypeError, UnsupportedValueError, IIDValueMismatchError, NoDevicesRegisteredError
+
+# Linha imutável da tabela de atuadores, com os mesmos nomes de atributos que Actuator
+ActuatorRow = namedtuple("ActuatorRow", "id type min_value max_value status last_control_time version")
+
+
+class ActuatorRows(Sequence):
+    """
+    Immutable sequence of ActuatorRow kept in blocks of BLOCK_SIZE rows, so that a new
+    snapshot after a SET rebuilds only the blocks of the rows that changed and shares the
+    others with the previous one (O(number of blocks + BLOCK_SIZE) instead of O(rows)).
+    """
+    __slots__ = ("blocks", "length")
+
+    BLOCK_SIZE = 256
+
+    def __init__(self, blocks: tuple = (), length: int = 0):
+        self.blocks = blocks
+        self.length = length
+
+    @classmethod
+    def from_rows(cls, rows) -> "ActuatorRows":
+        rows = tuple(rows)
+        size = cls.BLOCK_SIZE
+        return cls(tuple(rows[i:i + size] for i in range(0, len(rows), size)), len(rows))
+
+    def replace(self, changes: dict) -> "ActuatorRows":
+        """
+        :param changes: 0-based index -> new ActuatorRow
+        :return: A copy with the given rows replaced.
+        """
+        size = self.BLOCK_SIZE
+        blocks = list(self.blocks)
+        by_block = {}
+        for index, row in changes.items():
+            by_block.setdefault(index // size, []).append((index % size, row))
+        for number, block_changes in by_block.items():
+            block = list(blocks[number])
+            for offset, row in block_changes:
+                block[offset] = row
+            blocks[number] = tuple(block)
+        return ActuatorRows(tuple(blocks), self.length)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.length)
+            if step == 1:
+                return list(islice(self, start, max(start, stop)))
+            return [self[i] for i in range(start, stop, step)]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("actuator row index out of range")
+        return self.blocks[index // self.BLOCK_SIZE][index % self.BLOCK_SIZE]
+
+    def __iter__(self):
+        return chain.from_iterable(self.blocks)
+
+
+class MIBSnapshot:
+    """
+    Immutable, consistent view of the MIB state that SETs can change:
+    the Device group and the actuators table.
+
+    Writers publish a new snapshot after every change; readers take the current one
+    (a single reference read) and answer a whole request from it, so a multi-IID GET
+    never mixes values from before and after a concurrent SET.
+
+    Attributes:
+        versions (tuple): (device table version, actuator table version, number of actuators).
+        start_time (float): MIB start time, used to compute the uptime.
+        device_info (MappingProxyType): Read-only copy of MIB.device_info.
+        actuators (ActuatorRows): One ActuatorRow per registered actuator, in registration order.
+    """
+    __slots__ = ("versions", "start_time", "device_info", "actuators")
+
+    def __init__(self, versions: tuple, start_time: float, device_info, actuators: tuple):
+        self.versions = versions
+        self.start_time = start_time
+        self.device_info = device_info
+        self.actuators = actuators
+
+
+class _Positional:
+    """
+    Indexable view (by 0-based position) of a LazyDeviceTable.
+    """
+    __slots__ = ("table",)
+
+    def __init__(self, table):
+        self.table = table
+
+    def __getitem__(self, index: int):
+        return self.table.at(index)
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+
+def _writer(method):
+    """
+    Decorator for MIB methods that change state: runs them under the writers' lock
+    (writers exclude each other; readers never wait for it).
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.write_batch():
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class MIB:
     """
@@ -24,9 +146,13 @@ class MIB:
         operational_status (int): Operational status of the MIB (0 = standby, 1 = normal, 2+ = error).
     """
 
+    # Valores do campo profiling (1.11): 0 = inativo, 1 = cProfile, 2 = amostragem, 3 = tracemalloc
+    PROFILING_MODES = (0, 1, 2, 3)
+
 
     def __init__(self):
-        self.start_time = time.time()  # usado internamente para uptime
+        self.start_time = wall_time()  # usado internamente para uptime
+        self.start_monotonic_ns = monotonic_ns()  # origem dos instantes do histórico (structure 4)
 
         self.device_info = {
             "id": "agent1",  # 1.1
@@ -38,13 +164,204 @@ class MIB:
             "upTime": generate_uptime_timestamp(self.start_time),  # 1.7 (atualizado dinamicamente)
             "lastTimeUpdated": generate_date_timestamp(),  # 1.8
             "operationalStatus": 1,  # 1.9 (0 = standby, 1 = normal, 2+ = erro)
-            "reset": 0  # 1.10
+            "reset": 0,  # 1.10
+            "profiling": 0  # 1.11 (0 = inativo, 1 = cProfile, 2 = amostragem, 3 = tracemalloc; ver profiling.py)
         }
 
         # tabelas de sensores e atuadores (estruturas 2 e 3)
         self.sensors = {}    # sensor_id: Sensor
         self.actuators = {}  # actuator_id: Actuator
 
+        # versões por tabela (os dispositivos registados partilham o contador da sua tabela)
+        self.device_versions = VersionCounter()
+        self.device_field_versions = {}   # field_id: versão da última alteração
+        self.sensor_versions = VersionCounter()
+        self.actuator_versions = VersionCounter()
+
+        # funções chamadas como callback(iid, value) sempre que um SET altera a MIB
+        self.observers = []
+
+        # snapshots MVCC: os escritores publicam, os leitores só leem a referência atual
+        self._write_lock = threading.RLock()
+        self._write_depth = 0
+        self._dirty_actuators = {}      # índice -> atuador alterado pela MIB desde o último snapshot
+        self._dirty_bumps = 0           # versões de atuadores gastas pela MIB desde o último snapshot
+        self._snapshot = None
+        self._sensor_rows = None   # (tabela, lista posicional) reutilizada pelas leituras de sensores
+        self._actuator_list = None # idem, para os SETs de atuadores
+        # leitor dos sensores com driver (timeouts, leituras concorrentes; ver devices.drivers)
+        self.sensor_reader = None
+        self._publish()
+
+    def _current_versions(self) -> tuple:
+        return (self.device_versions.value, self.actuator_versions.value, len(self.actuators))
+
+    def _publish(self):
+        """
+        Builds and publishes a new MIBSnapshot if anything changed since the last one.
+        Must be called with the writers' lock held and no write in progress.
+        Unchanged parts are shared with the previous snapshot; when only actuators changed
+        through the MIB, just the blocks of their rows are rebuilt (see ActuatorRows).
+        """
+        previous = self._snapshot
+        versions = self._current_versions()
+        dirty, bumps = self._dirty_actuators, self._dirty_bumps
+        self._dirty_actuators, self._dirty_bumps = {}, 0
+        if previous is not None and previous.versions == versions and previous.start_time == self.start_time:
+            return
+
+        if previous is not None and previous.versions[0] == versions[0] and previous.start_time == self.start_time:
+            device_info = previous.device_info
+        else:
+            device_info = MappingProxyType(dict(self.device_info))
+
+        if previous is not None and previous.versions[1:] == versions[1:]:
+            actuators = previous.actuators
+        elif previous is not None and previous.versions[2] == versions[2] \
+                and versions[1] - previous.versions[1] == bumps:
+            # todas as alterações passaram pela MIB: só os blocos das linhas marcadas mudam
+            actuators = previous.actuators.replace({
+                index: ActuatorRow(a.id, a.type, a.min_value, a.max_value, a.status, a.last_control_time, a.version)
+                for index, a in dirty.items()
+            })
+        else:
+            actuators = ActuatorRows.from_rows(
+                ActuatorRow(a.id, a.type, a.min_value, a.max_value, a.status, a.last_control_time, a.version)
+                # dispositivos ainda no ficheiro de snapshot são lidos sem serem materializados
+                for a in getattr(self.actuators, "peek_values", self.actuators.values)()
+            )
+        self._snapshot = MIBSnapshot(versions, self.start_time, device_info, actuators)
+
+    @contextmanager
+    def write_batch(self):
+        """
+        Groups several writes so that readers see all of them or none: the writers' lock is
+        held for the whole block, and snapshots are only built while no write is in progress.
+        """
+        with self._write_lock:
+            self._write_depth += 1
+            try:
+                yield self
+            finally:
+                self._write_depth -= 1
+
+    def snapshot(self) -> MIBSnapshot:
+        """
+        Returns the current immutable snapshot of the MIB, to answer a request consistently.
+        Snapshots are built on demand, by the first reader after a change (so a burst of
+        writes, e.g. registering many devices, costs a single snapshot). Never waits for
+        writers: while one is busy, the last published snapshot is returned.
+        """
+        snap = self._snapshot
+        if snap.versions != self._current_versions() and self._write_lock.acquire(blocking=False):
+            try:
+                if self._write_depth == 0:
+                    self._publish()
+            finally:
+                self._write_lock.release()
+            snap = self._snapshot
+        return snap
+
+    def _actuator_at(self, index: int) -> Actuator:
+        """
+        Returns the actuator at a 0-based position (registration order).
+        """
+        return self._actuators_by_position()[index]
+
+    def _actuators_by_position(self):
+        """
+        Returns the actuators table as an indexable sequence without materializing
+        devices still in a snapshot file. Like the sensors, actuators are only ever
+        appended, so the list is kept until the table grows or is replaced.
+        """
+        if isinstance(self.actuators, LazyDeviceTable):
+            return _Positional(self.actuators)
+        cached = self._actuator_list
+        if cached is None or cached[0] is not self.actuators or len(cached[1]) != len(self.actuators):
+            cached = self._actuator_list = (self.actuators, list(self.actuators.values()))
+        return cached[1]
+
+    def _sensors_by_position(self):
+        """
+        Returns the sensors table as an indexable sequence. Sensors are only ever appended,
+        so the list is kept between reads and rebuilt only after the table grows or is replaced.
+        """
+        if isinstance(self.sensors, LazyDeviceTable):
+            return _Positional(self.sensors)
+        cached = self._sensor_rows
+        if cached is None or cached[0] is not self.sensors or len(cached[1]) != len(self.sensors):
+            cached = self._sensor_rows = (self.sensors, list(self.sensors.values()))
+        return cached[1]
+
+    def _sample_sensors(self, rows):
+        """
+        Reads the sensors in `rows`: through the sensor_reader when there is one (drivers with
+        timeouts, read concurrently), otherwise one after the other.
+        :raises SensorTimeoutError: if a driver does not answer within its timeout
+        """
+        if self.sensor_reader is not None:
+            if len(rows) == 1:
+                self.sensor_reader.read(next(iter(rows)))
+            else:
+                self.sensor_reader.read_many(rows)
+            return
+        for sensor in rows:
+            sensor.read_value()
+
+    def save_snapshot(self, path: str):
+        """
+        Writes a compact binary snapshot of the devices, actuator values, beaconRate and
+        device identity to `path` (see mib_store), for a warm restart with load_snapshot().
+        """
+        with self._write_lock:
+            save_snapshot(self, path)
+
+    @_writer
+    def load_snapshot(self, path: str):
+        """
+        Replaces the devices and the persistent Device fields with those of a snapshot
+        written by save_snapshot(). The file is memory-mapped and devices are only built
+        when first accessed, so loading costs the same for any number of devices.
+        Row and table versions are restored and then advanced, so delta-read tokens taken
+        before the restart stay valid; every Device field counts as changed.
+        :raises SnapshotFormatError: if the file is not a valid snapshot
+        """
+        file, self.sensors, self.actuators = load_snapshot(path, self.sensor_versions, self.actuator_versions)
+        for counter, saved in ((self.device_versions, file.device_version),
+                               (self.sensor_versions, file.sensor_version),
+                               (self.actuator_versions, file.actuator_version)):
+            counter.value = max(counter.value, saved)
+        self.device_info["id"] = file.device_id
+        self.device_info["type"] = file.device_type
+        self.device_info["beaconRate"] = file.beacon_rate
+        self.device_info["operationalStatus"] = file.operational_status
+        self.device_info["nSensors"] = len(self.sensors)
+        self.device_info["nActuators"] = len(self.actuators)
+        self.sensor_versions.bump()
+        self.actuator_versions.bump()
+        self._touch_device_fields(*range(1, len(self.device_info) + 1))
+        self._notify_observers([1, 3], file.beacon_rate)
+
+    def add_observer(self, callback):
+        """
+        Registers a function to be called as callback(iid, value) whenever a SET changes a value in the MIB.
+        :param callback: Function receiving the IID (list of ints) and the new value.
+        """
+        self.observers.append(callback)
+
+    def _notify_observers(self, iid: list[int], value):
+        for callback in self.observers:
+            callback(iid, value)
+
+    def _touch_device_fields(self, *field_ids: int):
+        """
+        Records a change of Device group fields with a single new version of the Device table.
+        """
+        version = self.device_versions.bump()
+        for field_id in field_ids:
+            self.device_field_versions[field_id] = version
+
+    @_writer
     def register_sensor(self, sensor: Sensor):
         """
         Registers a new sensor in the MIB.
@@ -53,10 +370,14 @@ class MIB:
         """
         if sensor.id not in self.sensors:
             self.sensors[sensor.id] = sensor
+            sensor.version_counter = self.sensor_versions
+            sensor.version = self.sensor_versions.bump()
             self.device_info["nSensors"] = len(self.sensors)
+            self._touch_device_fields(4)
         else:
             raise ValueError(f"Sensor with ID {sensor.id} already exists.")
         
+    @_writer
     def register_actuator(self, actuator: Actuator):
         """
         Registers a new actuator in the MIB.
@@ -64,10 +385,82 @@ class MIB:
         """
         if actuator.id not in self.actuators:
             self.actuators[actuator.id] = actuator
+            actuator.version_counter = self.actuator_versions
+            actuator.version = self.actuator_versions.bump()
             self.device_info["nActuators"] = len(self.actuators)
+            self._touch_device_fields(5)
         else:
             raise ValueError(f"Actuator with ID {actuator.id} already exists.")
         
+    @_writer
+    def adopt_device(self, device, position: int = None) -> bool:
+        """
+        Puts a device held by the caller (e.g. a sensor with its driver) in place of the one
+        with the same id restored from a snapshot, copying the restored state onto it (the
+        version and, for actuators, status and last_control_time).
+        :param position: 0-based position where the device is expected; it is checked first,
+                         without building the id index of a table still in the snapshot file
+        :return: False if there is no device with its id (it must be registered instead).
+        """
+        is_sensor = isinstance(device, Sensor)
+        table = self.sensors if is_sensor else self.actuators
+        if isinstance(table, LazyDeviceTable) and position is not None and position < len(table) \
+                and table.key_at(position) == device.id:
+            restored = table.at(position)
+            table.replace_at(position, device)
+        elif device.id in table:
+            restored = table[device.id]
+            table[device.id] = device
+        else:
+            return False
+        device.version_counter = self.sensor_versions if is_sensor else self.actuator_versions
+        device.version = restored.version
+        if not is_sensor:
+            device.status = restored.status
+            device.last_control_time = restored.last_control_time
+        return True
+
+    @_writer
+    def register_many(self, devices) -> int:
+        """
+        Registers a batch of sensors and actuators at once: the ids are checked first (the
+        batch is all-or-nothing), then nSensors / nActuators, the table versions and the
+        Device version are updated once for the whole batch.
+        :param devices: iterable of Sensor and Actuator objects
+        :return: Number of devices registered.
+        """
+        devices = list(devices)
+        seen = set()
+        for device in devices:
+            is_sensor = isinstance(device, Sensor)
+            table = self.sensors if is_sensor else self.actuators
+            if device.id in table or (is_sensor, device.id) in seen:
+                raise ValueError(f"{'Sensor' if is_sensor else 'Actuator'} with ID {device.id} already exists.")
+            seen.add((is_sensor, device.id))
+
+        sensors = [d for d in devices if isinstance(d, Sensor)]
+        actuators = [d for d in devices if not isinstance(d, Sensor)]
+        changed = []
+        if sensors:
+            version = self.sensor_versions.bump()
+            for sensor in sensors:
+                self.sensors[sensor.id] = sensor
+                sensor.version_counter = self.sensor_versions
+                sensor.version = version
+            self.device_info["nSensors"] = len(self.sensors)
+            changed.append(4)
+        if actuators:
+            version = self.actuator_versions.bump()
+            for actuator in actuators:
+                self.actuators[actuator.id] = actuator
+                actuator.version_counter = self.actuator_versions
+                actuator.version = version
+            self.device_info["nActuators"] = len(self.actuators)
+            changed.append(5)
+        if changed:
+            self._touch_device_fields(*changed)
+        return len(devices)
+
     def get_sensor(self, sensor_id: str) -> Sensor:
         """ 
         Retrieves a sensor by its ID.
@@ -137,108 +530,333 @@ class MIB:
 
     
     
-    def get_device_value(self, field_id: int):
+    def get_device_value(self, field_id: int, snapshot: MIBSnapshot = None):
         """        
             Retrieves a specific value from the device information based on the field ID.
             :param field_id: ID of the field to retrieve.
+            :param snapshot: Optional MIBSnapshot to read from instead of the live MIB.
             :return: Value corresponding to the field ID, or None if the field ID is invalid.
         """
+        device_info = snapshot.device_info if snapshot else self.device_info
 
         match field_id:
-            case 0:  return len(self.device_info)
-            case 1:  return self.device_info["id"]
-            case 2:  return self.device_info["type"]
-            case 3:  return self.device_info["beaconRate"]
-            case 4:  return self.device_info["nSensors"]
-            case 5:  return self.device_info["nActuators"]
-            case 6:  return self.device_info["dateAndTime"]
+            case 0:  return len(device_info)
+            case 1:  return device_info["id"]
+            case 2:  return device_info["type"]
+            case 3:  return device_info["beaconRate"]
+            case 4:  return device_info["nSensors"]
+            case 5:  return device_info["nActuators"]
+            case 6:  return device_info["dateAndTime"]
             case 7:
+                if snapshot:
+                    return generate_uptime_timestamp(snapshot.start_time)
                 up_time = generate_uptime_timestamp(self.start_time)
                 self.device_info["upTime"] = up_time  
                 return up_time
-            case 8:  return self.device_info["lastTimeUpdated"]
-            case 9:  return self.device_info["operationalStatus"]
-            case 10: return self.device_info["reset"]
+            case 8:  return device_info["lastTimeUpdated"]
+            case 9:  return device_info["operationalStatus"]
+            case 10: return device_info["reset"]
+            case 11: return device_info["profiling"]
             case _:  raise InvalidIIDError(f"Unknown Device field ID: {field_id}.")
 
-    def set_device_value(self, field_id: int, value):
+    @_writer
+    def set_device_value(self, field_id: int, value, timestamp: str = None):
+        """
+        Sets a writable field of the Device group.
+        :param timestamp: lastTimeUpdated to record (defaults to now)
+        """
+        value = self._validate_device_value(field_id, value)
+        changed = self._apply_device_value(field_id, value, timestamp)
+        if changed:
+            self._touch_device_fields(*changed)
+            if field_id != 10:
+                self._notify_observers([1, field_id], value)
+        return None
+
+    def _validate_device_value(self, field_id: int, value):
+        """
+        Validates a SET of a Device group field without applying it.
+        :return: The value to store (an int for the integer fields).
+        """
         match field_id:
             case 3:  # beaconRate
                 if not is_valid_int(value):
                     raise InvalidValueTypeError("Invalid type for beaconRate.")
-                value_int = int(value)
-
-                if value_int < 0:
+                value = int(value)
+                if value < 0:
                     raise UnsupportedValueError("Invalid value for beaconRate.")
-
-                if value_int == self.device_info["beaconRate"]:
-                    return None # Sem alteração o que fazer aqui??? #TODO: pensar em algo melhor
-                else:
-                    self.device_info["beaconRate"] = value_int
-                    self.device_info["lastTimeUpdated"] = generate_date_timestamp()
-                    return None
-
             case 6:  # dateAndTime
                 if not validate_date_format(value):
                     raise InvalidValueTypeError("Invalid date format.")
-
-                if value == self.device_info["dateAndTime"]:
-                    return None # Sem alteração
-                else:
-                    self.device_info["dateAndTime"] = value
-                    self.device_info["lastTimeUpdated"] = generate_date_timestamp()
-                    return None
-
             case 10:  # reset
                 if not is_valid_int(value):
                     raise InvalidValueTypeError("Invalid type for reset.")
+                value = int(value)
+                if value not in (0, 1):
+                    raise UnsupportedValueError("Invalid value for reset.")
+            case 11:  # profiling (sessão de profiling do agente, ver Agent)
+                if not is_valid_int(value):
+                    raise InvalidValueTypeError("Invalid type for profiling.")
+                value = int(value)
+                if value not in self.PROFILING_MODES:
+                    raise UnsupportedValueError("Invalid value for profiling.")
+            case _:
+                raise InvalidIIDError(f"Field ID {field_id} is not writable or does not exist in the device information.")
+        return value
 
-                value_int = int(value)
+    def _apply_device_value(self, field_id: int, value, timestamp: str = None) -> tuple:
+        """
+        Stores a value already validated by _validate_device_value(), without bumping the
+        version of the Device table (the caller does it once for all its changes).
+        :return: The Device fields changed (empty if the value was already set).
+        """
+        match field_id:
+            case 3:  # beaconRate
+                if value == self.device_info["beaconRate"]:
+                    return () # Sem alteração o que fazer aqui??? #TODO: pensar em algo melhor
+                self.device_info["beaconRate"] = value
+                self.device_info["lastTimeUpdated"] = timestamp or generate_date_timestamp()
+                return (3, 8)
+
+            case 6:  # dateAndTime
+                if value == self.device_info["dateAndTime"]:
+                    return () # Sem alteração
+                self.device_info["dateAndTime"] = value
+                self.device_info["lastTimeUpdated"] = timestamp or generate_date_timestamp()
+                return (6, 8)
 
-                if value_int == 1:
-                    current_timestamp = time.time()
+            case 10:  # reset
+                if value == 1:
+                    current_timestamp = wall_time()
                     current_date = generate_date_timestamp(current_timestamp)
 
                     self.device_info["reset"] = 1
                     # Resetting the MIB
                     self.start_time = current_timestamp
+                    self.start_monotonic_ns = monotonic_ns()
                     self.device_info["dateAndTime"] = current_date
                     self.device_info["lastTimeUpdated"] = current_date
                     # after reset is done we put the reset value back to 0
                     self.device_info["reset"] = 0
-                    return None
+                    return (6, 8)
+                if self.device_info["reset"] != 0:
+                    self.device_info["reset"] = 0
+                    self.device_info["lastTimeUpdated"] = timestamp or generate_date_timestamp()
+                    return (8, 10)
+                return () # Sem alteração
 
-                elif value_int == 0:
-                    if self.device_info["reset"] != 0:
-                        self.device_info["reset"] = 0
-                        self.device_info["lastTimeUpdated"] = generate_date_timestamp()
-                        return None
-                    else:
-                        return None # Sem alteração
-                else:
-                    raise UnsupportedValueError("Invalid value for reset.")
+            case 11:  # profiling
+                if value == self.device_info["profiling"]:
+                    return () # Sem alteração
+                self.device_info["profiling"] = value
+                self.device_info["lastTimeUpdated"] = timestamp or generate_date_timestamp()
+                return (8, 11)
 
-            case _:
-                raise InvalidIIDError(f"Field ID {field_id} is not writable or does not exist in the device information.")
-
-    def get_sensor_field(self, object_id: int, index: int):
-        sensors_list = list(self.sensors.values())
-        print(f"get_sensor_field: object_id={object_id}, index={index}, sensors_list={sensors_list}")
+    def get_sensor_field(self, object_id: int, index: int, sensors_list=None):
+        if sensors_list is None:
+            sensors_list = self._sensors_by_position()
         if len(sensors_list) == 0:
             raise NoDevicesRegisteredError("No sensors registered in the MIB.")
         match object_id:
             case 1: return sensors_list[index].id
             case 2: return sensors_list[index].type
             case 3:
-                sensors_list[index].read_value() 
+                self._sample_sensors([sensors_list[index]])
                 return sensors_list[index].status
             case 4: return sensors_list[index].min_value
             case 5: return sensors_list[index].max_value
             case 6: return sensors_list[index].last_sampling_time
             case _: raise InvalidIIDError(f"Unknown sensor object ID: {object_id}.")
 
-    def get_actuator_field(self, object_id: int, index: int):
-        actuators_list = list(self.actuators.values())
+    # Objetos da estrutura 4 (histórico de sensores)
+    HISTORY_OBJECTS = {
+        1: "sample values",
+        2: "sample times (uptime ms)",
+        3: "minute minimum",
+        4: "minute maximum",
+        5: "minute average",
+    }
+
+    def get_history_value(self, object_id: int, indexes: list[int]):
+        """
+        Reads the sample history of a sensor (structure 4).
+        IID format: [4, object, sensor_index, since], where `since` is an agent uptime in
+        milliseconds (the same clock as the R PDU timestamps; omitted = whole history).
+        Objects 1 and 2 list the samples taken since then (values and their uptimes in ms);
+        objects 3 to 5 list the minimum, maximum and (rounded) average of every minute
+        ending after `since`. [4, 0] returns the number of history objects.
+        :return: List of ints (oldest first).
+        """
+        if object_id == 0 and len(indexes) == 0:
+            return len(self.HISTORY_OBJECTS)
+        if object_id not in self.HISTORY_OBJECTS:
+            raise InvalidIIDError(f"Invalid object ID {object_id} for Sensor history. Expected 1–{len(self.HISTORY_OBJECTS)}.")
+        if len(indexes) not in (1, 2):
+            raise InvalidIIDError("Invalid number of indexes for Sensor history. Expected sensor index and optional uptime.")
+        index = indexes[0]
+        if not 1 <= index <= len(self.sensors):
+            raise InvalidIIDError(f"Invalid sensor index {index}. Expected 1–{len(self.sensors)}.")
+        since_ms = indexes[1] if len(indexes) == 2 else 0
+        since_ns = self.start_monotonic_ns + since_ms * 1_000_000
+
+        history = list(self.sensors.values())[index - 1].history
+        if history is None:
+            return []
+        match object_id:
+            case 1: return [value for _, value in history.since(since_ns)]
+            case 2: return [(ts - self.start_monotonic_ns) // 1_000_000 for ts, _ in history.since(since_ns)]
+            case 3: return [low for _, low, _, _ in history.rollups_since(since_ns)]
+            case 4: return [high for _, _, high, _ in history.rollups_since(since_ns)]
+            case 5: return [round(avg) for _, _, _, avg in history.rollups_since(since_ns)]
+
+    # Objetos das estruturas 5 (agregados de sensores) e 6 (agregados de atuadores)
+    AGGREGATE_FUNCTIONS = {
+        1: "count",
+        2: "min",
+        3: "max",
+        4: "mean",
+        5: "sum",
+    }
+
+    def get_aggregate_value(self, structure: int, function_id: int, indexes: list[int],
+                            snapshot: MIBSnapshot = None):
+        """
+        Computes an aggregate over the status column (object 3) of the sensors (structure 5)
+        or actuators (structure 6) table, so that only the scalar result goes on the wire.
+        IID format: [5|6, function] for the whole table, or [5|6, function, i1, i2] for a
+        range of rows (with the same rules as a range GET; [.., 0, 0] is the whole table).
+        Sensors are sampled once each, exactly as in a [2, 3, 0, 0] GET.
+        The mean is rounded to an integer. [5|6, 0] returns the number of functions.
+        """
+        if function_id == 0 and len(indexes) == 0:
+            return len(self.AGGREGATE_FUNCTIONS)
+        if function_id not in self.AGGREGATE_FUNCTIONS:
+            raise InvalidIIDError(f"Invalid aggregate function {function_id}. Expected 1–{len(self.AGGREGATE_FUNCTIONS)}.")
+
+        table = list(self.sensors.values()) if structure == 5 else self._actuator_rows(snapshot)
+        if len(indexes) == 0 or indexes == [0, 0]:
+            rows = table
+        elif len(indexes) == 2 and 0 < indexes[0] <= indexes[1] <= len(table):
+            rows = table[indexes[0] - 1:indexes[1]]
+        else:
+            raise InvalidIIDError("Invalid range for aggregate. Expected no indexes or a range i1, i2.")
+
+        if function_id == 1:
+            return len(rows)
+        if len(rows) == 0:
+            raise NoDevicesRegisteredError("No devices to aggregate.")
+
+        if structure == 5:
+            self._sample_sensors(rows)
+        # uma única passagem pela coluna; min/max/sum correm em C
+        column = [row.status for row in rows]
+        match function_id:
+            case 2: return min(column)
+            case 3: return max(column)
+            case 4: return round(sum(column) / len(column))
+            case 5: return sum(column)
+
+    # Estruturas 7 (sensores) e 8 (atuadores): leitura filtrada de uma coluna numérica
+    FILTER_OPERATORS = {
+        1: operator.eq,
+        2: operator.ne,
+        3: operator.lt,
+        4: operator.le,
+        5: operator.gt,
+        6: operator.ge,
+    }
+    # objetos numéricos das tabelas (iguais para sensores e atuadores) → atributo do dispositivo
+    NUMERIC_COLUMNS = {3: "status", 4: "min_value", 5: "max_value"}
+
+    def get_filtered_value(self, structure: int, object_id: int, indexes: list[int],
+                           snapshot: MIBSnapshot = None):
+        """
+        Reads a numeric column of the sensors (structure 7) or actuators (structure 8) table,
+        keeping only the rows where `column <operator> constant` holds.
+        IID format: [7|8, object, operator, constant], with object 3 (status), 4 (min) or 5 (max)
+        and operator 1 (==), 2 (!=), 3 (<), 4 (<=), 5 (>) or 6 (>=).
+        Sensors are sampled before their status is compared, as in a range GET.
+        :return: Flat list [index, value, index, value, ...] of the matching rows (1-based indexes).
+        """
+        if object_id not in self.NUMERIC_COLUMNS:
+            raise InvalidIIDError(f"Invalid object ID {object_id} for filtered read. Expected one of {list(self.NUMERIC_COLUMNS)}.")
+        if len(indexes) != 2:
+            raise InvalidIIDError("Invalid filtered read. Expected operator and constant.")
+        op_id, constant = indexes
+        if op_id not in self.FILTER_OPERATORS:
+            raise InvalidIIDError(f"Invalid filter operator {op_id}. Expected 1–{len(self.FILTER_OPERATORS)}.")
+        compare = self.FILTER_OPERATORS[op_id]
+        attribute = self.NUMERIC_COLUMNS[object_id]
+
+        rows = self.sensors.values() if structure == 7 else self._actuator_rows(snapshot)
+        if structure == 7 and attribute == "status":
+            self._sample_sensors(rows)
+        result = []
+        for index, row in enumerate(rows, start=1):
+            value = getattr(row, attribute)
+            if compare(value, constant):
+                result.append(index)
+                result.append(value)
+        return result
+
+    def get_delta_value(self, structure: int, object_id: int, indexes: list[int],
+                        snapshot: MIBSnapshot = None):
+        """
+        Returns only what changed since a version token, plus the new token.
+        IID formats:
+            [9|10, object, token]  sensors (9) or actuators (10): object 3 (status), 4 (min) or 5 (max)
+                                   → [new_token, index, value, index, value, ...] of the changed rows
+            [11, token]            Device group → [new_token, field_id, field_id, ...] of the changed fields
+        Token 0 returns everything. Sensors are not sampled: the values of their last reading are returned.
+        When the table did not change since the token the answer is just [token], without scanning it.
+        A token newer than the table (changes lost in a restart) is answered as token 0.
+        """
+        if structure == 11:
+            if len(indexes) != 0:
+                raise InvalidIIDError("Invalid delta read for Device group. Expected [11, token].")
+            token = object_id
+            current = snapshot.versions[0] if snapshot else self.device_versions.value
+            if current == token:
+                return [current]
+            if current < token:
+                token = 0
+            return [current] + sorted(f for f, v in self.device_field_versions.items() if v > token)
+
+        if object_id not in self.NUMERIC_COLUMNS:
+            raise InvalidIIDError(f"Invalid object ID {object_id} for delta read. Expected one of {list(self.NUMERIC_COLUMNS)}.")
+        if len(indexes) != 1 or indexes[0] < 0:
+            raise InvalidIIDError("Invalid delta read. Expected a version token.")
+        token = indexes[0]
+        if structure == 9:
+            counter, rows = self.sensor_versions, self.sensors.values()
+        elif snapshot:
+            counter, rows = None, snapshot.actuators
+        else:
+            counter, rows = self.actuator_versions, self.actuators.values()
+
+        current = counter.value if counter else snapshot.versions[1]
+        result = [current]
+        if current == token:
+            return result
+        if current < token:
+            token = 0   # versão posterior às conhecidas: ressincronização completa
+        attribute = self.NUMERIC_COLUMNS[object_id]
+        for index, row in enumerate(rows, start=1):
+            if row.version > token:
+                result.append(index)
+                result.append(getattr(row, attribute))
+        return result
+
+    def _actuator_rows(self, snapshot: MIBSnapshot = None):
+        """
+        Returns the actuators table as an indexable sequence: the rows of `snapshot`
+        when given, the live Actuator objects otherwise.
+        """
+        return snapshot.actuators if snapshot else list(self.actuators.values())
+
+    def get_actuator_field(self, object_id: int, index: int, actuators_list=None):
+        if actuators_list is None:
+            actuators_list = list(self.actuators.values())
         if len(actuators_list) == 0:
             raise NoDevicesRegisteredError("No actuators registered in the MIB.")
         match object_id:
@@ -250,7 +868,13 @@ class MIB:
             case 6: return actuators_list[index].last_control_time
             case _: raise InvalidIIDError(f"Unknown actuator object ID: {object_id}.")
 
-    def get_value_by_iid(self, iid: list[int]):
+    def get_value_by_iid(self, iid: list[int], snapshot: MIBSnapshot = None):
+        """
+        Reads the value of an IID.
+        :param snapshot: Optional MIBSnapshot (see snapshot()); when given, the Device group and
+                         the actuators are read from it, so that every IID of a request sees the
+                         same version of the MIB. Sensors are always sampled live.
+        """
 
         parsed_iid = parse_iid(iid)
 
@@ -264,7 +888,7 @@ class MIB:
             elif object_id < 0 or object_id > len(self.device_info):
                 raise InvalidIIDError(f"Invalid object ID {object_id} for Device group. Expected 1–{len(self.device_info)}.")
             else:
-                return self.get_device_value(object_id)
+                return self.get_device_value(object_id, snapshot)
         # Sensors group
         elif structure == 2:
             if not(0 <= object_id <= len(fields(Sensor))):
@@ -286,11 +910,16 @@ class MIB:
                     i1, i2 = indexes
                     if i1 == 0 and i2 == 0:
                         # return all sensors values for the given object_id
-                        return [self.get_sensor_field(object_id, i) for i in range(len(self.sensors))]
-                    elif i1 > 0 and i2 >= i1 and i2 <= len(self.sensors):
-                        return [self.get_sensor_field(object_id, i) for i in range(i1 - 1, i2)]
-                    else:
+                        i1, i2 = 1, len(self.sensors)
+                    elif not (i1 > 0 and i2 >= i1 and i2 <= len(self.sensors)):
                         raise InvalidIIDError(f"Invalid range for sensor indexes.")
+                    sensors_list = self._sensors_by_position()
+                    if object_id == 3 and i2 >= i1:
+                        # todos os sensores do intervalo são lidos de uma vez (em paralelo, com driver)
+                        rows = [sensors_list[i] for i in range(i1 - 1, i2)]
+                        self._sample_sensors(rows)
+                        return [sensor.status for sensor in rows]
+                    return [self.get_sensor_field(object_id, i, sensors_list) for i in range(i1 - 1, i2)]
                 else:
                     raise InvalidIIDError("Invalid number of indexes for Sensors group. Expected 0, 1, or 2 indexes.")
         elif structure == 3:
@@ -299,30 +928,50 @@ class MIB:
             elif object_id == 0:
                 return len(fields(Actuator))
             else:
+                rows = self._actuator_rows(snapshot)
                 if len(indexes) == 0:
-                    return self.get_actuator_field(object_id, 0)
+                    return self.get_actuator_field(object_id, 0, rows)
                 elif len(indexes) == 1:
                     index = indexes[0]
                     if index == 0:
-                        return len(self.actuators)
-                    elif 1 <= index <= len(self.actuators):
-                        return self.get_actuator_field(object_id, index - 1)
+                        return len(rows)
+                    elif 1 <= index <= len(rows):
+                        return self.get_actuator_field(object_id, index - 1, rows)
                     else:
-                        raise InvalidIIDError(f"Invalid actuator index {index}. Expected 1–{len(self.actuators)}.")
+                        raise InvalidIIDError(f"Invalid actuator index {index}. Expected 1–{len(rows)}.")
                 elif len(indexes) == 2:
                     i1, i2 = indexes
                     if i1 == 0 and i2 == 0:
                         # return all actuators values for the given object_id
-                        return [self.get_actuator_field(object_id, i) for i in range(len(self.actuators))]
-                    elif i1 > 0 and i2 >= i1 and i2 <= len(self.actuators):
-                        return [self.get_actuator_field(object_id, i) for i in range(i1 - 1, i2)]
+                        return [self.get_actuator_field(object_id, i, rows) for i in range(len(rows))]
+                    elif i1 > 0 and i2 >= i1 and i2 <= len(rows):
+                        return [self.get_actuator_field(object_id, i, rows) for i in range(i1 - 1, i2)]
                     else:
                         raise InvalidIIDError(f"Invalid range for actuator indexes.")
                 else:
                     raise InvalidIIDError("Invalid number of indexes for Actuators group. Expected 0, 1, or 2 indexes.")
+        # Sensor history
+        elif structure == 4:
+            return self.get_history_value(object_id, indexes)
+        # Aggregates over the sensor / actuator tables
+        elif structure in (5, 6):
+            return self.get_aggregate_value(structure, object_id, indexes, snapshot)
+        # Filtered reads of the sensor / actuator tables
+        elif structure in (7, 8):
+            return self.get_filtered_value(structure, object_id, indexes, snapshot)
+        # Delta reads (rows changed since a version token)
+        elif structure in (9, 10, 11):
+            return self.get_delta_value(structure, object_id, indexes, snapshot)
+        else:
+            raise InvalidIIDError(f"Unknown structure ID: {structure}.")
 
-    def set_value_by_iid(self, iid: list[int], value):
-        
+    def _plan_set(self, iid: list[int], value, actuators_list: list = None) -> tuple:
+        """
+        Validates a SET of one IID without changing the MIB.
+        :param actuators_list: list(self.actuators.values()), when already built by the caller
+        :return: ("device", field_id, value) or ("actuator", index, actuator, value_int),
+                 where index is 0-based.
+        """
         parsed_iid = parse_iid(iid)
  
         structure = parsed_iid["structure"]
@@ -336,13 +985,16 @@ class MIB:
             elif object_id < 0 or object_id > len(self.device_info):
                 raise InvalidIIDError(f"Invalid object ID {object_id} for Device group. Expected 1–{len(self.device_info)}.")
             else:
-                self.set_device_value(object_id, value)
-                return None
+                return ("device", object_id, self._validate_device_value(object_id, value))
 
         # Sensors group
         elif structure == 2:
             raise UnsupportedValueError("Sensors group is read-only. Cannot set values directly.")
 
+        # Sensor history, aggregates, filtered and delta reads
+        elif structure in (4, 5, 6, 7, 8, 9, 10, 11):
+            raise UnsupportedValueError(f"Structure {structure} is read-only.")
+
         # Actuators group
         elif structure == 3:
             if not(0 <= object_id <= len(fields(Actuator))):
@@ -362,14 +1014,85 @@ class MIB:
             value_int = int(value)
 
             if 1 <= index_int <= len(self.actuators):
-                print(f"Setting actuator status for index {index_int} with value {value_int}.")
-                actuator = self.get_actuator(list(self.actuators.keys())[index_int - 1])
-                updated = actuator.configure_value(value_int)
-                print(f"Updated actuator status: {updated}")
-                if not updated:
+                if actuators_list is None:
+                    actuator = self._actuator_at(index_int - 1)
+                else:
+                    actuator = actuators_list[index_int - 1]
+                if not actuator.min_value <= value_int <= actuator.max_value:
                     raise UnsupportedValueError("Invalid value for actuator status.")
-                self.device_info["lastTimeUpdated"] = generate_date_timestamp()
-                return None
+                return ("actuator", index_int - 1, actuator, value_int)
             else:
                 raise InvalidIIDError(f"Invalid actuator index {index_int}. Expected 1–{len(self.actuators)}.")
+
+    def _apply_plans(self, plans: list):
+        """
+        Applies SETs already validated by _plan_set() as a single change: one timestamp
+        for every lastTimeUpdated / last_control_time, one new version of the actuators
+        table shared by all the actuators written and one of the Device table shared by
+        all the Device fields changed.
+        """
+        timestamp = generate_date_timestamp()
+        actuator_plans = [plan for plan in plans if plan[0] == "actuator"]
+        changed = set()
+        device_changes = []
+        for plan in plans:
+            if plan[0] == "device":
+                fields_changed = self._apply_device_value(plan[1], plan[2], timestamp)
+                changed.update(fields_changed)
+                if fields_changed and plan[1] != 10:
+                    device_changes.append(([1, plan[1]], plan[2]))
+
+        if actuator_plans:
+            version = self.actuator_versions.bump()
+            for _, index, actuator, value_int in actuator_plans:
+                actuator.configure_value(value_int, timestamp, version)
+                self._dirty_actuators[index] = actuator
+            self._dirty_bumps += 1
+            self.device_info["lastTimeUpdated"] = timestamp
+            changed.add(8)
+        if changed:
+            self._touch_device_fields(*sorted(changed))
+        for iid, value in device_changes:
+            self._notify_observers(iid, value)
+        for _, index, _, value_int in actuator_plans:
+            self._notify_observers([3, 3, index + 1], value_int)
+
+    @_writer
+    def set_value_by_iid(self, iid: list[int], value):
+        """
+        Sets the value of one IID.
+        :raises LSNMPvSError: if the IID is not writable or the value is invalid.
+        """
+        plan = self._plan_set(iid, value)
+        if plan[0] == "actuator":
+            print(f"Setting actuator status for index {plan[1] + 1} with value {plan[3]}.")
+        self._apply_plans([plan])
+        return None
+
+    @_writer
+    def set_values_by_iid(self, pairs: list, atomic: bool = False) -> list:
+        """
+        Batched SET: validates every (iid, value) pair first and then applies the valid ones
+        in a single commit (one timestamp, one version bump, one published snapshot), so that
+        e.g. a scene change touching hundreds of actuators is one cheap operation.
+        :param pairs: list of (iid, value) tuples
+        :param atomic: if True, nothing is applied when any pair is invalid (all-or-nothing)
+        :return: List with one entry per pair: None if it was applied, otherwise the
+                 LSNMPvSError explaining why it was not.
+        """
+        actuators_list = self._actuators_by_position()
+        plans = []
+        errors = []
+        for iid, value in pairs:
+            try:
+                plans.append(self._plan_set(iid, value, actuators_list))
+                errors.append(None)
+            except LSNMPvSError as e:
+                errors.append(e)
+
+        if atomic and len(plans) != len(pairs):
+            aborted = UnsupportedValueError("Not applied: another value of the atomic SET is invalid.")
+            return [e if e is not None else aborted for e in errors]
+        self._apply_plans(plans)
+        return errors
                 
@@ -0,0 +1,285 @@
+# loadgen.py
+"""
+Open-loop load generator for L-SNMPvS agents.
+
+Requests are sent on a fixed schedule (request k at start + k / rate), whatever the agent
+answers: latency is measured from the instant a request was *due*, not from when it was
+actually sent, so a stalled agent (or generator) cannot hide its queueing delay by slowing
+the request stream down (coordinated omission). Replies are matched to requests by their
+Message-Identifier; requests without a reply after --timeout seconds are counted as lost.
+
+Every process sends from its own set of UDP source ports (--ports) to every agent given
+(--agent, repeatable), and the latency histograms and counters of all processes are merged
+at the end.
+
+Uso: python loadgen.py --agent localhost:16100 [--agent host:port ...] [--rate 1000]
+                       [--duration 10] [--iid 1.1 ...] [--set 3.3.1=1 ...] [--set-ratio 0.1]
+                       [--processes 1] [--ports 4] [--timeout 1.0] [--json results.json]
+"""
+import argparse
+import json
+import selectors
+import socket
+import sys
+import time
+from collections import Counter, OrderedDict
+from protocol import Protocol
+from exceptions import LSNMPvSError
+from utils.histogram import LatencyHistogram
+from utils.timestamp_utils import generate_date_timestamp
+
+# Message-Identifier provisório, substituído em cada pedido (os pedidos são pré-codificados)
+PLACEHOLDER_ID = "LOADGENPLACEHOLD"
+# Percentis mostrados no relatório
+PERCENTILES = (50, 90, 99, 99.9, 99.99)
+ERROR_NAMES = {cls.code: cls.__name__ for cls in LSNMPvSError.__subclasses__()}
+
+
+def parse_iid(text: str) -> list[int]:
+    return [int(part) for part in text.split(".")]
+
+
+def parse_address(text: str) -> tuple[str, int]:
+    host, _, port = text.rpartition(":")
+    return host or "localhost", int(port)
+
+
+def build_template(protocol: Protocol, msg_type: str, iids: list, values: list = None) -> tuple[bytes, bytes]:
+    """
+    Encodes a request once, returning the bytes before and after its Message-Identifier.
+    """
+    raw = protocol.encode_message(msg_type, generate_date_timestamp(), PLACEHOLDER_ID, iids, values)
+    head, tail = raw.split(PLACEHOLDER_ID.encode("ascii"), 1)
+    return head, tail
+
+
+def run_worker(config: dict) -> dict:
+    """
+    Sends config["count"] requests at config["rate"] per second and collects the replies.
+    Runs in its own process when several are used (the config and result are plain dicts).
+    :return: Merged counters and the latency histogram (LatencyHistogram.to_dict()).
+    """
+    protocol = Protocol()
+    agents = [tuple(address) for address in config["agents"]]
+    get_template = build_template(protocol, "G", config["get_iids"]) if config["get_iids"] else None
+    set_template = None
+    if config["set_pairs"]:
+        set_template = build_template(protocol, "S", [iid for iid, _ in config["set_pairs"]],
+                                      [("I" if value.lstrip("-").isdigit() else "S", [value])
+                                       for _, value in config["set_pairs"]])
+    set_ratio = config["set_ratio"] if get_template else 1.0
+
+    selector = selectors.DefaultSelector()
+    sockets = []
+    for _ in range(config["ports"]):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        sock.bind((config["bind"], 0))
+        sock.setblocking(False)
+        selector.register(sock, selectors.EVENT_READ)
+        sockets.append(sock)
+
+    histogram = LatencyHistogram()
+    errors = Counter()               # código de erro (por valor da resposta) -> ocorrências
+    counters = Counter()
+    pending = OrderedDict()          # message_id -> instante previsto de envio (ns), por ordem de envio
+    prefix = f"{config['worker']:02x}"
+    interval_ns = int(1e9 / config["rate"])
+    count = config["count"]
+    timeout_ns = int(config["timeout"] * 1e9)
+    clock = time.perf_counter_ns
+    # todos os processos começam no mesmo instante (relógio de parede partilhado)
+    time.sleep(max(0.0, config["start_at"] - time.time()))
+    start = clock()
+    sent = 0
+    max_lag_ns = 0
+    last_send = start
+
+    def receive(sock, now):
+        while True:
+            try:
+                data = sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                counters["receive errors"] += 1   # p.ex. ICMP port unreachable
+                return
+            try:
+                _, message_id = protocol.peek_header(data)
+            except (LSNMPvSError, UnicodeDecodeError):
+                counters["undecodable replies"] += 1
+                continue
+            due = pending.pop(message_id, None)
+            if due is None:
+                counters["late replies" if message_id.startswith(prefix) else "unmatched replies"] += 1
+                continue
+            histogram.record((now - due) // 1000)
+            counters["received"] += 1
+            try:
+                error_list = protocol.decode_message(data)["error_list"]
+            except (LSNMPvSError, UnicodeDecodeError):
+                counters["undecodable replies"] += 1
+                continue
+            errors.update(error_list or [0])
+
+    while True:
+        now = clock()
+        while sent < count and start + sent * interval_ns <= now:
+            due = start + sent * interval_ns
+            max_lag_ns = max(max_lag_ns, now - due)
+            is_set = set_template is not None and int((sent + 1) * set_ratio) > int(sent * set_ratio)
+            head, tail = set_template if is_set else get_template
+            message_id = f"{prefix}{sent:014x}"
+            agent = agents[sent % len(agents)]
+            sock = sockets[(sent // len(agents)) % len(sockets)]
+            try:
+                sock.sendto(head + message_id.encode("ascii") + tail, agent)
+                pending[message_id] = due
+                counters["sent"] += 1
+                counters["sent SET" if is_set else "sent GET"] += 1
+            except OSError:
+                counters["send errors"] += 1
+            sent += 1
+            now = clock()
+            last_send = now
+
+        # pedidos sem resposta há mais de timeout segundos são dados como perdidos
+        while pending:
+            message_id, due = next(iter(pending.items()))
+            if now - due < timeout_ns:
+                break
+            del pending[message_id]
+            counters["lost"] += 1
+
+        if sent >= count and not pending:
+            break
+        if sent < count:
+            wait_ns = start + sent * interval_ns - now
+        else:
+            wait_ns = next(iter(pending.values())) + timeout_ns - now
+        for key, _ in selector.select(max(0, wait_ns) / 1e9):
+            receive(key.fileobj, clock())
+
+    for sock in sockets:
+        selector.unregister(sock)
+        sock.close()
+    elapsed = (last_send - start + interval_ns) / 1e9   # duração do envio (sem a espera final)
+    counters["max send lag us"] = max_lag_ns // 1000
+    return {"histogram": histogram.to_dict(), "errors": dict(errors), "counters": dict(counters),
+            "elapsed": elapsed}
+
+
+def run(agents: list, rate: float, duration: float, get_iids: list, set_pairs: list = None,
+        set_ratio: float = 0.0, processes: int = 1, ports: int = 4, timeout: float = 1.0,
+        bind: str = "0.0.0.0") -> dict:
+    """
+    Runs the load with `processes` worker processes, each sending rate / processes requests
+    per second from `ports` source ports, and merges their results.
+    :param agents: list of (host, port) of the agents, requests are spread round-robin over them
+    :param get_iids: IIDs read by each GET request
+    :param set_pairs: (iid, value) written by each SET request
+    :param set_ratio: fraction of the requests that are SETs
+    :return: Merged result (see report()).
+    """
+    start_at = time.time() + 0.2 + 0.05 * processes
+    configs = [{
+        "worker": worker, "agents": agents, "rate": rate / processes,
+        "count": max(1, int(rate * duration / processes)), "get_iids": get_iids,
+        "set_pairs": set_pairs or [], "set_ratio": set_ratio, "ports": ports, "timeout": timeout,
+        "bind": bind, "start_at": start_at,
+    } for worker in range(processes)]
+    if processes == 1:
+        results = [run_worker(configs[0])]
+    else:
+        import multiprocessing
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(run_worker, configs)
+
+    histogram = LatencyHistogram()
+    errors, counters = Counter(), Counter()
+    for result in results:
+        histogram.merge(LatencyHistogram.from_dict(result["histogram"]))
+        errors.update(result["errors"])
+        lag = result["counters"].pop("max send lag us", 0)
+        counters["max send lag us"] = max(counters["max send lag us"], lag)
+        counters.update(result["counters"])
+    return {"target_rate": rate, "duration": max(r["elapsed"] for r in results), "processes": processes,
+            "histogram": histogram, "errors": dict(errors), "counters": dict(counters)}
+
+
+def report(result: dict) -> dict:
+    """
+    Prints a summary of a run.
+    :return: The summary, as a JSON-serializable dict.
+    """
+    counters, histogram = result["counters"], result["histogram"]
+    sent = counters.get("sent", 0)
+    lost = counters.get("lost", 0)
+    summary = {
+        "target_rate": result["target_rate"],
+        "achieved_rate": round(sent / result["duration"], 1) if result["duration"] else 0,
+        "sent": sent,
+        "received": counters.get("received", 0),
+        "lost": lost,
+        "loss_percent": round(100 * lost / sent, 3) if sent else 0,
+        "latency_us": {f"p{p:g}": histogram.percentile(p) for p in PERCENTILES},
+        "errors": {ERROR_NAMES.get(code, "ok" if code == 0 else str(code)): n
+                   for code, n in sorted(result["errors"].items())},
+        "counters": counters,
+        "histogram": histogram.to_dict(),
+    }
+    summary["latency_us"].update(min=histogram.min, mean=histogram.mean and round(histogram.mean, 1),
+                                 max=histogram.max)
+
+    print(f"target {summary['target_rate']:,.0f} req/s, sent {sent:,} at {summary['achieved_rate']:,.0f} req/s "
+          f"({result['processes']} process(es))")
+    print(f"received {summary['received']:,}, lost {lost:,} ({summary['loss_percent']}%)")
+    if histogram.count:
+        print("latency (from scheduled send):")
+        for name, value in summary["latency_us"].items():
+            print(f"  {name:<8} {value / 1000:10.3f} ms")
+    print("values by error code:")
+    for name, n in summary["errors"].items():
+        print(f"  {name:<28} {n:,}")
+    extra = {k: v for k, v in counters.items() if k not in ("sent", "received", "lost")}
+    for name, n in sorted(extra.items()):
+        print(f"  {name:<28} {n:,}")
+    if counters.get("max send lag us", 0) > 10_000:
+        print("warning: the generator fell behind its schedule by up to "
+              f"{counters['max send lag us'] / 1000:.1f} ms; use more --processes")
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--agent", action="append", required=True, help="host:port (repeatable)")
+    parser.add_argument("--rate", type=float, default=1000.0, help="requests per second (all processes)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of sending")
+    parser.add_argument("--iid", action="append", help="IID read by GETs, e.g. 1.1 (repeatable)")
+    parser.add_argument("--set", action="append", default=[], help="IID=value written by SETs (repeatable)")
+    parser.add_argument("--set-ratio", type=float, default=0.0, help="fraction of the requests that are SETs")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--ports", type=int, default=4, help="source ports per process")
+    parser.add_argument("--timeout", type=float, default=1.0, help="seconds before a request is lost")
+    parser.add_argument("--bind", default="0.0.0.0", help="local address of the source ports")
+    parser.add_argument("--json", help="write the summary (with the histogram) to this file")
+    args = parser.parse_args(argv)
+
+    get_iids = [parse_iid(text) for text in args.iid or (["1.1"] if not args.set else [])]
+    set_pairs = []
+    for text in args.set:
+        iid, _, value = text.partition("=")
+        set_pairs.append((parse_iid(iid), value))
+    set_ratio = args.set_ratio if set_pairs else 0.0
+
+    result = run([parse_address(a) for a in args.agent], args.rate, args.duration, get_iids,
+                 set_pairs, set_ratio, args.processes, args.ports, args.timeout, args.bind)
+    summary = report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+# main.py
+"""
+Starts an L-SNMPvS agent from a JSON configuration file.
+
+Only what the agent needs is imported at startup: the pretty-printer (rich, optional)
+and the profiler are imported when their options are used, and the startup time
+(from this script starting to the agent ready to receive requests) is reported.
+
+Uso: python main.py [--config agent.example.json] [--show-mib] [--profile-startup] [--check]
+"""
+import time
+_START = time.perf_counter()
+
+import argparse
+import gc
+import json
+import sys
+
+# Opções aceites no ficheiro de configuração (e os seus valores por omissão)
+DEFAULT_CONFIG = {
+    "host": "localhost",
+    "port": 16100,
+    "manager_address": None,        # [host, port] para beacons e notificações
+    "beacons": True,                # enviar beacons a cada beaconRate segundos
+    "device_file": None,            # JSONL / CSV com os dispositivos (ver devices.loader)
+    "snapshot_path": None,
+    "snapshot_interval": 60.0,
+    "journal_path": None,
+    "journal_commit_interval": 0.05,
+    "error_reply_rate": 10.0,
+    "error_reply_burst": 20,
+    "request_rate": None,
+    "request_burst": None,
+    "max_queue_depth": 1024,
+    "notification_window": 0.5,
+    "atomic_sets": False,
+    "capture_path": None,           # grava o tráfego recebido (ver replay.py)
+    "profile_dir": "profiles",      # resultados das sessões de profiling (campo 1.11 da MIB)
+    "profile_max_seconds": 60.0,
+    "sensor_read_workers": 8,       # leituras em paralelo de sensores com driver (ver devices.drivers)
+    "shared_mib_name": None,        # exporta a MIB para memória partilhada (ver shared_mib.py)
+    "sensor_feed": None,            # ficheiro de valores de sensores escrito por outro processo (ver devices.feed)
+}
+
+# Opções que não são argumentos de Agent
+MAIN_OPTIONS = ("beacons",)
+
+
+def load_config(path: str = None) -> dict:
+    """
+    Reads a JSON configuration file on top of DEFAULT_CONFIG.
+    :param path: file to read (None = defaults only)
+    :return: Complete configuration.
+    :raises ValueError: if the file has unknown options
+    """
+    config = dict(DEFAULT_CONFIG)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            overrides = json.load(f)
+        unknown = sorted(set(overrides) - set(DEFAULT_CONFIG))
+        if unknown:
+            raise ValueError(f"Unknown configuration options: {', '.join(unknown)}.")
+        config.update(overrides)
+    if config["manager_address"] is not None:
+        config["manager_address"] = tuple(config["manager_address"])
+    return config
+
+
+def build_agent(config: dict):
+    """
+    Creates the Agent described by a configuration.
+    """
+    from agent import Agent   # importado aqui para que --help e erros de configuração sejam imediatos
+    options = {key: value for key, value in config.items() if key not in MAIN_OPTIONS}
+    return Agent(**options)
+
+
+def close_agent(agent):
+    """
+    Releases what an agent built by build_agent holds: stops its profiling session (writing
+    its results) and closes its journal, capture, sensor reader, shared memory export, sensor feed and socket.
+    """
+    if agent.journal:
+        agent.journal.close()
+    if agent.capture:
+        agent.capture.close()
+    if agent.profiling:
+        agent.mib.set_device_value(11, 0)
+    agent.write_profiles()
+    agent.mib.sensor_reader.close()
+    if agent.shared_mib:
+        agent.shared_mib.close()
+    if agent.sensor_feed:
+        agent.sensor_feed.close()
+    agent.sock.close()
+
+
+def show_mib(mib):
+    """
+    Prints the state of the MIB, as a table if rich is installed.
+    """
+    try:
+        from rich.console import Console
+        from rich.table import Table
+    except ImportError:
+        from pprint import pprint
+        pprint(mib.get_mib_state())
+        return
+    table = Table(title=f"{mib.device_info['id']} ({mib.device_info['type']})")
+    for column in ("table", "id", "type", "range", "status"):
+        table.add_column(column)
+    for sensor in mib.sensors.values():
+        table.add_row("sensor", sensor.id, sensor.type, f"{sensor.min_value}..{sensor.max_value}", str(sensor.status))
+    for actuator in mib.actuators.values():
+        table.add_row("actuator", actuator.id, actuator.type, f"{actuator.min_value}..{actuator.max_value}",
+                      str(actuator.status))
+    Console().print(table)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", help="JSON configuration file (see DEFAULT_CONFIG)")
+    parser.add_argument("--show-mib", action="store_true", help="print the MIB after startup")
+    parser.add_argument("--profile-startup", action="store_true", help="profile the creation of the agent")
+    parser.add_argument("--check", action="store_true", help="start the agent and exit (startup time only)")
+    args = parser.parse_args(argv)
+
+    try:
+        config = load_config(args.config)
+    except (OSError, ValueError) as e:
+        print(f"Invalid configuration: {e}", file=sys.stderr)
+        return 2
+
+    # o GC cíclico fica parado durante o arranque: os dispositivos criados ficam todos vivos,
+    # e as suas passagens sobre a MIB a crescer tornariam quadrática a carga de um device_file grande
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        if args.profile_startup:
+            import cProfile
+            import pstats
+            profiler = cProfile.Profile()
+            agent = profiler.runcall(build_agent, config)
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(15)
+        else:
+            agent = build_agent(config)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    if config["beacons"] and agent.manager_address:
+        # corre no loop de listen(), tal como os SETs de beaconRate que o reagendam
+        from scheduler import BeaconScheduler
+        agent.beacons = BeaconScheduler()
+        agent.beacons.add_agent(agent)
+
+    startup_ms = (time.perf_counter() - _START) * 1000
+    host, port = agent.sock.getsockname()[:2]
+    print(f"Agent {agent.mib.device_info['id']} listening on {host}:{port} "
+          f"({len(agent.mib.sensors)} sensors, {len(agent.mib.actuators)} actuators) "
+          f"- started in {startup_ms:.1f} ms", file=sys.stderr)
+
+    if args.show_mib:
+        show_mib(agent.mib)
+    if args.check:
+        close_agent(agent)
+        return 0
+
+    try:
+        agent.listen()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        close_agent(agent)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
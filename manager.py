@@ -0,0 +1,261 @@
+# manager.py
+"""
+Manager side of L-SNMPvS: a client that sends GET and SET requests to agents and waits for
+their responses, and receives the notifications (and beacons) agents send to its address.
+
+L-SNMPvS has no PDU to subscribe: an agent sends its notifications to its manager_address,
+or to the address given to Agent.subscribe(), so the client's address must be configured
+there for its listeners to receive them.
+
+Uso: python manager.py HOST:PORT get 2.3.1 [1.1 ...]
+     python manager.py HOST:PORT set 3.3.1=1 [...] [--timeout 1.0] [--retries 2]
+"""
+import argparse
+import os
+import socket
+import sys
+from protocol import Protocol
+from exceptions import LSNMPvSError
+from utils.clock import monotonic
+from utils.timestamp_utils import generate_date_timestamp
+
+
+class RequestTimeoutError(Exception):
+    """
+    An agent did not answer a request (nor any of its retransmissions) in time.
+    """
+
+
+class PendingRequest:
+    """
+    A request sent with ManagerClient.send() whose response has not arrived yet.
+    """
+    __slots__ = ("address", "data", "deadline", "retries", "callback")
+
+    def __init__(self, address: tuple, data: bytes, deadline: float, retries: int, callback):
+        self.address = address
+        self.data = data
+        self.deadline = deadline    # instante da próxima retransmissão (ou da desistência)
+        self.retries = retries      # retransmissões que ainda faltam
+        self.callback = callback
+
+
+class ManagerClient:
+    """
+    Sends requests from one UDP socket and matches the responses by Message-Identifier.
+    request() is synchronous: it returns when the response arrives, retransmitting the same
+    PDU after each timeout. send() is not: the response is handed to a callback by poll(),
+    which an event loop calls when the socket is readable and every time_until_next()
+    seconds (to retransmit). Notifications received meanwhile (or drained with poll()) are
+    handed to the listener registered for the agent that sent them.
+    """
+
+    def __init__(self, bind: tuple = ("0.0.0.0", 0), timeout: float = 1.0, retries: int = 2):
+        """
+        :param bind: local (host, port) of the socket (port 0 = any free port)
+        :param timeout: seconds to wait for a response before retransmitting
+        :param retries: retransmissions of a request before giving up
+        """
+        self.protocol = Protocol()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(bind)
+        self.timeout = timeout
+        self.retries = retries
+        self.listeners = {}   # endereço do agente -> função(decoded) das notificações
+        self.default_listener = None
+        self.pending = {}     # Message-Identifier -> PendingRequest dos pedidos de send()
+        self.counters = {"requests": 0, "retransmissions": 0, "timeouts": 0, "notifications": 0,
+                         "unmatched": 0, "undecodable": 0}
+
+    @property
+    def address(self) -> tuple:
+        """
+        Local (host, port) of the client: where agents must send their notifications.
+        """
+        return self.sock.getsockname()
+
+    def listen(self, agent_address: tuple, listener):
+        """
+        Hands the notifications of an agent to listener(decoded) (None = stop). Notifications
+        of agents without a listener go to default_listener, if set.
+        """
+        key = (socket.gethostbyname(agent_address[0]), agent_address[1])   # endereço de origem dos datagramas
+        if listener is None:
+            self.listeners.pop(key, None)
+        else:
+            self.listeners[key] = listener
+
+    def request(self, address: tuple, msg_type: str, iids: list, values: list = None) -> dict:
+        """
+        Sends a request and waits for its response.
+        :param values: (val_type, val_parts) pairs of a SET
+        :return: The decoded Response PDU.
+        :raises RequestTimeoutError: if no response arrives after the retransmissions
+        """
+        message_id = os.urandom(8).hex()
+        data = self.protocol.encode_message(msg_type, generate_date_timestamp(), message_id, iids, values)
+        self.counters["requests"] += 1
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.counters["retransmissions"] += 1
+            self.sock.sendto(data, address)
+            reply = self._wait(message_id, monotonic() + self.timeout)
+            if reply is not None:
+                return reply
+        self.counters["timeouts"] += 1
+        raise RequestTimeoutError(f"No response from {address[0]}:{address[1]} to {message_id}.")
+
+    def send(self, address: tuple, msg_type: str, iids: list, values: list = None, callback=None) -> str:
+        """
+        Sends a request without waiting for its response: poll() calls callback(decoded)
+        when it arrives, or callback(None) when the retransmissions are exhausted.
+        :param values: (val_type, val_parts) pairs of a SET
+        :return: The Message-Identifier of the request.
+        """
+        message_id = os.urandom(8).hex()
+        data = self.protocol.encode_message(msg_type, generate_date_timestamp(), message_id, iids, values)
+        self.counters["requests"] += 1
+        self.sock.sendto(data, address)
+        self.pending[message_id] = PendingRequest(address, data, monotonic() + self.timeout, self.retries, callback)
+        return message_id
+
+    def cancel(self, message_id: str):
+        """
+        Forgets a request of send(): its callback is not called.
+        """
+        self.pending.pop(message_id, None)
+
+    def time_until_next(self) -> float | None:
+        """
+        Seconds until poll() must run to retransmit (or give up on) a request of send()
+        (None = none pending).
+        """
+        if not self.pending:
+            return None
+        return max(0.0, min(pending.deadline for pending in self.pending.values()) - monotonic())
+
+    def _expire(self):
+        """
+        Retransmits the requests of send() whose timeout passed, or gives up on them.
+        """
+        now = monotonic()
+        for message_id, pending in list(self.pending.items()):
+            if pending.deadline > now:
+                continue
+            if pending.retries:
+                pending.retries -= 1
+                pending.deadline = now + self.timeout
+                self.counters["retransmissions"] += 1
+                self.sock.sendto(pending.data, pending.address)
+            else:
+                del self.pending[message_id]
+                self.counters["timeouts"] += 1
+                pending.callback(None)
+
+    def get(self, address: tuple, iids: list) -> dict:
+        return self.request(address, 'G', iids)
+
+    def set(self, address: tuple, iids: list, values: list) -> dict:
+        return self.request(address, 'S', iids, values)
+
+    def _wait(self, message_id: str, deadline: float) -> dict | None:
+        """
+        Receives until the response to `message_id` arrives or the deadline passes.
+        """
+        while True:
+            timeout = deadline - monotonic()
+            if timeout <= 0:
+                return None
+            self.sock.settimeout(timeout)
+            try:
+                data, addr = self.sock.recvfrom(65536)
+            except socket.timeout:
+                return None
+            decoded = self._dispatch(data, addr)
+            if decoded is not None and decoded["message_id"] == message_id:
+                return decoded
+
+    def _dispatch(self, data: bytes, addr) -> dict | None:
+        """
+        Decodes a datagram: notifications go to their listener, responses to requests of
+        send() to their callback, other responses are returned.
+        """
+        try:
+            decoded = self.protocol.decode_message(data)
+        except (LSNMPvSError, UnicodeDecodeError):
+            self.counters["undecodable"] += 1
+            return None
+        if decoded["type"] == 'N':
+            self.counters["notifications"] += 1
+            listener = self.listeners.get(addr[:2], self.default_listener)
+            if listener is not None:
+                listener(decoded)
+            return None
+        if decoded["type"] != 'R':
+            self.counters["unmatched"] += 1
+            return None
+        pending = self.pending.pop(decoded["message_id"], None)
+        if pending is not None:
+            pending.callback(decoded)
+            return None
+        return decoded
+
+    def poll(self) -> int:
+        """
+        Handles, without blocking, the notifications and responses waiting in the socket
+        (responses that arrive after their request gave up are discarded), then retransmits
+        the requests of send() that are due.
+        :return: Number of datagrams read.
+        """
+        self.sock.setblocking(False)
+        count = 0
+        try:
+            while True:
+                try:
+                    data, addr = self.sock.recvfrom(65536)
+                except (BlockingIOError, InterruptedError):
+                    break
+                count += 1
+                if self._dispatch(data, addr) is not None:
+                    self.counters["unmatched"] += 1
+        finally:
+            self.sock.setblocking(True)
+        if self.pending:
+            self._expire()
+        return count
+
+    def close(self):
+        self.sock.close()
+
+
+def main(argv=None) -> int:
+    from loadgen import parse_iid, parse_address
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("agent", help="host:port of the agent")
+    parser.add_argument("operation", choices=("get", "set"))
+    parser.add_argument("iids", nargs="+", help="IIDs to get (2.3.1) or IID=value pairs to set (3.3.1=1)")
+    parser.add_argument("--timeout", type=float, default=1.0)
+    parser.add_argument("--retries", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    client = ManagerClient(timeout=args.timeout, retries=args.retries)
+    try:
+        if args.operation == "get":
+            reply = client.get(parse_address(args.agent), [parse_iid(text) for text in args.iids])
+        else:
+            pairs = [text.split("=", 1) for text in args.iids]
+            reply = client.set(parse_address(args.agent), [parse_iid(iid) for iid, _ in pairs],
+                               [('I', [value]) for _, value in pairs])
+    except RequestTimeoutError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        client.close()
+    errors = reply["error_list"] or [0] * len(reply["iid_list"])
+    for iid, (_, parts), error in zip(reply["iid_list"], reply["value_list"], errors):
+        print(".".join(map(str, iid)), " ".join(parts) if not error else f"error {error}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
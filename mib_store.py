@@ -0,0 +1,287 @@
+# mib_store.py
+"""
+Compact binary snapshot of a MIB, used for warm restarts.
+
+Layout of the file (little-endian):
+    header            HEADER
+    sensor records    SENSOR_RECORD x n_sensors
+    actuator records  ACTUATOR_RECORD x n_actuators
+    string blob       UTF-8 strings referenced by (offset, length) from the records
+
+Records have a fixed size, so the i-th device is found by arithmetic. The file is read
+through mmap: loading only parses the header, and each device is decoded (and its pages
+read from disk) the first time it is accessed.
+"""
+
+import mmap
+import os
+import struct
+from collections import namedtuple
+from collections.abc import MutableMapping
+from devices.sensor import Sensor
+from devices.actuator import Actuator
+
+MAGIC = b"LMIBSNP1"
+FORMAT_VERSION = 2
+
+# magic, versão, nº sensores, nº atuadores, beaconRate, operationalStatus, id, type, offset do blob,
+# versões das tabelas Device, sensores e atuadores (os tokens das leituras delta sobrevivem ao restart)
+HEADER = struct.Struct("<8sHIIqqIHIHQqqq")
+# id, type, min, max, version
+SENSOR_RECORD = struct.Struct("<IHIHqqq")
+# id, type, min, max, status, last_control_time, version
+ACTUATOR_RECORD = struct.Struct("<IHIHqqqIHq")
+
+# Vista só de leitura de um dispositivo ainda não materializado (mesmos atributos que Sensor / Actuator)
+DeviceRecord = namedtuple("DeviceRecord", "id type min_value max_value status last_control_time version")
+
+
+class SnapshotFormatError(ValueError):
+    """
+    The file is not a MIB snapshot written by a compatible version.
+    """
+
+
+class _StringBlob:
+    """
+    Collects the strings of a snapshot being written, storing repeated ones (e.g. types) once.
+    """
+
+    def __init__(self):
+        self.data = bytearray()
+        self.refs = {}
+
+    def add(self, text: str | None) -> tuple[int, int]:
+        if not text:
+            return 0, 0
+        ref = self.refs.get(text)
+        if ref is None:
+            raw = text.encode("utf-8")
+            if len(raw) > 0xFFFF:
+                raise ValueError(f"String too long for a MIB snapshot: {text[:32]}...")
+            ref = (len(self.data), len(raw))
+            self.data += raw
+            self.refs[text] = ref
+        return ref
+
+
+class SnapshotFile:
+    """
+    A snapshot file mapped in memory.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mm) < HEADER.size:
+            raise SnapshotFormatError(f"{path} is too short to be a MIB snapshot.")
+        (magic, version, self.n_sensors, self.n_actuators, self.beacon_rate, self.operational_status,
+         id_off, id_len, type_off, type_len, self.blob_offset, self.device_version, self.sensor_version,
+         self.actuator_version) = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise SnapshotFormatError(f"{path} is not a MIB snapshot (format {FORMAT_VERSION}).")
+        self.sensors_offset = HEADER.size
+        self.actuators_offset = self.sensors_offset + self.n_sensors * SENSOR_RECORD.size
+        if self.actuators_offset + self.n_actuators * ACTUATOR_RECORD.size > self.blob_offset \
+                or self.blob_offset > len(self.mm):
+            raise SnapshotFormatError(f"{path} is truncated.")
+        self.device_id = self.string(id_off, id_len)
+        self.device_type = self.string(type_off, type_len)
+
+    def string(self, offset: int, length: int) -> str | None:
+        if length == 0:
+            return None
+        start = self.blob_offset + offset
+        return self.mm[start:start + length].decode("utf-8")
+
+
+class LazyDeviceTable(MutableMapping):
+    """
+    Sensors or actuators table (id -> device) backed by the records of a SnapshotFile.
+
+    Behaves like the dict used by the MIB, in registration order, but each device object is
+    only built the first time it is accessed; devices registered afterwards are appended.
+    Positional access (at) costs O(1); the first lookup by id builds the id index.
+    """
+
+    def __init__(self, snapshot: SnapshotFile, offset: int, count: int, record: struct.Struct, build,
+                 version_counter=None):
+        """
+        :param snapshot: file holding the records
+        :param offset: position of the first record in the file
+        :param count: number of records
+        :param record: Struct of one record
+        :param build: function build(fields, snapshot) returning the device of a record
+        :param version_counter: VersionCounter of the MIB table, shared with every device built
+        """
+        self._snapshot = snapshot
+        self._version_counter = version_counter
+        self._offset = offset
+        self._record = record
+        self._build = build
+        self._count = count
+        self._objects = [None] * count   # posição -> dispositivo já materializado
+        self._index = None               # id -> posição (construído no primeiro acesso por id)
+
+    def _fields(self, pos: int) -> tuple:
+        return self._record.unpack_from(self._snapshot.mm, self._offset + pos * self._record.size)
+
+    def key_at(self, pos: int) -> str:
+        """
+        Returns the id of the device at position `pos` without building it or the id index.
+        """
+        device = self._objects[pos]
+        if device is not None:
+            return device.id
+        fields = self._fields(pos)
+        return self._snapshot.string(fields[0], fields[1])
+
+    def _positions(self) -> dict:
+        if self._index is None:
+            self._index = {self.key_at(pos): pos for pos in range(len(self._objects))}
+        return self._index
+
+    @property
+    def materialized(self) -> int:
+        """
+        Number of devices of the file already turned into objects.
+        """
+        return sum(1 for device in self._objects[:self._count] if device is not None)
+
+    def at(self, pos: int):
+        """
+        Returns the device at position `pos` (0-based, registration order).
+        """
+        device = self._objects[pos]
+        if device is None:
+            device = self._build(self._fields(pos), self._snapshot)
+            if self._version_counter is not None:
+                device.version_counter = self._version_counter
+            self._objects[pos] = device
+        return device
+
+    def peek_values(self):
+        """
+        Iterates like values(), but devices not yet materialized are returned as read-only
+        DeviceRecord views decoded from the file, without building their objects.
+        """
+        string = self._snapshot.string
+        for pos, device in enumerate(self._objects):
+            if device is not None:
+                yield device
+                continue
+            fields = self._fields(pos)
+            if self._record is ACTUATOR_RECORD:
+                status, last_control_time, version = fields[6], string(fields[7], fields[8]), fields[9]
+            else:
+                status, last_control_time, version = None, None, fields[6]
+            yield DeviceRecord(string(fields[0], fields[1]), string(fields[2], fields[3]),
+                               fields[4], fields[5], status, last_control_time, version)
+
+    def replace_at(self, pos: int, device):
+        """
+        Puts `device` (with the same id) at position `pos`, without building the id index.
+        """
+        self._objects[pos] = device
+
+    def __getitem__(self, key):
+        return self.at(self._positions()[key])
+
+    def __setitem__(self, key, device):
+        positions = self._positions()
+        if key in positions:
+            self._objects[positions[key]] = device
+        else:
+            positions[key] = len(self._objects)
+            self._objects.append(device)
+
+    def __delitem__(self, key):
+        raise TypeError("Devices cannot be removed from a MIB.")
+
+    def __contains__(self, key) -> bool:
+        return key in self._positions()
+
+    def __iter__(self):
+        for pos in range(len(self._objects)):
+            yield self.key_at(pos)
+
+    def __len__(self) -> int:
+        return len(self._objects)
+
+    def values(self):
+        return (self.at(pos) for pos in range(len(self._objects)))
+
+    def items(self):
+        return ((device.id, device) for device in self.values())
+
+
+def _build_sensor(fields: tuple, snapshot: SnapshotFile) -> Sensor:
+    sensor = Sensor(snapshot.string(fields[0], fields[1]), snapshot.string(fields[2], fields[3]),
+                    fields[4], fields[5])
+    sensor.version = fields[6]
+    return sensor
+
+
+def _build_actuator(fields: tuple, snapshot: SnapshotFile) -> Actuator:
+    actuator = Actuator(snapshot.string(fields[0], fields[1]), snapshot.string(fields[2], fields[3]),
+                        fields[4], fields[5])
+    actuator.status = fields[6]
+    actuator.last_control_time = snapshot.string(fields[7], fields[8])
+    actuator.version = fields[9]
+    return actuator
+
+
+def save_snapshot(mib, path: str):
+    """
+    Writes the devices and the persistent Device fields of `mib` to `path`.
+    The file is written next to the destination and renamed over it, so a crash never
+    leaves a half-written snapshot. Devices not yet loaded from a previous snapshot are
+    copied without being materialized.
+    """
+    blob = _StringBlob()
+    sensors = getattr(mib.sensors, "peek_values", mib.sensors.values)()
+    actuators = getattr(mib.actuators, "peek_values", mib.actuators.values)()
+
+    records = bytearray()
+    n_sensors = 0
+    for s in sensors:
+        records += SENSOR_RECORD.pack(*blob.add(s.id), *blob.add(s.type), s.min_value, s.max_value, s.version)
+        n_sensors += 1
+    n_actuators = 0
+    for a in actuators:
+        records += ACTUATOR_RECORD.pack(*blob.add(a.id), *blob.add(a.type), a.min_value, a.max_value,
+                                        a.status, *blob.add(a.last_control_time), a.version)
+        n_actuators += 1
+
+    info = mib.device_info
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, n_sensors, n_actuators, info["beaconRate"],
+                         info["operationalStatus"], *blob.add(info["id"]), *blob.add(info["type"]),
+                         HEADER.size + len(records), mib.device_versions.value, mib.sensor_versions.value,
+                         mib.actuator_versions.value)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(records)
+        f.write(blob.data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path: str, sensor_versions=None, actuator_versions=None) \
+        -> tuple[SnapshotFile, LazyDeviceTable, LazyDeviceTable]:
+    """
+    Maps a snapshot written by save_snapshot().
+    Only the header is read: the cost does not depend on the number of devices.
+    :param sensor_versions: VersionCounter given to the sensors as they are built
+    :param actuator_versions: VersionCounter given to the actuators as they are built
+    :return: (file, sensors table, actuators table)
+    :raises SnapshotFormatError: if the file is not a valid snapshot
+    """
+    snapshot = SnapshotFile(path)
+    sensors = LazyDeviceTable(snapshot, snapshot.sensors_offset, snapshot.n_sensors,
+                              SENSOR_RECORD, _build_sensor, sensor_versions)
+    actuators = LazyDeviceTable(snapshot, snapshot.actuators_offset, snapshot.n_actuators,
+                                ACTUATOR_RECORD, _build_actuator, actuator_versions)
+    return snapshot, sensors, actuators
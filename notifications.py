@@ -0,0 +1,192 @@
+# notifications.py
+
+from utils.clock import monotonic
+from dataclasses import dataclass, field
+from exceptions import LSNMPvSError
+
+
+@dataclass
+class Subscription:
+    '''
+    Interest of a manager in a set of IIDs, with the condition that triggers a notification.
+    Conditions:
+        delta     - the value moved at least `value` away from the last notified value
+                    (for non-numeric values: the value changed)
+        threshold - the value crossed `value`, in either direction
+        period    - every `value` seconds, regardless of the values
+    Attributes:
+        id (int): Identifier returned by SubscriptionManager.subscribe.
+        iids (list): IIDs watched by the subscription.
+        condition (str): One of CONDITIONS.
+        value (float): Delta, threshold level or period (seconds), depending on the condition.
+        address (tuple): (host, port) where notifications are sent.
+        sample_interval (float): Seconds between evaluations of delta/threshold conditions.
+    '''
+    CONDITIONS = ("delta", "threshold", "period")
+
+    id: int
+    iids: list
+    condition: str
+    value: float
+    address: tuple
+    sample_interval: float = 1.0
+    next_due: float = 0.0
+    last_notified: dict = field(default_factory=dict)   # tuple(iid) -> último valor notificado
+    above: dict = field(default_factory=dict)           # tuple(iid) -> lado do limiar (threshold)
+
+    def interval(self) -> float:
+        '''
+        Returns the number of seconds between evaluations of this subscription.
+        '''
+        return self.value if self.condition == "period" else self.sample_interval
+
+    def fires(self, iid: tuple, raw) -> bool:
+        '''
+        Evaluates the condition for one freshly sampled value, updating the subscription state.
+        :return: True if this value must be notified.
+        '''
+        numeric = isinstance(raw, (int, float)) and not isinstance(raw, bool)
+
+        if self.condition == "period":
+            return True
+
+        if self.condition == "delta":
+            if iid not in self.last_notified:
+                return True
+            last = self.last_notified[iid]
+            if numeric and isinstance(last, (int, float)):
+                return abs(raw - last) >= self.value
+            return raw != last
+
+        # threshold: dispara só quando o valor muda de lado do limiar
+        if not numeric:
+            return False
+        above = raw >= self.value
+        previous = self.above.get(iid)
+        self.above[iid] = above
+        return previous is not None and previous != above
+
+
+class SubscriptionManager:
+    """
+    Evaluates subscriptions and emits Notification PDUs only when their conditions fire.
+
+    Subscriptions are sampled at their own interval (not at the rate managers would poll).
+    Values that fire for the same destination within `coalesce_window` seconds are
+    merged into a single multi-IID notification, keeping only the latest value per IID.
+    """
+
+    def __init__(self, mib, send, coalesce_window: float = 0.5, clock=monotonic):
+        """
+        :param mib: MIB used to sample the watched IIDs
+        :param send: function send(address, iid_list, raw_values) that emits one notification
+        :param coalesce_window: seconds during which fired values are merged into one notification
+        :param clock: function returning the current time in seconds (monotonic)
+        """
+        self.mib = mib
+        self.send = send
+        self.coalesce_window = coalesce_window
+        self.clock = clock
+        self.subscriptions = {}   # id -> Subscription
+        self.pending = {}         # address -> {tuple(iid): raw}
+        self.pending_since = {}   # address -> instante do primeiro valor pendente
+        self._next_id = 1
+
+    def subscribe(self, iids: list, condition: str, value: float, address: tuple,
+                  sample_interval: float = 1.0) -> int:
+        """
+        Registers interest in a list of IIDs.
+        :param iids: IIDs to watch (each one a list of ints)
+        :param condition: "delta", "threshold" or "period"
+        :param value: delta, threshold level or period in seconds
+        :param address: (host, port) where notifications are sent
+        :param sample_interval: seconds between evaluations of delta/threshold conditions
+        :return: Identifier of the subscription.
+        """
+        if condition not in Subscription.CONDITIONS:
+            raise ValueError(f"Unknown subscription condition: {condition}.")
+        if (condition == "period" and value <= 0) or sample_interval <= 0:
+            raise ValueError("Subscription intervals must be positive.")
+
+        sub = Subscription(
+            id=self._next_id,
+            iids=[list(iid) for iid in iids],
+            condition=condition,
+            value=value,
+            address=address,
+            sample_interval=sample_interval,
+            next_due=self.clock()
+        )
+        self.subscriptions[sub.id] = sub
+        self._next_id += 1
+        return sub.id
+
+    def unsubscribe(self, sub_id: int):
+        """
+        Removes a subscription. Unknown identifiers are ignored.
+        """
+        self.subscriptions.pop(sub_id, None)
+
+    def time_until_next(self) -> float | None:
+        """
+        Returns how many seconds the caller may wait before poll() has work to do,
+        or None when there are no subscriptions nor pending notifications.
+        """
+        deadlines = [sub.next_due for sub in self.subscriptions.values()]
+        deadlines += [since + self.coalesce_window for since in self.pending_since.values()]
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - self.clock())
+
+    def poll(self) -> int:
+        """
+        Samples the subscriptions that are due, evaluates their conditions and sends
+        the notifications whose coalescing window is over.
+        :return: Number of notifications sent.
+        """
+        now = self.clock()
+        samples = {}   # cada IID é lido no máximo uma vez por poll, mesmo se partilhado
+        for sub in self.subscriptions.values():
+            if now < sub.next_due:
+                continue
+            sub.next_due = now + sub.interval()
+            for iid in sub.iids:
+                key = tuple(iid)
+                if key not in samples:
+                    try:
+                        samples[key] = self.mib.get_value_by_iid(iid)
+                    except LSNMPvSError:
+                        samples[key] = None
+                raw = samples[key]
+                if raw is None:
+                    continue
+                if sub.fires(key, raw):
+                    sub.last_notified[key] = raw
+                    self._queue(sub.address, key, raw, now)
+        return self.flush(now)
+
+    def _queue(self, address: tuple, iid: tuple, raw, now: float):
+        """
+        Adds a fired value to the pending notification of `address`.
+        """
+        if address not in self.pending:
+            self.pending[address] = {}
+            self.pending_since[address] = now
+        self.pending[address][iid] = raw
+
+    def flush(self, now: float = None, force: bool = False) -> int:
+        """
+        Sends the pending notifications whose coalescing window is over (or all, if forced).
+        :return: Number of notifications sent.
+        """
+        if now is None:
+            now = self.clock()
+        sent = 0
+        for address in list(self.pending):
+            if not force and now - self.pending_since[address] < self.coalesce_window:
+                continue
+            values = self.pending.pop(address)
+            del self.pending_since[address]
+            self.send(address, [list(iid) for iid in values], list(values.values()))
+            sent += 1
+        return sent
@@ -0,0 +1,230 @@
+# profiling.py
+"""
+Profiling sessions of a running agent, started and stopped at runtime through the MIB
+(Device field 1.11, see Agent): nothing is imported, patched or traced while no session is
+active, so an agent that is never profiled pays nothing for it.
+
+Stopping a session only ends the profiling; its results are written to `output_dir` by
+write() afterwards (the agent does it from its housekeeping, outside the MIB lock):
+    cProfile      agent-<kind>-<time>.prof (pstats binary) and agent-<kind>-<time>.txt (top functions)
+    sampling      agent-<kind>-<time>.folded (collapsed stacks, for flame graph tools) and
+                  agent-<kind>-<time>.txt (functions by samples), by sampling the stack of the
+                  profiled thread every `interval` seconds from another thread
+    tracemalloc   agent-<kind>-<time>.txt: the source lines that allocated the memory still held
+                  at the end of the session, counting only allocations made while running
+                  the `focus` function (Agent.handle_request)
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_OFF = 0
+PROFILE_CPROFILE = 1
+PROFILE_SAMPLING = 2
+PROFILE_TRACEMALLOC = 3
+
+
+class ProfilingSession:
+    """
+    Base of the profiling sessions: a session profiles the thread that starts it, for at
+    most `max_seconds` (the agent stops it when expired() becomes True).
+    """
+
+    kind = "profile"
+
+    def __init__(self, output_dir: str = ".", max_seconds: float = 60.0, clock=time.monotonic):
+        """
+        :param output_dir: directory where the results are written
+        :param max_seconds: maximum duration of the session
+        :param clock: function returning the current time in seconds (monotonic)
+        """
+        self.output_dir = output_dir
+        self.max_seconds = max_seconds
+        self.clock = clock
+        self.started = None
+
+    def start(self):
+        self.started = self.clock()
+        now = time.time()
+        self.stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"-{int(now * 1000) % 1000:03d}"
+
+    def stop(self):
+        """
+        Ends the session, keeping what was collected for write().
+        """
+        raise NotImplementedError
+
+    def write(self) -> list[str]:
+        """
+        Writes the results of a stopped session.
+        :return: Paths of the files written.
+        """
+        raise NotImplementedError
+
+    def time_left(self) -> float:
+        return max(0.0, self.started + self.max_seconds - self.clock())
+
+    def expired(self) -> bool:
+        return self.clock() - self.started >= self.max_seconds
+
+    def _path(self, extension: str) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        return os.path.join(self.output_dir, f"agent-{self.kind}-{self.stamp}.{extension}")
+
+
+class CProfileSession(ProfilingSession):
+    """
+    Deterministic profile (cProfile) of every call made by the profiled thread.
+    """
+
+    kind = "cprofile"
+
+    def start(self):
+        import cProfile
+        super().start()
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+
+    def write(self) -> list[str]:
+        import pstats
+        prof_path, text_path = self._path("prof"), self._path("txt")
+        self.profiler.dump_stats(prof_path)
+        with open(text_path, "w") as f:
+            pstats.Stats(self.profiler, stream=f).sort_stats("cumulative").print_stats(40)
+        return [prof_path, text_path]
+
+
+class SamplingSession(ProfilingSession):
+    """
+    Statistical profile: the stack of the profiled thread is sampled every `interval`
+    seconds by a background thread. The profiled thread runs untouched between samples,
+    so the overhead does not depend on how many calls it makes.
+    """
+
+    kind = "sampling"
+
+    def __init__(self, output_dir: str = ".", max_seconds: float = 60.0, clock=time.monotonic,
+                 interval: float = 0.005):
+        """
+        :param interval: seconds between samples
+        """
+        super().__init__(output_dir, max_seconds, clock)
+        self.interval = interval
+        self.stacks = Counter()   # pilha colapsada ("f1;f2;f3") -> amostras
+        self.samples = 0
+
+    def start(self):
+        super().start()
+        self.thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self.sampler = threading.Thread(target=self._run, daemon=True)
+        self.sampler.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop.set()
+        self.sampler.join()
+
+    def write(self) -> list[str]:
+        folded_path, text_path = self._path("folded"), self._path("txt")
+        with open(folded_path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            functions = stack.split(";")
+            own[functions[-1]] += count
+            for function in set(functions):
+                total[function] += count
+        with open(text_path, "w") as f:
+            f.write(f"{self.samples} samples every {self.interval * 1000:g} ms\n\n")
+            f.write(f"{'own %':>7} {'total %':>8}  function\n")
+            samples = max(1, self.samples)
+            for function, count in own.most_common(40):
+                f.write(f"{100 * count / samples:7.1f} {100 * total[function] / samples:8.1f}  "
+                        f"{function}\n")
+        return [folded_path, text_path]
+
+
+class TracemallocSession(ProfilingSession):
+    """
+    Memory allocation sites (tracemalloc) of the code run by `focus`.
+    """
+
+    kind = "tracemalloc"
+
+    def __init__(self, output_dir: str = ".", max_seconds: float = 60.0, clock=time.monotonic,
+                 focus=None, frames: int = 25, top: int = 25):
+        """
+        :param focus: function whose allocations are reported (None = every allocation)
+        :param frames: frames kept per allocation (the focus function must be within them)
+        :param top: number of allocation sites reported
+        """
+        super().__init__(output_dir, max_seconds, clock)
+        self.focus = focus
+        self.frames = frames
+        self.top = top
+
+    def start(self):
+        import tracemalloc
+        super().start()
+        self.was_tracing = tracemalloc.is_tracing()
+        if not self.was_tracing:
+            tracemalloc.start(self.frames)
+
+    def _focus_lines(self) -> tuple[str, int, int]:
+        """
+        File and range of lines of the focus function.
+        """
+        code = self.focus.__code__
+        last = max(line for _, _, line in code.co_lines() if line is not None)
+        return code.co_filename, code.co_firstlineno, last
+
+    def stop(self):
+        import tracemalloc
+        self.snapshot = tracemalloc.take_snapshot()
+        if not self.was_tracing:
+            tracemalloc.stop()
+
+    def write(self) -> list[str]:
+        sizes, counts = Counter(), Counter()
+        focus = self._focus_lines() if self.focus is not None else None
+        for trace in self.snapshot.traces:
+            if focus is None or any(frame.filename == focus[0] and focus[1] <= frame.lineno <= focus[2]
+                                    for frame in trace.traceback):
+                site = trace.traceback[-1]   # a linha que fez a alocação (a frame mais recente)
+                sizes[(site.filename, site.lineno)] += trace.size
+                counts[(site.filename, site.lineno)] += 1
+        text_path = self._path("txt")
+        name = getattr(self.focus, "__qualname__", "all code")
+        with open(text_path, "w") as f:
+            f.write(f"memory still allocated at the end of the session, by allocation site ({name})\n")
+            f.write(f"total {sum(sizes.values()) / 1024:.1f} KiB in {sum(counts.values())} blocks\n\n")
+            for (filename, lineno), size in sizes.most_common(self.top):
+                f.write(f"{size / 1024:10.1f} KiB {counts[(filename, lineno)]:8} blocks  {filename}:{lineno}\n")
+        return [text_path]
+
+
+SESSIONS = {
+    PROFILE_CPROFILE: CProfileSession,
+    PROFILE_SAMPLING: SamplingSession,
+    PROFILE_TRACEMALLOC: TracemallocSession,
+}
@@ -5,6 +5,22 @@ from utils.format_utils import is_valid_int, validate_date_format
 class Protocol:
     TAG = b'kdk847ufh84jg87g\0'
 
+    # Tipos de mensagem aceites, indexados pelo byte que os representa no PDU
+    MESSAGE_TYPES = {b'G': 'G', b'S': 'S', b'R': 'R', b'N': 'N'}
+
+    # Tamanho mínimo (em bytes) de cada elemento repetido de uma lista.
+    # Usados para rejeitar contagens declaradas que não cabem no resto da mensagem
+    # antes de iterar sobre elas.
+    MIN_IID_BYTES = 8      # "D\0" + "2\0" + dois componentes de 1 dígito
+    MIN_VALUE_BYTES = 4    # tipo + "\0" + comprimento + "\0"
+    MIN_ERROR_BYTES = 2    # um dígito + "\0"
+
+    # Nenhuma contagem legítima precisa de mais dígitos do que isto (UDP < 64 KiB)
+    COUNT_MAX_DIGITS = 9
+
+    # TAG + tipo + timestamp mínimo (T, 5 componentes) + message id + três contagens vazias
+    MIN_MESSAGE_LEN = len(TAG) + 1 + 4 + 5 * 2 + 17 + 3 * 2
+
     def _next_str(self, cursor: int, raw_message: bytes) -> tuple[int, bytes]:
         """
         Helper function to find the next null-terminated string in the raw message.
@@ -17,6 +33,34 @@ class Protocol:
             raise DecodingError("Missing '\\0' terminator.")
         return end + 1, raw_message[cursor:end]
 
+    def _next_count(self, cursor: int, raw_message: bytes, format_error: str) -> tuple[int, int]:
+        """
+        Helper function to read a declared list length.
+        Only plain non-negative decimal counts of at most COUNT_MAX_DIGITS digits are accepted.
+        :param cursor: Current position in the raw message.
+        :param raw_message: The complete raw message bytes.
+        :param format_error: Error message used when the count is not a valid integer.
+        :return: A tuple containing the new cursor position and the declared count.
+        """
+        cursor, count_b = self._next_str(cursor, raw_message)
+        if not count_b.isdigit() or len(count_b) > self.COUNT_MAX_DIGITS:
+            raise DecodingError(format_error)
+        return cursor, int(count_b)
+
+    def _check_budget(self, count: int, min_item_bytes: int, cursor: int, raw_message: bytes, error: str):
+        """
+        Helper function to check a declared list length against the remaining byte budget.
+        Counts whose items could not possibly fit in the bytes left are rejected
+        before any per-item work is done.
+        :param count: Declared number of items.
+        :param min_item_bytes: Minimum encoded size of a single item of the list.
+        :param cursor: Current position in the raw message.
+        :param raw_message: The complete raw message bytes.
+        :param error: Error message used when the count exceeds the remaining bytes.
+        """
+        if count * min_item_bytes > len(raw_message) - cursor:
+            raise DecodingError(error)
+
     def decode_message(self, raw_message: bytes) -> dict:
         cursor = 0
 
@@ -26,11 +70,16 @@ class Protocol:
         cursor += len(self.TAG)
 
         # Message Type: agora aceitamos G, S, R, N
-        msg_type = raw_message[cursor:cursor + 1].decode("ascii")
-        if msg_type not in ['G', 'S', 'R', 'N']:
-            raise UnknownMessageTypeError(f"Invalid message type: {msg_type}")
+        msg_type_b = raw_message[cursor:cursor + 1]
+        msg_type = self.MESSAGE_TYPES.get(msg_type_b)
+        if msg_type is None:
+            raise UnknownMessageTypeError(f"Invalid message type: {msg_type_b.decode('ascii', 'replace')}")
         cursor += 1
 
+        # Rejeição rápida de mensagens demasiado curtas para serem válidas
+        if len(raw_message) < self.MIN_MESSAGE_LEN:
+            raise DecodingError("Message too short.")
+
         # Timestamp
         cursor, ts_type = self._next_str(cursor, raw_message)
         if ts_type != b'T':
@@ -65,10 +114,9 @@ class Protocol:
             raise DecodingError("Invalid message ID length. Expected 16 characters.")
 
         # IID List
-        cursor, n_iids_b = self._next_str(cursor, raw_message)
-        if not is_valid_int(n_iids_b.decode("ascii")):
-            raise DecodingError("Invalid IID List length format.")
-        num_iids = int(n_iids_b.decode("ascii"))
+        cursor, num_iids = self._next_count(cursor, raw_message, "Invalid IID List length format.")
+        self._check_budget(num_iids, self.MIN_IID_BYTES, cursor, raw_message,
+                           "Declared IID count exceeds message size.")
 
         iid_list = []
         for _ in range(num_iids):
@@ -89,10 +137,7 @@ class Protocol:
             iid_list.append(iid)
 
         # Value List
-        cursor, n_values_b = self._next_str(cursor, raw_message)
-        if not is_valid_int(n_values_b.decode("ascii")):
-            raise DecodingError("Invalid Value List length format.")
-        num_values = int(n_values_b.decode("ascii"))
+        cursor, num_values = self._next_count(cursor, raw_message, "Invalid Value List length format.")
 
         # regras diferentes para cada tipo
         if msg_type == 'G' and num_values != 0:
@@ -100,6 +145,8 @@ class Protocol:
         if msg_type == 'S' and num_values != num_iids:
             raise IIDValueMismatchError("Number of values does not match number of IIDs.")
         # em R/N não requeremos correspondência, pode haver <>, mas tipicamente equals
+        self._check_budget(num_values, self.MIN_VALUE_BYTES, cursor, raw_message,
+                           "Declared value count exceeds message size.")
 
         value_list = []
         for _ in range(num_values):
@@ -113,8 +160,12 @@ class Protocol:
             length = int(len_b.decode("ascii"))
 
             # validações de comprimento por tipo
-            if val_type in ['I','S'] and length != 1:
+            # (em R/N, I e S podem trazer listas: leituras de intervalos e histórico)
+            if val_type in ['I','S'] and msg_type in ['G','S'] and length != 1:
                 raise DecodingError(f"Type {val_type} must have length 1.")
+            if length < 0:
+                raise DecodingError("Invalid value length format.")
+            self._check_budget(length, 1, cursor, raw_message, "Declared value length exceeds message size.")
             if val_type == 'T' and length not in (5,7):
                 raise DecodingError(f"Invalid timestamp length for value in {msg_type} message.")
 
@@ -133,14 +184,13 @@ class Protocol:
             value_list.append((val_type, parts))
 
         # Error List
-        cursor, n_err_b = self._next_str(cursor, raw_message)
-        if not is_valid_int(n_err_b):
-            raise DecodingError("Invalid Error List length format.")
-        num_err = int(n_err_b.decode("ascii"))
+        cursor, num_err = self._next_count(cursor, raw_message, "Invalid Error List length format.")
 
         # G/S devem ter zero erros; R/N podem ter >=1
         if msg_type in ['G','S'] and num_err != 0:
             raise DecodingError(f"Error List should be empty for {msg_type} requests.")
+        self._check_budget(num_err, self.MIN_ERROR_BYTES, cursor, raw_message,
+                           "Declared error count exceeds message size.")
 
         error_list = []
         for _ in range(num_err):
@@ -161,6 +211,31 @@ class Protocol:
             "error_list": error_list
         }
 
+    def peek_header(self, raw_message: bytes) -> tuple[str, str]:
+        """
+        Reads only the message type and the Message-Identifier of a PDU, without decoding
+        (or validating) the lists that follow. Used to answer requests that are dropped
+        before being processed.
+        :return: A tuple (msg_type, message_id).
+        """
+        if not raw_message.startswith(self.TAG):
+            raise InvalidTagError("Invalid message tag.")
+        cursor = len(self.TAG)
+        msg_type = self.MESSAGE_TYPES.get(raw_message[cursor:cursor + 1])
+        if msg_type is None:
+            raise UnknownMessageTypeError("Invalid message type.")
+        cursor += 1
+        cursor, _ = self._next_str(cursor, raw_message)            # 'T'
+        cursor, ts_len_b = self._next_str(cursor, raw_message)
+        if ts_len_b not in (b"5", b"7"):
+            raise DecodingError("Invalid timestamp length.")
+        for _ in range(int(ts_len_b)):
+            cursor, _ = self._next_str(cursor, raw_message)
+        cursor, mid_b = self._next_str(cursor, raw_message)
+        if len(mid_b) != 16:
+            raise DecodingError("Invalid message ID length. Expected 16 characters.")
+        return msg_type, mid_b.decode("ascii")
+
     def encode_message(self, msg_type: str, timestamp: str, message_id: str,
                    iid_list: list[list[int]], value_list: list = None, error_list: list[int] = None) -> bytes:
         """
@@ -182,16 +257,7 @@ class Protocol:
                 raise DecodingError("Invalid IID length.")
 
         # Timestamp
-        ts_parts = timestamp.split(":")
-        if msg_type in ['G', 'S'] and len(ts_parts) != 7:
-            raise DecodingError("Invalid timestamp length.")
-        if msg_type in ['R', 'N'] and len(ts_parts) != 5:
-            raise DecodingError("Invalid timestamp length.")
-        ts_bytes = b"T\0" + str(len(ts_parts)).encode("ascii") + b"\0"
-        for part in ts_parts:
-            if not part.isdigit():
-                raise DecodingError("Invalid timestamp component format.")
-            ts_bytes += part.encode("ascii") + b"\0"
+        ts_bytes = self.encode_timestamp(msg_type, timestamp)
 
         # IID List
         iid_bytes = str(len(iid_list)).encode("ascii") + b"\0"
@@ -269,6 +335,41 @@ class Protocol:
         )
         return full_message
     
+    def encode_timestamp(self, msg_type: str, timestamp: str) -> bytes:
+        """
+        Codifica o campo Timestamp de uma mensagem (tipo 'T', comprimento e componentes).
+        Mensagens G/S levam uma data (7 componentes), R/N um uptime (5 componentes).
+        """
+        ts_parts = timestamp.split(":")
+        if msg_type in ['G', 'S'] and len(ts_parts) != 7:
+            raise DecodingError("Invalid timestamp length.")
+        if msg_type in ['R', 'N'] and len(ts_parts) != 5:
+            raise DecodingError("Invalid timestamp length.")
+        ts_bytes = b"T\0" + str(len(ts_parts)).encode("ascii") + b"\0"
+        for part in ts_parts:
+            if not part.isdigit():
+                raise DecodingError("Invalid timestamp component format.")
+            ts_bytes += part.encode("ascii") + b"\0"
+        return ts_bytes
+
+    def encode_error_template(self, message_id: str, error_code: int) -> tuple[bytes, bytes]:
+        """
+        Pré-codifica uma resposta R sem IIDs nem valores e com um único código de erro.
+        Devolve as partes antes e depois do Timestamp, para que só o uptime tenha de ser
+        codificado quando a resposta é enviada:
+            head + encode_timestamp('R', uptime) + tail
+        """
+        if not isinstance(message_id, str) or len(message_id) != 16:
+            raise DecodingError("Invalid message ID length. Expected 16 characters.")
+        head = self.TAG + b"R"
+        tail = (
+            message_id.encode("ascii") + b"\0" +
+            b"0\0" +                                    # IID List vazia
+            b"0\0" +                                    # Value List vazia
+            b"1\0" + str(error_code).encode("ascii") + b"\0"
+        )
+        return head, tail
+
     def encode_iid(self, iid: list[int]) -> bytes:
             """
             Function to encode a list of integers into a byte sequence,
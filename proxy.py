@@ -0,0 +1,361 @@
+# proxy.py
+"""
+Caching proxy: agents that answer for downstream agents, so that any number of managers
+polling the same device cost it at most one request per IID and TTL.
+
+A ProxyAgent is an Agent (same socket handling, admission control and error replies) whose
+MIB is a downstream agent, reached through a ManagerClient:
+    GET           served from a per-IID cache of the encoded values; the IIDs missing (or
+                  older than the TTL) are fetched in one downstream GET and cached
+    SET           forwarded downstream, its response relayed; the cache is emptied, as a
+                  SET may change more than the IIDs it names
+    notification  a notification (or beacon) of the downstream agent replaces the cached
+                  values of its IIDs and drops the other IIDs of the same objects (e.g. the
+                  range [2, 3, 0, 0] for [2, 3, 1]); it is relayed to manager_address
+
+Downstream requests never block the loop: the request of a manager is parked until the
+downstream response arrives (the other requests, and the other proxies of an AgentHost,
+are served meanwhile), and misses of IIDs already being fetched wait for that fetch
+instead of sending another. The ManagerClient's socket must be watched by the loop
+(AgentHost.watch, as main() and ProxyAgent.listen() do).
+A downstream agent that does not answer leaves the request unanswered, as it would be
+without the proxy. L-SNMPvS has no PDU to subscribe: downstream agents must send their
+notifications to the address of the proxy's client (their manager_address, or the address
+of their subscriptions).
+
+Uso: python proxy.py --downstream host:port [--downstream ...] [--host 127.0.0.1] [--base-port 16200]
+                     [--ttl 1.0] [--client-port 16199] [--manager host:port]
+"""
+import argparse
+import functools
+import sys
+from agent import Agent
+from exceptions import LSNMPvSError, DecodingError
+from manager import ManagerClient
+from utils.clock import monotonic
+from utils.timestamp_utils import generate_uptime_timestamp
+
+
+class ResponseCache:
+    """
+    Encoded values (val_type, val_parts) of one agent by IID, each valid for `ttl` seconds.
+    Entries are indexed by object ([structure, object]) as well, to invalidate all the IIDs
+    a change of one may affect.
+    """
+
+    def __init__(self, ttl: float = 1.0, clock=monotonic):
+        """
+        :param ttl: seconds a value is served from the cache
+        :param clock: function returning the current time in seconds (monotonic)
+        """
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = {}   # tuple(iid) -> (instante em que expira, valor)
+        self.objects = {}   # tuple(iid[:2]) -> IIDs em cache desse objeto
+        self.generation = 0  # muda a cada invalidação: leituras feitas antes já não são guardadas
+        self.counters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, iid):
+        """
+        :return: The cached value of `iid`, or None if it is missing or expired.
+        """
+        key = tuple(iid)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] > self.clock():
+            self.counters["hits"] += 1
+            return entry[1]
+        if entry is not None:
+            self._drop(key)
+        self.counters["misses"] += 1
+        return None
+
+    def put(self, iid, value):
+        key = tuple(iid)
+        self.entries[key] = (self.clock() + self.ttl, value)
+        self.objects.setdefault(key[:2], set()).add(key)
+
+    def invalidate(self, iid):
+        """
+        Drops every cached IID of the object of `iid`.
+        """
+        self.generation += 1
+        keys = self.objects.pop(tuple(iid[:2]), ())
+        for key in keys:
+            del self.entries[key]
+        self.counters["invalidations"] += len(keys)
+
+    def _drop(self, key: tuple):
+        del self.entries[key]
+        keys = self.objects[key[:2]]
+        keys.discard(key)
+        if not keys:
+            del self.objects[key[:2]]
+
+    def clear(self):
+        self.generation += 1
+        self.counters["invalidations"] += len(self.entries)
+        self.entries.clear()
+        self.objects.clear()
+
+
+class ParkedRequest:
+    """
+    A request of a manager waiting for downstream responses.
+    """
+    __slots__ = ("addr", "message_id", "iid_list", "values", "errors", "waiting", "failed")
+
+    def __init__(self, addr, message_id: str, iid_list: list, values: list = None, errors: list = None):
+        self.addr = addr
+        self.message_id = message_id
+        self.iid_list = iid_list
+        self.values = values
+        self.errors = errors
+        self.waiting = 0        # valores ainda por chegar de jusante
+        self.failed = False     # alguma leitura a jusante ficou sem resposta
+
+
+class Fetch:
+    """
+    A downstream GET of the IIDs missing in the cache, and the parked requests waiting for it.
+    """
+    __slots__ = ("keys", "generation", "waiters")
+
+    def __init__(self, keys: list, generation: int):
+        self.keys = keys
+        self.generation = generation    # da cache quando foi enviado
+        self.waiters = []               # (ParkedRequest, posição do IID no pedido, tuple(iid))
+
+
+class ProxyAgent(Agent):
+    """
+    Agent answering for a downstream agent from a ResponseCache (see the module docstring).
+    """
+
+    def __init__(self, downstream: tuple, client: ManagerClient = None, ttl: float = 1.0,
+                 host='localhost', port=16100, **options):
+        """
+        :param downstream: (host, port) of the agent behind the proxy
+        :param client: ManagerClient used to reach it, possibly shared by several proxies
+                       (None = one of its own)
+        :param ttl: seconds a value read downstream is served from the cache
+        :param options: other Agent arguments (manager_address, admission control, sock, ...)
+        """
+        super().__init__(host=host, port=port, **options)
+        self.downstream = tuple(downstream)
+        self.own_client = client is None
+        self.client = client or ManagerClient()
+        self.client.listen(self.downstream, self._on_notification)
+        self.cache = ResponseCache(ttl)
+        self.inflight = {}      # tuple(iid) -> Fetch que o está a ler a jusante
+        self.requests = set()   # Message-Identifiers dos pedidos a jusante ainda sem resposta
+        self.counters.update(downstream_gets=0, downstream_sets=0, downstream_timeouts=0,
+                             coalesced_misses=0)
+
+    def handle_request(self, data: bytes, addr=None) -> bytes:
+        """
+        Answers a GET from the cache or, when IIDs are missing, parks it until they are
+        fetched; forwards a SET downstream, parked until its response.
+        :return: The Response PDU, or b'' if the request was parked (the response is sent
+                 to `addr` when the downstream agent answers, or never if it does not).
+        """
+        try:
+            decoded = self.protocol.decode_message(data)
+        except LSNMPvSError as e:
+            return self._error_reply(self._map_exception_to_code(e), addr)
+        except UnicodeDecodeError:
+            return self._error_reply(DecodingError.code, addr)
+
+        # notificações já recebidas invalidam a cache antes de ser usada
+        self.client.poll()
+        iid_list = [list(iid) for iid in decoded['iid_list']]
+        if decoded['type'] == 'G':
+            values = [self.cache.get(iid) for iid in iid_list]
+            parked = ParkedRequest(addr, decoded['message_id'], iid_list, values, [0] * len(iid_list))
+            missing = [i for i, value in enumerate(values) if value is None]
+            if not missing:
+                return self._encode_reply(parked)
+            self._fetch(parked, missing)
+        elif decoded['type'] == 'S':
+            parked = ParkedRequest(addr, decoded['message_id'], iid_list)
+            self._send('S', iid_list, decoded['value_list'], functools.partial(self._on_set_reply, parked))
+        return b''
+
+    def _fetch(self, parked: ParkedRequest, missing: list[int]):
+        """
+        Parks a GET until the IIDs at the `missing` positions arrive: those already being
+        read downstream wait for that read, the others are read in one new downstream GET.
+        """
+        parked.waiting = len(missing)
+        new = {}   # tuple(iid) -> posições no pedido, dos IIDs que ninguém está a ler
+        for i in missing:
+            key = tuple(parked.iid_list[i])
+            fetch = self.inflight.get(key)
+            if fetch is None:
+                new.setdefault(key, []).append(i)
+            else:
+                fetch.waiters.append((parked, i, key))
+                self.counters["coalesced_misses"] += 1
+        if not new:
+            return
+        fetch = Fetch(list(new), self.cache.generation)
+        for key, positions in new.items():
+            fetch.waiters.extend((parked, i, key) for i in positions)
+            self.inflight[key] = fetch
+        self._send('G', [list(key) for key in fetch.keys], None, functools.partial(self._on_get_reply, fetch))
+
+    def _send(self, msg_type: str, iids: list, values, callback):
+        def on_reply(reply):
+            self.requests.discard(message_id)
+            callback(reply)
+        message_id = self.client.send(self.downstream, msg_type, iids, values, on_reply)
+        self.requests.add(message_id)
+
+    def _on_get_reply(self, fetch: Fetch, reply: dict | None):
+        """
+        Hands the values of a downstream GET to the requests waiting for them, caching them
+        unless the cache was invalidated since the GET was sent.
+        """
+        for key in fetch.keys:
+            if self.inflight.get(key) is fetch:
+                del self.inflight[key]
+        results = {}
+        if reply is None:
+            self.counters["downstream_timeouts"] += 1
+        else:
+            self.counters["downstream_gets"] += 1
+            errors = reply['error_list'] or [0] * len(fetch.keys)
+            results = dict(zip(fetch.keys, zip(reply['value_list'], errors)))
+            if fetch.generation == self.cache.generation:
+                for key, (value, error) in results.items():
+                    if error == 0:
+                        self.cache.put(key, value)
+        for parked, i, key in fetch.waiters:
+            result = results.get(key)
+            if result is None:
+                parked.failed = True
+            else:
+                parked.values[i], parked.errors[i] = result
+            parked.waiting -= 1
+            if parked.waiting == 0 and not parked.failed:
+                self.sock.sendto(self._encode_reply(parked), parked.addr)
+
+    def _on_set_reply(self, parked: ParkedRequest, reply: dict | None):
+        """
+        Relays the response of a forwarded SET and empties the cache (and stops the reads
+        in flight from being joined: they may have read the values before the SET). A SET
+        that timed out may still have been applied downstream, so it empties them too.
+        """
+        self.cache.clear()
+        self.inflight.clear()
+        if reply is None:
+            self.counters["downstream_timeouts"] += 1
+            return
+        self.counters["downstream_sets"] += 1
+        parked.values, parked.errors = reply['value_list'], reply['error_list']
+        self.sock.sendto(self._encode_reply(parked), parked.addr)
+
+    def _encode_reply(self, parked: ParkedRequest) -> bytes:
+        return self.protocol.encode_message(
+            msg_type='R',
+            timestamp=generate_uptime_timestamp(self.mib.start_time),
+            message_id=parked.message_id,
+            iid_list=parked.iid_list,
+            value_list=parked.values,
+            error_list=parked.errors
+        )
+
+    def _on_notification(self, decoded: dict):
+        """
+        Refreshes the cache with the values of a downstream notification and relays it.
+        """
+        errors = decoded['error_list'] or [0] * len(decoded['iid_list'])
+        for iid, value, error in zip(decoded['iid_list'], decoded['value_list'], errors):
+            self.cache.invalidate(iid)
+            if error == 0:
+                self.cache.put(iid, value)
+        if self.inflight:
+            # as leituras em curso destes objetos podem ser anteriores à notificação
+            objects = {tuple(iid[:2]) for iid in decoded['iid_list']}
+            for key in [key for key in self.inflight if key[:2] in objects]:
+                del self.inflight[key]
+        self.send_notification([list(iid) for iid in decoded['iid_list']], decoded['value_list'], errors)
+
+    def housekeeping(self):
+        super().housekeeping()
+        self.client.poll()
+
+    def _idle_timeout(self) -> float | None:
+        """
+        When notifications are relayed, the loop wakes up at least every notification window
+        to read them; while downstream requests are pending, in time to retransmit them.
+        """
+        timeout = super()._idle_timeout()
+        if self.manager_address:
+            window = self.subscriptions.coalesce_window
+            timeout = window if timeout is None else min(timeout, window)
+        if self.requests:
+            until_retransmission = self.client.time_until_next()
+            if until_retransmission is not None:
+                timeout = until_retransmission if timeout is None else min(timeout, until_retransmission)
+        return timeout
+
+    def listen(self):
+        """
+        Serves the proxy alone, from an AgentHost waiting on its socket and on its client's.
+        """
+        from agent_host import AgentHost
+        agent_host = AgentHost()
+        agent_host.add(self)
+        agent_host.watch(self.client.sock, self.client.poll)
+        agent_host.serve_forever()
+
+    def close(self):
+        for message_id in self.requests:
+            self.client.cancel(message_id)
+        self.requests.clear()
+        self.inflight.clear()
+        self.client.listen(self.downstream, None)
+        if self.own_client:
+            self.client.close()
+        self.sock.close()
+
+
+def main(argv=None) -> int:
+    from agent_host import AgentHost
+    from loadgen import parse_address
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--downstream", action="append", required=True, type=parse_address,
+                        help="host:port of an agent to front (repeatable)")
+    parser.add_argument("--host", default="127.0.0.1", help="address of the proxies")
+    parser.add_argument("--base-port", type=int, default=16200, help="port of the proxy of the first agent")
+    parser.add_argument("--ttl", type=float, default=1.0, help="seconds values are served from the cache")
+    parser.add_argument("--client-port", type=int, default=0,
+                        help="port where downstream agents must send their notifications")
+    parser.add_argument("--timeout", type=float, default=1.0, help="seconds to wait for a downstream agent")
+    parser.add_argument("--manager", type=parse_address, help="host:port receiving the relayed notifications")
+    args = parser.parse_args(argv)
+
+    client = ManagerClient(bind=(args.host, args.client_port), timeout=args.timeout, retries=1)
+    agent_host = AgentHost()
+    agent_host.watch(client.sock, client.poll)
+    for i, downstream in enumerate(args.downstream):
+        proxy = ProxyAgent(downstream, client, ttl=args.ttl, host=args.host, port=args.base_port + i,
+                           manager_address=args.manager)
+        agent_host.add(proxy)
+        print(f"{args.host}:{args.base_port + i} -> {downstream[0]}:{downstream[1]}", file=sys.stderr)
+    print(f"Notifications to {client.address[0]}:{client.address[1]}", file=sys.stderr)
+    try:
+        agent_host.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        agent_host.close()
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
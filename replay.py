@@ -0,0 +1,270 @@
+# replay.py
+"""
+Replays a traffic capture (see capture.py) against an agent.
+
+In-process (default), every datagram is passed to Agent.handle_request of an agent built
+from --config (on copies of its snapshot and journal, see replay_config), and the time
+spent in each phase of the request (decoding, MIB reads and writes, encoding, error
+replies) is reported per kind of request (GET, SET, malformed).
+With --udp host:port the datagrams are sent to a running agent instead, and the replies
+are matched to the requests by Message-Identifier to measure latency.
+
+Datagrams are replayed with their original spacing (--speed 2 replays twice as fast) or,
+with --fast, back to back.
+
+Uso: python replay.py CAPTURE [--config agent.json | --udp host:port] [--speed 1.0 | --fast] [--limit N]
+"""
+import argparse
+import contextlib
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from itertools import islice
+from capture import CaptureReader, CaptureFormatError
+from exceptions import LSNMPvSError
+from protocol import Protocol
+from utils.histogram import LatencyHistogram
+
+
+class Pacer:
+    """
+    Waits until each record is due, keeping the spacing of the capture divided by `speed`
+    (speed 0 = no waiting).
+    """
+
+    def __init__(self, speed: float):
+        self.speed = speed
+        self.origin = None
+        self.max_lag_ns = 0
+
+    def wait(self, time_ns: int):
+        if not self.speed:
+            return
+        now = time.perf_counter_ns()
+        if self.origin is None:
+            self.origin = (time_ns, now)
+        due = self.origin[1] + int((time_ns - self.origin[0]) / self.speed)
+        if due > now:
+            time.sleep((due - now) / 1e9)
+        else:
+            self.max_lag_ns = max(self.max_lag_ns, now - due)
+
+
+class PhaseTimer:
+    """
+    Times calls to methods of an object, by replacing them with timed wrappers on the instance.
+    """
+
+    def __init__(self):
+        self.histograms = {}   # fase -> LatencyHistogram (ns)
+        self.totals = Counter()
+
+    def wrap(self, obj, method_name: str, phase: str):
+        method = getattr(obj, method_name)
+        histogram = self.histograms.setdefault(phase, LatencyHistogram())
+        totals = self.totals
+        clock = time.perf_counter_ns
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                histogram.record(elapsed)
+                totals[phase] += elapsed
+        setattr(obj, method_name, timed)
+
+    def record(self, phase: str, elapsed_ns: int):
+        self.histograms.setdefault(phase, LatencyHistogram()).record(elapsed_ns)
+        self.totals[phase] += elapsed_ns
+
+
+def request_kind(protocol: Protocol, data: bytes) -> str:
+    try:
+        msg_type, _ = protocol.peek_header(data)
+    except (LSNMPvSError, UnicodeDecodeError):
+        return "malformed"
+    return {"G": "GET", "S": "SET"}.get(msg_type, "other")
+
+
+def replay_config(config: dict, workdir: str) -> dict:
+    """
+    Turns the configuration of an agent into one that can be replayed next to it: the
+    agent starts from copies (in `workdir`) of its snapshot and journal, and neither binds
+    its port, captures, exports its MIB, reads the sensor feed, writes profiles where the
+    real agent does nor sends beacons and notifications to its manager.
+    :return: The new configuration (`config` is not changed).
+    """
+    config = dict(config)
+    for key in ("snapshot_path", "journal_path"):
+        if config[key]:
+            copy = os.path.join(workdir, os.path.basename(config[key]))
+            if os.path.exists(config[key]):
+                shutil.copyfile(config[key], copy)
+            config[key] = copy
+    config.update(port=0, capture_path=None, shared_mib_name=None, sensor_feed=None,
+                  profile_dir=os.path.join(workdir, "profiles"), manager_address=None, beacons=False)
+    return config
+
+
+def replay_in_process(agent, records, speed: float = 0.0) -> dict:
+    """
+    Feeds the records to agent.handle_request, timing each phase.
+    :return: {"phases": PhaseTimer, "requests": Counter by kind, "elapsed": seconds, "max_lag_ns": ...}
+    """
+    timer = PhaseTimer()
+    timer.wrap(agent.protocol, "decode_message", "decode")
+    timer.wrap(agent.protocol, "encode_message", "encode")
+    timer.wrap(agent, "_error_reply", "error reply")
+    timer.wrap(agent.mib, "snapshot", "mib snapshot")
+    timer.wrap(agent.mib, "get_value_by_iid", "mib read")
+    timer.wrap(agent.mib, "set_values_by_iid", "mib write")
+    pacer = Pacer(speed)
+    kinds = Counter()
+    clock = time.perf_counter_ns
+    start = clock()
+    # o agente imprime cada pedido: a saída é descartada enquanto é medido
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for record in records:
+            pacer.wait(record.time_ns)
+            kind = request_kind(agent.protocol, record.data)
+            kinds[kind] += 1
+            t0 = clock()
+            agent.handle_request(record.data, record.addr)
+            timer.record(f"total {kind}", clock() - t0)
+    return {"phases": timer, "requests": kinds, "elapsed": (clock() - start) / 1e9,
+            "max_lag_ns": pacer.max_lag_ns}
+
+
+def replay_udp(address: tuple, records, speed: float = 0.0, timeout: float = 1.0) -> dict:
+    """
+    Sends the records to a running agent and matches the replies by Message-Identifier.
+    :return: {"latency": LatencyHistogram (ns), "requests": Counter by kind, "replies": n, ...}
+    """
+    protocol = Protocol()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+    sock.connect(address)
+    sock.settimeout(0.2)
+    latency = LatencyHistogram()
+    sent_at = {}      # message_id -> instantes de envio (ids repetidos na captura ficam em fila)
+    lock = threading.Lock()
+    counters = Counter()
+    done = threading.Event()
+
+    def receive():
+        while True:
+            try:
+                data = sock.recv(65536)
+            except socket.timeout:
+                if done.is_set():
+                    return
+                continue
+            except OSError:
+                counters["receive errors"] += 1
+                continue
+            now = time.perf_counter_ns()
+            counters["replies"] += 1
+            try:
+                _, message_id = protocol.peek_header(data)
+            except (LSNMPvSError, UnicodeDecodeError):
+                continue
+            with lock:
+                queue = sent_at.get(message_id)
+                if queue:
+                    latency.record(now - queue.popleft())
+
+    receiver = threading.Thread(target=receive, daemon=True)
+    receiver.start()
+    pacer = Pacer(speed)
+    kinds = Counter()
+    start = time.perf_counter_ns()
+    for record in records:
+        pacer.wait(record.time_ns)
+        kinds[request_kind(protocol, record.data)] += 1
+        try:
+            _, message_id = protocol.peek_header(record.data)
+        except (LSNMPvSError, UnicodeDecodeError):
+            message_id = None
+        with lock:
+            if message_id is not None:
+                sent_at.setdefault(message_id, deque()).append(time.perf_counter_ns())
+        sock.send(record.data)
+    elapsed = (time.perf_counter_ns() - start) / 1e9
+    time.sleep(timeout)
+    done.set()
+    receiver.join()
+    sock.close()
+    return {"latency": latency, "requests": kinds, "replies": counters["replies"], "elapsed": elapsed,
+            "max_lag_ns": pacer.max_lag_ns}
+
+
+def _print_histogram_row(name: str, histogram: LatencyHistogram, total_ns: int = None):
+    total = f"{total_ns / 1e6:10.1f}" if total_ns is not None else " " * 10
+    print(f"  {name:<16} {histogram.count:>9,} {total} {histogram.mean / 1000:9.1f} "
+          f"{histogram.percentile(50) / 1000:9.1f} {histogram.percentile(99) / 1000:9.1f} "
+          f"{histogram.max / 1000:9.1f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("capture", help="capture file written by an agent (capture_path)")
+    parser.add_argument("--config", help="agent configuration for in-process replay (see main.py)")
+    parser.add_argument("--udp", help="host:port of a running agent to replay to instead")
+    pacing = parser.add_mutually_exclusive_group()
+    pacing.add_argument("--speed", type=float, default=1.0, help="replay speed relative to the capture")
+    pacing.add_argument("--fast", action="store_true", help="replay back to back, as fast as possible")
+    parser.add_argument("--limit", type=int, help="replay only the first N datagrams")
+    args = parser.parse_args(argv)
+    speed = 0.0 if args.fast else args.speed
+
+    try:
+        reader = CaptureReader(args.capture)
+    except (OSError, CaptureFormatError) as e:
+        print(f"Cannot read the capture: {e}", file=sys.stderr)
+        return 2
+
+    with reader:
+        records = islice(reader, args.limit) if args.limit else iter(reader)
+        header = f"  {'':<16} {'count':>9} {'total ms':>10} {'mean us':>9} {'p50 us':>9} {'p99 us':>9} {'max us':>9}"
+        if args.udp:
+            host, _, port = args.udp.rpartition(":")
+            result = replay_udp((host or "localhost", int(port)), records, speed)
+            sent = sum(result["requests"].values())
+            print(f"sent {sent:,} datagrams in {result['elapsed']:.2f} s, {result['replies']:,} replies")
+            if result["latency"].count:
+                print(header)
+                _print_histogram_row("round trip", result["latency"])
+        else:
+            from main import load_config, build_agent, close_agent
+            workdir = tempfile.TemporaryDirectory(prefix="lsnmp-replay-")
+            config = replay_config(load_config(args.config), workdir.name)
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                agent = build_agent(config)
+            try:
+                result = replay_in_process(agent, records, speed)
+            finally:
+                close_agent(agent)
+                workdir.cleanup()
+            timer = result["phases"]
+            sent = sum(result["requests"].values())
+            print(f"replayed {sent:,} datagrams in {result['elapsed']:.2f} s "
+                  f"({sent / result['elapsed']:,.0f}/s): "
+                  + ", ".join(f"{n:,} {kind}" for kind, n in result["requests"].most_common()))
+            print(header)
+            for phase in sorted(timer.histograms):
+                if timer.histograms[phase].count:
+                    _print_histogram_row(phase, timer.histograms[phase], timer.totals[phase])
+        if result["max_lag_ns"] > 10_000_000:
+            print(f"warning: replay fell behind the capture by up to {result['max_lag_ns'] / 1e6:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
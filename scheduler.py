@@ -0,0 +1,238 @@
+# scheduler.py
+
+import random
+import threading
+from utils.clock import monotonic
+
+
+class Timer:
+    """
+    Handle of a callback scheduled in a TimerWheel. Keep it to be able to cancel the callback.
+    """
+    __slots__ = ("deadline", "callback", "cancelled")
+
+    def __init__(self, deadline: int, callback):
+        self.deadline = deadline      # em ticks
+        self.callback = callback
+        self.cancelled = False
+
+
+class TimerWheel:
+    """
+    Hierarchical timer wheel (as used by kernels for network timers).
+
+    Time is divided in ticks of `tick` seconds. Level 0 has one slot per tick for the
+    next 256 ticks; each upper level has 64 slots, each covering a whole turn of the
+    level below. When a lower level completes a turn, the next slot of the level above
+    is "cascaded" down. Scheduling and cancelling are O(1) and advancing costs O(1)
+    per tick plus the timers that expire, regardless of how many timers are pending.
+    """
+
+    LEVEL_BITS = (8, 6, 6, 6)   # 256 + 3 x 64 slots → 2^26 ticks (~77 dias com ticks de 0.1 s)
+
+    def __init__(self, tick: float = 0.1, clock=monotonic):
+        """
+        :param tick: resolution of the wheel, in seconds
+        :param clock: function returning the current time in seconds (monotonic)
+        """
+        self.tick = tick
+        self.clock = clock
+        self.origin = clock()
+        self.current = 0   # último tick processado
+        self.levels = [[[] for _ in range(1 << bits)] for bits in self.LEVEL_BITS]
+        self.shifts = []
+        shift = 0
+        for bits in self.LEVEL_BITS:
+            self.shifts.append(shift)
+            shift += bits
+        self.max_ticks = (1 << shift) - 1
+        self.pending = 0
+
+    def __len__(self) -> int:
+        return self.pending
+
+    def _place(self, timer: Timer):
+        """
+        Puts a timer in the slot that matches its distance to the current tick.
+        """
+        deadline = max(timer.deadline, self.current)
+        diff = min(deadline - self.current, self.max_ticks)
+        for level, bits in enumerate(self.LEVEL_BITS):
+            if diff < (1 << (self.shifts[level] + bits)) or level == len(self.LEVEL_BITS) - 1:
+                position = min(deadline, self.current + self.max_ticks)
+                slot = (position >> self.shifts[level]) & ((1 << bits) - 1)
+                self.levels[level][slot].append(timer)
+                return
+
+    def schedule(self, delay: float, callback) -> Timer:
+        """
+        Schedules `callback()` to run `delay` seconds from now (rounded up to the next tick).
+        :return: Timer handle, to be used with cancel().
+        """
+        now_tick = (self.clock() - self.origin) / self.tick
+        deadline = max(int(now_tick + max(delay, 0) / self.tick) + 1, self.current + 1)
+        timer = Timer(deadline, callback)
+        self._place(timer)
+        self.pending += 1
+        return timer
+
+    def cancel(self, timer: Timer):
+        """
+        Cancels a scheduled timer. The slot entry is discarded lazily when reached.
+        """
+        if timer is not None and not timer.cancelled:
+            timer.cancelled = True
+            self.pending -= 1
+
+    def _cascade(self, level: int):
+        """
+        Moves the timers of the current slot of `level` to the levels below.
+        """
+        slot = (self.current >> self.shifts[level]) & ((1 << self.LEVEL_BITS[level]) - 1)
+        timers = self.levels[level][slot]
+        self.levels[level][slot] = []
+        for timer in timers:
+            if not timer.cancelled:
+                self._place(timer)
+
+    def advance(self, now: float = None) -> int:
+        """
+        Processes every tick up to `now`, running the callbacks that expired.
+        :return: Number of callbacks run.
+        """
+        if now is None:
+            now = self.clock()
+        target = int((now - self.origin) / self.tick)
+        fired = 0
+        while self.current < target:
+            if self.pending == 0:
+                # nada agendado: salta diretamente para o fim
+                self.current = target
+                break
+            self.current += 1
+            for level in range(1, len(self.LEVEL_BITS)):
+                if self.current & ((1 << self.shifts[level]) - 1):
+                    break
+                self._cascade(level)
+
+            slot = self.current & ((1 << self.LEVEL_BITS[0]) - 1)
+            timers = self.levels[0][slot]
+            if not timers:
+                continue
+            self.levels[0][slot] = []
+            for timer in timers:
+                if timer.cancelled:
+                    continue
+                if timer.deadline > self.current:
+                    self._place(timer)   # ainda não chegou a hora (volta completa de nível 0)
+                    continue
+                timer.cancelled = True
+                self.pending -= 1
+                timer.callback()
+                fired += 1
+        return fired
+
+
+class BeaconScheduler:
+    """
+    Drives the periodic beacons (N PDUs) of any number of agents from a single thread
+    (or event loop), using one TimerWheel.
+
+    Each agent beacons every device_info["beaconRate"] seconds (0 disables beacons).
+    Every period is randomly stretched or shrunk by up to `jitter` (a fraction of the rate),
+    and the first beacon of each agent is placed at a random phase, so that agents do not
+    synchronise into bursts. Changes to beaconRate made through the MIB take effect immediately.
+    """
+
+    def __init__(self, tick: float = 0.1, jitter: float = 0.1, clock=monotonic, rng=None):
+        """
+        :param tick: resolution of the scheduler, in seconds
+        :param jitter: maximum relative deviation applied to every beacon period
+        :param clock: function returning the current time in seconds (monotonic)
+        :param rng: random.Random used for phases and jitter (for reproducible runs)
+        """
+        self.clock = clock
+        self.wheel = TimerWheel(tick, clock)
+        self.jitter = jitter
+        self.rng = rng or random.Random()
+        self.timers = {}        # id(agent) -> Timer
+        self.last_sent = {}     # id(agent) -> instante do último beacon
+        self.agents = {}        # id(agent) -> agent
+        self.beacons_sent = 0
+
+    def __len__(self) -> int:
+        return len(self.agents)
+
+    def _period(self, rate: float) -> float:
+        return rate * (1 + self.rng.uniform(-self.jitter, self.jitter))
+
+    def _schedule(self, agent, delay: float):
+        key = id(agent)
+        self.wheel.cancel(self.timers.get(key))
+        self.timers[key] = self.wheel.schedule(delay, lambda: self._fire(agent))
+
+    def add_agent(self, agent):
+        """
+        Starts beaconing for an agent (anything with a `mib` and a `send_beacon()` method).
+        """
+        key = id(agent)
+        if key in self.agents:
+            return
+        self.agents[key] = agent
+        agent.mib.add_observer(lambda iid, value: self._on_change(agent, iid, value))
+        rate = agent.mib.device_info["beaconRate"]
+        if rate > 0:
+            self._schedule(agent, self.rng.uniform(0, rate))
+
+    def remove_agent(self, agent):
+        """
+        Stops beaconing for an agent.
+        """
+        key = id(agent)
+        self.agents.pop(key, None)
+        self.last_sent.pop(key, None)
+        self.wheel.cancel(self.timers.pop(key, None))
+
+    def _fire(self, agent):
+        key = id(agent)
+        self.timers.pop(key, None)
+        if key not in self.agents:
+            return
+        agent.send_beacon()
+        self.beacons_sent += 1
+        self.last_sent[key] = self.clock()
+        rate = agent.mib.device_info["beaconRate"]
+        if rate > 0:
+            self._schedule(agent, self._period(rate))
+
+    def _on_change(self, agent, iid, value):
+        """
+        MIB observer: reschedules an agent as soon as its beaconRate is changed.
+        """
+        key = id(agent)
+        if list(iid) != [1, 3] or key not in self.agents:
+            return
+        rate = int(value)
+        if rate <= 0:
+            self.wheel.cancel(self.timers.pop(key, None))
+            return
+        # o próximo beacon é devido `rate` segundos após o último (ou já, se esse instante passou)
+        last = self.last_sent.get(key)
+        delay = rate if last is None else max(0.0, last + rate - self.clock())
+        self._schedule(agent, min(delay, self._period(rate)))
+
+    def run_pending(self) -> int:
+        """
+        Sends every beacon that is due. Call it regularly from an existing event loop.
+        :return: Number of beacons sent.
+        """
+        return self.wheel.advance()
+
+    def run(self, stop_event: threading.Event = None):
+        """
+        Blocking loop sending beacons until `stop_event` is set.
+        """
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            self.run_pending()
+            stop_event.wait(self.wheel.tick)
@@ -0,0 +1,393 @@
+# shared_mib.py
+"""
+Export of the numeric columns of the MIB to a shared memory segment, for local readers.
+
+The agent (SharedMIBWriter) copies the sensor values and status, the actuator status and
+the numeric Device fields into a multiprocessing.shared_memory segment whenever they change;
+processes on the same host (SharedMIBReader) read them straight from the mapped memory,
+without sockets, PDUs or any call into the agent.
+
+Consistency is kept with a sequence lock: the writer makes the sequence number odd before
+changing the segment and even again after, and a reader retries until it has copied the
+values between two equal, even readings of the sequence number. Readers never block the
+writer nor each other. (CPython has no memory fences: this relies on stores not being
+reordered, as on x86; on weakly ordered CPUs a torn read is possible but unlikely.)
+
+Layout (little-endian int64 slots after the 8-byte magic):
+    header      sequence, retired, sensor capacity, actuator capacity, sensors, actuators,
+                catalog capacity, catalog length, catalog version
+    device      DEVICE_FIELDS
+    sensors     value, status and version columns (sensor capacity slots each)
+    actuators   status and version columns (actuator capacity slots each)
+    catalog     JSON with the ids, types and ranges of the rows (rewritten when rows are added)
+
+When the tables outgrow the segment, the writer retires it (readers reopen the name) and
+creates a bigger one.
+
+Uso (leitor): python shared_mib.py NAME [--watch 1.0]
+"""
+import json
+import os
+import sys
+import time
+from array import array
+from utils.clock import wall_time
+
+MAGIC = b"LSNMPSM1"
+HEADER_SLOTS = 9
+SEQUENCE, RETIRED, SENSOR_CAPACITY, ACTUATOR_CAPACITY, SENSORS, ACTUATORS, \
+    CATALOG_CAPACITY, CATALOG_LENGTH, CATALOG_VERSION = range(HEADER_SLOTS)
+# Campos numéricos do grupo Device exportados (start_time em ns desde a epoch, para o uptime)
+DEVICE_FIELDS = ("beaconRate", "nSensors", "nActuators", "operationalStatus", "reset", "profiling",
+                 "start_time_ns", "version")
+# Valor de um sensor que ainda não foi lido
+NO_VALUE = -(1 << 63)
+# Segmentos criados por escritores deste processo (o resource tracker só os conhece uma vez)
+_CREATED = set()
+
+
+class SharedMIBError(Exception):
+    """
+    The shared memory segment does not exist or is not an exported MIB.
+    """
+
+
+def _layout(sensor_capacity: int, actuator_capacity: int, catalog_capacity: int) -> dict:
+    """
+    Slot offsets of the columns, and the total size in bytes.
+    """
+    device = HEADER_SLOTS
+    sensors = device + len(DEVICE_FIELDS)
+    actuators = sensors + 3 * sensor_capacity
+    end = actuators + 2 * actuator_capacity
+    return {"device": device, "sensor_value": sensors, "sensor_status": sensors + sensor_capacity,
+            "sensor_version": sensors + 2 * sensor_capacity, "actuator_status": actuators,
+            "actuator_version": actuators + actuator_capacity, "catalog": len(MAGIC) + 8 * end,
+            "size": len(MAGIC) + 8 * end + catalog_capacity}
+
+
+def _untrack(shm):
+    """
+    Stops the resource tracker of this process from unlinking a segment it only attached to
+    (before Python 3.13 every SharedMemory is tracked, and unlinked when the process exits).
+    """
+    if shm.name in _CREATED:
+        return
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except (ImportError, AttributeError, KeyError):
+        pass
+
+
+class SharedMIBWriter:
+    """
+    Publishes the numeric columns of a MIB in a shared memory segment (see the module).
+    Call publish() after changes (the agent does it in every housekeeping); it returns at
+    once when no table version changed.
+    """
+
+    def __init__(self, mib, name: str = None, sensor_capacity: int = None, actuator_capacity: int = None):
+        """
+        :param mib: MIB to export
+        :param name: name of the segment (None = a new name, see self.name); a segment
+                     recreated bigger keeps the name
+        :param sensor_capacity: sensor rows reserved (default: twice the current sensors, at least 64)
+        :param actuator_capacity: actuator rows reserved (idem)
+        """
+        self.mib = mib
+        self.name = name or f"lsnmp-{os.getpid()}-{os.urandom(4).hex()}"
+        self.shm = None
+        self.publications = 0
+        self._published = None   # versões da MIB da última publicação
+        self._catalog_key = None
+        self._create(sensor_capacity or max(64, 2 * len(mib.sensors)),
+                     actuator_capacity or max(64, 2 * len(mib.actuators)))
+        self.publish()
+
+    def _create(self, sensor_capacity: int, actuator_capacity: int):
+        from multiprocessing import shared_memory
+        catalog_capacity = 64 * (sensor_capacity + actuator_capacity) + 1024
+        layout = _layout(sensor_capacity, actuator_capacity, catalog_capacity)
+        shm = shared_memory.SharedMemory(self.name, create=True, size=layout["size"])
+        _CREATED.add(shm.name)
+        shm.buf[:len(MAGIC)] = MAGIC
+        slots = shm.buf[len(MAGIC):layout["catalog"]].cast("q")
+        slots[SENSOR_CAPACITY] = sensor_capacity
+        slots[ACTUATOR_CAPACITY] = actuator_capacity
+        slots[CATALOG_CAPACITY] = catalog_capacity
+        self.shm, self.slots, self.layout = shm, slots, layout
+        self._published = None
+        self._catalog_key = None
+
+    def _retire(self):
+        """
+        Marks the segment as retired (readers reopen the name) and releases it.
+        """
+        self.slots[SEQUENCE] += 1
+        self.slots[RETIRED] = 1
+        self.slots[SEQUENCE] += 1
+        self._release(unlink=True)
+
+    def _release(self, unlink: bool):
+        self.slots.release()
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+            _CREATED.discard(self.shm.name)
+
+    def _versions(self) -> tuple:
+        mib = self.mib
+        return (mib.device_versions.value, mib.sensor_versions.value, mib.actuator_versions.value,
+                len(mib.sensors), len(mib.actuators), mib.start_time)
+
+    def publish(self, force: bool = False) -> bool:
+        """
+        Copies the columns to the segment if the MIB changed since the last publication.
+        :return: True if the segment was written.
+        """
+        versions = self._versions()
+        if versions == self._published and not force:
+            return False
+        mib = self.mib
+        sensors = list(mib.sensors.values())
+        actuators = list(mib.actuators.values())
+        if len(sensors) > self.slots[SENSOR_CAPACITY] or len(actuators) > self.slots[ACTUATOR_CAPACITY]:
+            self._retire()
+            self._create(2 * len(sensors), 2 * len(actuators))
+
+        catalog = None
+        catalog_key = (len(sensors), len(actuators), mib.device_info["id"], mib.device_info["type"])
+        if catalog_key != self._catalog_key:
+            catalog = json.dumps({
+                "device": {"id": mib.device_info["id"], "type": mib.device_info["type"]},
+                "sensors": [[s.id, s.type, s.min_value, s.max_value] for s in sensors],
+                "actuators": [[a.id, a.type, a.min_value, a.max_value] for a in actuators],
+            }).encode("utf-8")
+            if len(catalog) > self.slots[CATALOG_CAPACITY]:
+                self._retire()
+                self._create(2 * len(sensors), 2 * len(actuators))
+
+        info = mib.device_info
+        device = array("q", [info["beaconRate"], info["nSensors"], info["nActuators"],
+                             info["operationalStatus"], info["reset"], info["profiling"],
+                             int(mib.start_time * 1e9), versions[0]])
+        values = array("q", [NO_VALUE if s.current_value is None else s.current_value for s in sensors])
+        status = array("q", [NO_VALUE if s.status is None else s.status for s in sensors])
+        sensor_versions = array("q", [s.version for s in sensors])
+        actuator_status = array("q", [a.status for a in actuators])
+        actuator_versions = array("q", [a.version for a in actuators])
+
+        slots, layout = self.slots, self.layout
+        n, m = len(sensors), len(actuators)
+        slots[SEQUENCE] += 1   # ímpar: escrita em curso
+        slots[layout["device"]:layout["device"] + len(DEVICE_FIELDS)] = device
+        slots[layout["sensor_value"]:layout["sensor_value"] + n] = values
+        slots[layout["sensor_status"]:layout["sensor_status"] + n] = status
+        slots[layout["sensor_version"]:layout["sensor_version"] + n] = sensor_versions
+        slots[layout["actuator_status"]:layout["actuator_status"] + m] = actuator_status
+        slots[layout["actuator_version"]:layout["actuator_version"] + m] = actuator_versions
+        slots[SENSORS], slots[ACTUATORS] = n, m
+        if catalog is not None:
+            start = layout["catalog"]
+            self.shm.buf[start:start + len(catalog)] = catalog
+            slots[CATALOG_LENGTH] = len(catalog)
+            slots[CATALOG_VERSION] += 1
+            self._catalog_key = catalog_key
+        slots[SEQUENCE] += 1   # par: consistente
+        self._published = versions
+        self.publications += 1
+        return True
+
+    def close(self, unlink: bool = True):
+        """
+        Releases the segment; with unlink, it is marked retired and removed.
+        """
+        if self.shm is None:
+            return
+        if unlink:
+            self._retire()
+        else:
+            self._release(unlink=False)
+        self.shm = None
+
+
+class SharedMIBReader:
+    """
+    Reads a MIB exported by a SharedMIBWriter (see the module): every read returns values
+    from a single publication, without locks or system calls.
+    """
+
+    def __init__(self, name: str, max_retries: int = 10000):
+        """
+        :param name: name of the segment (SharedMIBWriter.name)
+        :param max_retries: attempts of a read before giving up (writer stuck mid-write)
+        :raises SharedMIBError: if there is no exported MIB with that name
+        """
+        self.name = name
+        self.max_retries = max_retries
+        self.shm = None
+        self._catalog = (None, None)   # (versão, dict)
+        self._open()
+
+    def _open(self):
+        from multiprocessing import shared_memory
+        try:
+            shm = shared_memory.SharedMemory(self.name)
+        except FileNotFoundError:
+            raise SharedMIBError(f"No shared MIB named {self.name!r}.")
+        _untrack(shm)
+        if bytes(shm.buf[:len(MAGIC)]) != MAGIC:
+            shm.close()
+            raise SharedMIBError(f"{self.name!r} is not a shared MIB.")
+        header = shm.buf[len(MAGIC):len(MAGIC) + 8 * HEADER_SLOTS].cast("q")
+        layout = _layout(header[SENSOR_CAPACITY], header[ACTUATOR_CAPACITY], header[CATALOG_CAPACITY])
+        header.release()
+        self.shm = shm
+        self.layout = layout
+        self.slots = shm.buf[len(MAGIC):layout["catalog"]].cast("q")
+        self._catalog = (None, None)
+
+    def _reopen(self):
+        self.close()
+        # o escritor cria o novo segmento logo a seguir a retirar o antigo
+        for _ in range(100):
+            try:
+                self._open()
+                if not self.slots[RETIRED]:
+                    return
+            except SharedMIBError:
+                pass
+            time.sleep(0.001)
+        raise SharedMIBError(f"The shared MIB {self.name!r} was retired and not recreated.")
+
+    def _consistent(self, read):
+        """
+        Runs read(slots, layout) until it sees a single publication (sequence lock).
+        """
+        for _ in range(self.max_retries):
+            slots = self.slots
+            before = slots[SEQUENCE]
+            if slots[RETIRED]:
+                self._reopen()
+                continue
+            if not before & 1:
+                result = read(slots, self.layout)
+                if slots[SEQUENCE] == before:
+                    return result
+            time.sleep(0)   # cede o CPU ao escritor a meio de uma escrita
+        raise SharedMIBError("The shared MIB kept changing while being read.")
+
+    def sequence(self) -> int:
+        """
+        Publication counter (x2): compare it to know whether anything changed since a read.
+        """
+        return self.slots[SEQUENCE]
+
+    def _catalog_now(self) -> dict:
+        version, catalog = self._catalog
+        if version != self.slots[CATALOG_VERSION]:
+            def read(slots, layout):
+                start = layout["catalog"]
+                return slots[CATALOG_VERSION], bytes(self.shm.buf[start:start + slots[CATALOG_LENGTH]])
+            version, raw = self._consistent(read)
+            catalog = json.loads(raw) if raw else {"device": {}, "sensors": [], "actuators": []}
+            self._catalog = (version, catalog)
+        return catalog
+
+    def device(self) -> dict:
+        """
+        Numeric Device fields (DEVICE_FIELDS), plus the uptime in seconds.
+        """
+        values = self._consistent(
+            lambda slots, layout: slots[layout["device"]:layout["device"] + len(DEVICE_FIELDS)].tolist())
+        device = dict(zip(DEVICE_FIELDS, values))
+        device["uptime"] = wall_time() - device["start_time_ns"] / 1e9
+        return device
+
+    def sensor_status(self) -> list:
+        """
+        Status column of the sensors (None for sensors not read yet), in table order.
+        """
+        def read(slots, layout):
+            start = layout["sensor_status"]
+            return slots[start:start + slots[SENSORS]].tolist()
+        return [None if v == NO_VALUE else v for v in self._consistent(read)]
+
+    def actuator_status(self) -> list:
+        """
+        Status column of the actuators, in table order.
+        """
+        def read(slots, layout):
+            start = layout["actuator_status"]
+            return slots[start:start + slots[ACTUATORS]].tolist()
+        return self._consistent(read)
+
+    def read(self) -> dict:
+        """
+        Every exported value, from one publication:
+        {"device": {...}, "sensors": {id: {"value", "status", "version"}}, "actuators": {id: {"status", "version"}}}
+        """
+        def read(slots, layout):
+            n, m = slots[SENSORS], slots[ACTUATORS]
+            base = layout["device"]
+            return (slots[CATALOG_VERSION], slots[base:base + len(DEVICE_FIELDS)].tolist(),
+                    slots[layout["sensor_value"]:layout["sensor_value"] + n].tolist(),
+                    slots[layout["sensor_status"]:layout["sensor_status"] + n].tolist(),
+                    slots[layout["sensor_version"]:layout["sensor_version"] + n].tolist(),
+                    slots[layout["actuator_status"]:layout["actuator_status"] + m].tolist(),
+                    slots[layout["actuator_version"]:layout["actuator_version"] + m].tolist())
+        while True:
+            catalog = self._catalog_now()
+            version, device, values, status, versions, actuator_status, actuator_versions = self._consistent(read)
+            if version == self._catalog[0]:
+                break   # senão, o catálogo mudou entretanto: relê-o
+        device = dict(zip(DEVICE_FIELDS, device))
+        device.update(catalog["device"])
+        device["uptime"] = wall_time() - device["start_time_ns"] / 1e9
+        return {
+            "device": device,
+            "sensors": {row[0]: {"value": None if v == NO_VALUE else v, "status": None if s == NO_VALUE else s,
+                                 "version": ver}
+                        for row, v, s, ver in zip(catalog["sensors"], values, status, versions)},
+            "actuators": {row[0]: {"status": s, "version": ver}
+                          for row, s, ver in zip(catalog["actuators"], actuator_status, actuator_versions)},
+        }
+
+    def close(self):
+        if self.shm is not None:
+            self.slots.release()
+            self.shm.close()
+            self.shm = None
+
+    def __enter__(self) -> "SharedMIBReader":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(description="Prints a MIB exported to shared memory by an agent.")
+    parser.add_argument("name", help="name of the segment (the agent's shared_mib_name)")
+    parser.add_argument("--watch", type=float, help="print again every WATCH seconds, when changed")
+    args = parser.parse_args(argv)
+    try:
+        reader = SharedMIBReader(args.name)
+    except SharedMIBError as e:
+        print(e, file=sys.stderr)
+        return 2
+    with reader:
+        last = None
+        while True:
+            if reader.sequence() != last:
+                last = reader.sequence()
+                print(json.dumps(reader.read(), indent=2))
+            if not args.watch:
+                return 0
+            time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
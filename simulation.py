@@ -0,0 +1,419 @@
+# simulation.py
+"""
+Discrete-event simulation of a fleet of agents on a virtual clock.
+
+A Simulator keeps a heap of timed events and, instead of waiting, jumps its VirtualClock
+(installed as the clock of the process while it runs, see utils.clock) straight to the next
+one: simulated time advances as fast as the events can be processed. Timestamps, uptimes,
+sensor histories, beacon periods and subscription intervals all follow the virtual clock,
+and every random choice (including sensor readings) comes from the seed of the simulator,
+so a run is reproducible.
+
+simulate_fleet() runs real Agent instances without sockets: their datagrams travel through
+a SimNetwork with a fixed latency, beacons are driven by a BeaconScheduler and a manager
+sends GET / SET requests at random (Poisson) instants.
+
+Uso: python simulation.py [--agents 100] [--days 7] [--beacon-rate 60] [--request-rate 1.0]
+                          [--set-ratio 0.1] [--latency 0.002] [--seed 1] [--json results.json]
+"""
+import argparse
+import contextlib
+import heapq
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from exceptions import LSNMPvSError
+from protocol import Protocol
+from utils.clock import VirtualClock, set_clock
+from utils.histogram import LatencyHistogram
+from utils.timestamp_utils import generate_date_timestamp
+
+
+class Event:
+    """
+    Handle of a scheduled callback. Keep it to be able to cancel the callback.
+    """
+    __slots__ = ("when_ns", "callback", "args", "cancelled")
+
+    def __init__(self, when_ns: int, callback, args: tuple):
+        self.when_ns = when_ns
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Simulator:
+    """
+    Discrete-event scheduler on a VirtualClock. Use it as a context manager: inside the with
+    block its clock is the clock of the process and the random module is seeded from `seed`.
+    Attributes:
+        clock (VirtualClock): Virtual time of the simulation.
+        rng (random.Random): Source of every random choice of the simulation.
+        events_run (int): Number of callbacks run so far.
+    """
+
+    def __init__(self, seed: int = 0, clock: VirtualClock = None):
+        """
+        :param seed: seed of the simulation (same seed, same run)
+        :param clock: virtual clock to use (by default one starting at 2024-01-01 UTC)
+        """
+        self.seed = seed
+        self.clock = clock or VirtualClock()
+        self.rng = random.Random(seed)
+        self.queue = []   # heap de (instante ns, sequência, Event)
+        self._sequence = itertools.count()
+        self.events_run = 0
+        self._saved = None
+
+    def __enter__(self) -> "Simulator":
+        # os sensores usam o módulo random: o seu estado é reposto à saída
+        self._saved = (set_clock(self.clock), random.getstate())
+        random.seed(self.rng.getrandbits(64))
+        return self
+
+    def __exit__(self, *exc):
+        previous_clock, random_state = self._saved
+        set_clock(previous_clock)
+        random.setstate(random_state)
+
+    def __len__(self) -> int:
+        return len(self.queue)
+
+    def now(self) -> float:
+        """
+        Current simulated time, in seconds (monotonic, 0 at the start).
+        """
+        return self.clock.monotonic()
+
+    def schedule_at(self, when: float, callback, *args) -> Event:
+        """
+        Schedules `callback(*args)` at simulated time `when` (seconds); events due at the
+        same time run in the order they were scheduled.
+        """
+        event = Event(max(int(when * 1e9), self.clock.now_ns), callback, args)
+        heapq.heappush(self.queue, (event.when_ns, next(self._sequence), event))
+        return event
+
+    def schedule(self, delay: float, callback, *args) -> Event:
+        """
+        Schedules `callback(*args)` `delay` seconds from now.
+        """
+        return self.schedule_at(self.clock.monotonic() + max(delay, 0.0), callback, *args)
+
+    def every(self, interval: float, callback, *args, jitter: float = 0.0, first: float = None) -> Event:
+        """
+        Runs `callback(*args)` every `interval` seconds (each period stretched or shrunk at
+        random by up to `jitter`, a fraction of the interval) until the handle is cancelled.
+        :param first: delay of the first run (defaults to one period)
+        :return: Handle whose cancel() stops the repetition.
+        """
+        handle = Event(0, callback, args)
+
+        def tick():
+            if handle.cancelled:
+                return
+            callback(*args)
+            period = interval * (1 + self.rng.uniform(-jitter, jitter)) if jitter else interval
+            self.schedule(period, tick)
+
+        self.schedule(interval if first is None else first, tick)
+        return handle
+
+    def step(self) -> bool:
+        """
+        Advances the clock to the next event and runs it.
+        :return: False if there was no event left.
+        """
+        while self.queue:
+            when_ns, _, event = heapq.heappop(self.queue)
+            if event.cancelled:
+                continue
+            self.clock.advance_to_ns(when_ns)
+            event.callback(*event.args)
+            self.events_run += 1
+            return True
+        return False
+
+    def run(self, until: float = None, max_events: int = None) -> int:
+        """
+        Runs events in time order until simulated time `until` (the clock is then left at
+        `until`), until `max_events` have run, or until there are no events left.
+        :return: Number of events run.
+        """
+        until_ns = int(until * 1e9) if until is not None else None
+        start = self.events_run
+        while self.queue and (max_events is None or self.events_run - start < max_events):
+            if until_ns is not None and self.queue[0][0] > until_ns:
+                break
+            self.step()
+        if until_ns is not None and (max_events is None or self.events_run - start < max_events):
+            self.clock.advance_to_ns(until_ns)
+        return self.events_run - start
+
+
+class SimSocket:
+    """
+    Socket-like endpoint of a SimNetwork, given to an Agent (sock=...) instead of a UDP socket.
+    """
+    __slots__ = ("network", "address")
+
+    def __init__(self, network: "SimNetwork", address: tuple):
+        self.network = network
+        self.address = address
+
+    def sendto(self, data: bytes, addr) -> int:
+        self.network.send(self.address, data, tuple(addr))
+        return len(data)
+
+    def recvfrom(self, bufsize: int):
+        raise BlockingIOError   # os datagramas são entregues pela SimNetwork
+
+    def getsockname(self) -> tuple:
+        return self.address
+
+    def getblocking(self) -> bool:
+        return False
+
+    def setblocking(self, flag: bool):
+        pass
+
+    def settimeout(self, value):
+        pass
+
+    def close(self):
+        self.network.handlers.pop(self.address, None)
+
+
+class SimNetwork:
+    """
+    Delivers datagrams between simulated endpoints after `latency` seconds, losing a
+    fraction `loss` of them at random.
+    """
+
+    def __init__(self, sim: Simulator, latency: float = 0.002, loss: float = 0.0):
+        self.sim = sim
+        self.latency = latency
+        self.loss = loss
+        self.handlers = {}   # endereço -> handler(data, endereço de origem)
+        self.counters = Counter()
+
+    def socket(self, address: tuple, handler=None) -> SimSocket:
+        """
+        Creates the endpoint `address`; datagrams sent to it are passed to handler(data, source).
+        """
+        address = tuple(address)
+        if handler is not None:
+            self.handlers[address] = handler
+        return SimSocket(self, address)
+
+    def send(self, source: tuple, data: bytes, destination: tuple):
+        self.counters["datagrams"] += 1
+        handler = self.handlers.get(destination)
+        if handler is None:
+            self.counters["undeliverable"] += 1
+            return
+        if self.loss and self.sim.rng.random() < self.loss:
+            self.counters["lost"] += 1
+            return
+        self.sim.schedule(self.latency, handler, data, source)
+
+
+class SimAgent:
+    """
+    Drives an Agent inside a simulation, as AgentHost does in real time: datagrams are
+    served when they arrive and the agent's periodic work runs at the deadline it reports.
+    """
+
+    def __init__(self, sim: Simulator, network: SimNetwork, agent):
+        self.sim = sim
+        self.agent = agent
+        self.timer = None
+        network.handlers[agent.sock.getsockname()] = self.deliver
+        self._reschedule()
+
+    def deliver(self, data: bytes, source: tuple):
+        self.agent._admit(data, source)
+        self.run()
+
+    def run(self):
+        while self.agent.serve_one():
+            pass
+        self.agent.housekeeping()
+        self._reschedule()
+
+    def _reschedule(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        timeout = self.agent._idle_timeout()
+        if timeout is not None:
+            self.timer = self.sim.schedule(timeout, self.run)
+
+
+class SimManager:
+    """
+    Manager of a simulation: sends requests and collects the replies, beacons and
+    notifications of the agents. Latencies are measured in simulated time.
+    """
+
+    def __init__(self, sim: Simulator, network: SimNetwork, address: tuple = ("10.0.0.1", 16200)):
+        self.sim = sim
+        self.protocol = Protocol()
+        self.address = tuple(address)
+        self.sock = network.socket(self.address, self.receive)
+        self.pending = {}        # message_id -> instante de envio (ns)
+        self.latency = LatencyHistogram()   # us simulados
+        self.errors = Counter()  # código de erro (por valor da resposta) -> ocorrências
+        self.counters = Counter()
+        self.beacons_from = Counter()   # id do agente -> beacons recebidos
+        self._next_id = itertools.count(1)
+
+    def request(self, destination: tuple, msg_type: str, iids: list, values: list = None):
+        message_id = f"sim{next(self._next_id):013d}"
+        data = self.protocol.encode_message(msg_type, generate_date_timestamp(), message_id, iids, values)
+        self.pending[message_id] = self.sim.clock.now_ns
+        self.counters["sent " + ("SET" if msg_type == "S" else "GET")] += 1
+        self.sock.sendto(data, destination)
+
+    def receive(self, data: bytes, source: tuple):
+        try:
+            decoded = self.protocol.decode_message(data)
+        except (LSNMPvSError, UnicodeDecodeError):
+            self.counters["undecodable"] += 1
+            return
+        if decoded["type"] == "N":
+            iids = [list(iid) for iid in decoded["iid_list"]]
+            if iids and iids[0] == [1, 1] and len(iids) == 4:
+                self.counters["beacons"] += 1
+                self.beacons_from[decoded["value_list"][0][1][0]] += 1
+            else:
+                self.counters["notifications"] += 1
+            return
+        sent_ns = self.pending.pop(decoded["message_id"], None)
+        if sent_ns is None:
+            self.counters["unmatched replies"] += 1
+            return
+        self.counters["replies"] += 1
+        self.latency.record((self.sim.clock.now_ns - sent_ns) // 1000)
+        self.errors.update(decoded["error_list"] or [0])
+
+
+def simulate_fleet(agents: int = 100, duration: float = 7 * 86400, beacon_rate: int = 60,
+                   request_rate: float = 1.0, set_ratio: float = 0.1, sensors: int = 2,
+                   actuators: int = 2, latency: float = 0.002, loss: float = 0.0, seed: int = 0,
+                   tick: float = 1.0) -> dict:
+    """
+    Simulates a fleet of agents beaconing to a manager that also polls and controls them.
+    :param duration: simulated seconds
+    :param beacon_rate: beaconRate of every agent, in seconds (0 = no beacons)
+    :param request_rate: requests per simulated second sent by the manager to the whole fleet
+    :param set_ratio: fraction of the requests that are SETs of an actuator
+    :param latency: one-way network latency, in seconds
+    :param loss: fraction of the datagrams lost
+    :param tick: resolution of the beacon scheduler, in seconds
+    :return: Summary of the run (same arguments, same summary).
+    """
+    from agent import Agent
+    from devices.sensor import Sensor
+    from devices.actuator import Actuator
+    from scheduler import BeaconScheduler
+
+    with Simulator(seed) as sim:
+        network = SimNetwork(sim, latency, loss)
+        manager = SimManager(sim, network)
+        beacons = BeaconScheduler(tick=tick, rng=random.Random(sim.rng.getrandbits(64)))
+        fleet = []
+        for n in range(agents):
+            address = (f"10.{1 + n // 65536}.{n // 256 % 256}.{n % 256}", 16100)
+            agent = Agent(host=address[0], port=address[1], sock=network.socket(address),
+                          sensors=[Sensor(f"s{i + 1}", "temperature", 0, 40) for i in range(sensors)],
+                          actuators=[Actuator(f"a{i + 1}", "light", 0, 1) for i in range(actuators)],
+                          manager_address=manager.address)
+            agent.mib.device_info["id"] = f"agent{n + 1}"
+            agent.mib.device_info["beaconRate"] = beacon_rate
+            SimAgent(sim, network, agent)
+            beacons.add_agent(agent)
+            fleet.append(agent)
+        if beacon_rate > 0:
+            sim.every(tick, beacons.run_pending)
+
+        def next_request():
+            agent = fleet[sim.rng.randrange(len(fleet))]
+            if actuators and sim.rng.random() < set_ratio:
+                index = sim.rng.randrange(actuators) + 1
+                manager.request(agent.sock.getsockname(), "S", [[3, 3, index]],
+                                [("I", [str(sim.rng.randint(0, 1))])])
+            else:
+                iids = [[1, 7]]
+                if sensors:
+                    iids.append([2, 3, sim.rng.randrange(sensors) + 1])
+                if actuators:
+                    iids.append([3, 3, sim.rng.randrange(actuators) + 1])
+                manager.request(agent.sock.getsockname(), "G", iids)
+            sim.schedule(sim.rng.expovariate(request_rate), next_request)
+
+        if request_rate > 0 and fleet:
+            sim.schedule(sim.rng.expovariate(request_rate), next_request)
+        sim.run(until=duration)
+
+        summary = {
+            "agents": agents,
+            "simulated_seconds": duration,
+            "events": sim.events_run,
+            "datagrams": network.counters["datagrams"],
+            "network_lost": network.counters["lost"],
+            "requests": manager.counters["sent GET"] + manager.counters["sent SET"],
+            "replies": manager.counters["replies"],
+            "unanswered": len(manager.pending),
+            "beacons": manager.counters["beacons"],
+            "notifications": manager.counters["notifications"],
+            "errors": {str(code): n for code, n in sorted(manager.errors.items())},
+            "latency_us": {f"p{p:g}": manager.latency.percentile(p) for p in (50, 99)},
+            "min_beacons_per_agent": min(manager.beacons_from.values(), default=0),
+            "uptime": fleet[0].mib.get_value_by_iid([1, 7]) if fleet else None,
+            "date": generate_date_timestamp(),
+        }
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--agents", type=int, default=100)
+    parser.add_argument("--days", type=float, default=7.0, help="simulated days")
+    parser.add_argument("--beacon-rate", type=int, default=60, help="seconds between beacons of each agent")
+    parser.add_argument("--request-rate", type=float, default=1.0, help="manager requests per simulated second")
+    parser.add_argument("--set-ratio", type=float, default=0.1)
+    parser.add_argument("--sensors", type=int, default=2, help="sensors per agent")
+    parser.add_argument("--actuators", type=int, default=2, help="actuators per agent")
+    parser.add_argument("--latency", type=float, default=0.002, help="one-way network latency (s)")
+    parser.add_argument("--loss", type=float, default=0.0, help="fraction of datagrams lost")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the summary to this file")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    # os agentes imprimem cada pedido: a saída é descartada durante a simulação
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        summary = simulate_fleet(args.agents, args.days * 86400, args.beacon_rate, args.request_rate,
+                                 args.set_ratio, args.sensors, args.actuators, args.latency, args.loss,
+                                 args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"simulated {args.days:g} days of {args.agents} agents in {elapsed:.1f} s "
+          f"({args.days * 86400 / elapsed:,.0f}x real time, {summary['events'] / elapsed:,.0f} events/s)")
+    for name, value in summary.items():
+        print(f"  {name:<22} {value}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
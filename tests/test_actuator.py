@@ -23,3 +23,11 @@ def test_get_state():
     assert state["allowed value range"] == (0, 5)
     assert state["status"] == 3  # campo alterado de "state" para "status"
     assert state["start_time"] is not None
+
+def test_configure_value_bumps_version_only_on_success():
+    actuator = Actuator(id="act4", type="fan", min_value=0, max_value=5)
+    assert actuator.version == 0
+    actuator.configure_value(3)
+    assert actuator.version == 1
+    actuator.configure_value(9)  # fora do intervalo
+    assert actuator.version == 1
@@ -0,0 +1,56 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from admission import AdmissionController
+from protocol import Protocol
+
+TAG = Protocol.TAG
+GET = TAG + b"G..."
+SET = TAG + b"S..."
+GARBAGE = b"garbage"
+SRC = ('10.0.0.1', 5000)
+
+class FakeClock:
+    def __init__(self): self.now = 0.0
+    def __call__(self): return self.now
+
+def test_set_is_served_before_get():
+    ac = AdmissionController()
+    assert ac.offer(GET, SRC) is None
+    assert ac.offer(GARBAGE, SRC) is None
+    assert ac.offer(SET, SRC) is None
+    assert [ac.pop()[0] for _ in range(3)] == [SET, GET, GARBAGE]
+    assert len(ac) == 0
+
+def test_full_queue_sheds_incoming_get():
+    ac = AdmissionController(max_queue_depth=2)
+    ac.offer(GET + b"1", SRC)
+    ac.offer(GET + b"2", SRC)
+    shed = ac.offer(GET + b"3", SRC)
+    assert shed == (GET + b"3", SRC, AdmissionController.SHED_QUEUE_FULL)
+    assert ac.counters["shed_queue_full"] == 1
+    assert len(ac) == 2
+
+def test_full_queue_set_evicts_newest_get():
+    ac = AdmissionController(max_queue_depth=2)
+    ac.offer(GET + b"1", SRC)
+    ac.offer(GET + b"2", SRC)
+    shed = ac.offer(SET, SRC)
+    assert shed == (GET + b"2", SRC, AdmissionController.SHED_QUEUE_FULL)
+    assert [ac.pop()[0] for _ in range(2)] == [SET, GET + b"1"]
+    assert ac.counters["queue_high_watermark"] == 2
+
+def test_per_source_rate_limit():
+    clock = FakeClock()
+    counters = {}
+    ac = AdmissionController(request_rate=1, request_burst=2, counters=counters, clock=clock)
+    assert ac.offer(GET, SRC) is None
+    assert ac.offer(GET, SRC) is None
+    assert ac.offer(GET, SRC) == (GET, SRC, AdmissionController.SHED_RATE_LIMITED)
+    # outra origem não é afetada
+    assert ac.offer(GET, ('10.0.0.2', 5000)) is None
+    clock.now += 1
+    assert ac.offer(GET, SRC) is None
+    assert counters["shed_rate_limited"] == 1
+    assert counters["admitted"] == 4
@@ -12,7 +12,8 @@ from exceptions import (
     UnknownMessageTypeError,
     IIDValueMismatchError,
     UnsupportedValueError,
-    NoDevicesRegisteredError
+    NoDevicesRegisteredError,
+    OverloadError
 )
 from devices.sensor import Sensor
 from devices.actuator import Actuator
@@ -81,11 +82,22 @@ def test_handle_request_get_with_real_sensor():
     value = int(parts[0])
     assert 0 <= value <= 100
 
+def test_get_does_not_materialize_the_whole_mib(monkeypatch):
+    agent = Agent(host='localhost', port=0, sensors=[Sensor(id="T", type="temp", min_value=0, max_value=100)],
+                  actuators=[])
+    # o estado da MIB inteira custa O(N) por IID: um GET só lê os IIDs pedidos
+    monkeypatch.setattr(agent.mib, "get_mib_state", lambda: pytest.fail("GET dumped the MIB"))
+    raw = Protocol().encode_message('G', generate_date_timestamp(), MESSAGE_ID_STR,
+                                    [IID_SENSOR_VAL, IID_SENSOR_VAL], None, None)
+    assert Protocol().decode_message(agent.handle_request(raw))['error_list'] == [0, 0]
+    agent.sock.close()
+
 def test_handle_request_set_with_dummy_mib():
     class DummyMIB:
         start_time = 0
         def get_value_by_iid(self, iid):    raise RuntimeError()
         def set_value_by_iid(self, iid, v): return ('S',['ON'])
+        def set_values_by_iid(self, pairs, atomic=False): return [None] * len(pairs)
         def register_sensor(self, s): pass
         def register_actuator(self, a): pass
 
@@ -126,6 +138,28 @@ def test_send_notification():
     assert b'S\0' in pdu
     assert b'OFF\0' in pdu
 
+def test_beacons_run_in_the_agent_loop():
+    from scheduler import BeaconScheduler
+    agent = Agent(host='localhost', port=0, manager_address=('127.0.0.1', 9999))
+    class FakeSock:
+        def __init__(self): self.sent = []
+        def sendto(self, pdu, addr): self.sent.append((pdu, addr))
+    real_sock, agent.sock = agent.sock, FakeSock()
+    now = [0.0]
+    agent.beacons = BeaconScheduler(tick=1, jitter=0, clock=lambda: now[0])
+    agent.beacons.add_agent(agent)
+    assert agent._idle_timeout() <= 1
+
+    # o SET de beaconRate (no mesmo thread) reagenda sem criar um segundo timer
+    agent.mib.set_value_by_iid([1, 3], "5")
+    agent.mib.set_value_by_iid([1, 3], "5")
+    assert len(agent.beacons.wheel) == 1
+    now[0] = 6
+    agent.housekeeping()
+    assert len(agent.sock.sent) == 1 and agent.sock.sent[0][0].startswith(TAG + b'N')
+    assert len(agent.beacons.wheel) == 1
+    real_sock.close()
+
 # —————————————————————————————————————————————————————
 #     NOVOS TESTES DE SET + GET (sem monkeypatch / valores fixos)
 # —————————————————————————————————————————————————————
@@ -258,3 +292,224 @@ def test_set_sensor_readonly_produces_error():
     resp = agent.handle_request(raw)
     dec = proto.decode_message(resp)
     assert dec['error_list'] == [UnsupportedValueError.code]
+
+
+# —————————————————————————————————————————————————————
+#     RESPOSTAS DE ERRO (templates + rate limiting)
+# —————————————————————————————————————————————————————
+
+def test_malformed_request_produces_decodable_error_reply():
+    agent = Agent(host='localhost', port=0)
+    resp = agent.handle_request(b'garbage')
+
+    dec = Protocol().decode_message(resp)
+    assert dec['type'] == 'R'
+    assert dec['message_id'] == Agent.INVALID_MESSAGE_ID
+    assert dec['iid_list'] == []
+    assert dec['error_list'] == [InvalidTagError.code]
+    assert agent.counters["error_replies"] == 1
+
+def test_non_ascii_request_produces_decoding_error_reply():
+    agent = Agent(host='localhost', port=0)
+    resp = agent.handle_request(TAG + b'G' + "T\0Olá\0".encode("utf-8") + b'\0' * 60)
+
+    dec = Protocol().decode_message(resp)
+    assert dec['error_list'] == [DecodingError.code]
+
+def test_error_replies_are_rate_limited_per_source():
+    agent = Agent(host='localhost', port=0, error_reply_rate=0, error_reply_burst=2)
+    flooder = ('10.0.0.1', 5000)
+    other = ('10.0.0.2', 5000)
+
+    replies = [agent.handle_request(b'garbage', flooder) for _ in range(5)]
+    assert all(replies[:2])
+    assert replies[2:] == [b''] * 3
+    assert agent.counters["suppressed_error_replies"] == 3
+
+    # outra origem continua a receber respostas
+    assert agent.handle_request(b'garbage', other)
+
+def test_shed_request_gets_overload_reply_with_its_message_id():
+    agent = Agent(host='localhost', port=0, max_queue_depth=1)
+    class FakeSock:
+        def __init__(self): self.sent = []
+        def sendto(self, pdu, addr): self.sent.append((pdu, addr))
+    agent.sock = FakeSock()
+
+    proto = Protocol()
+    raw = proto.encode_message(
+        msg_type='G',
+        timestamp=generate_date_timestamp(),
+        message_id=MESSAGE_ID_STR,
+        iid_list=[IID_DEV_BEACON],
+        value_list=None,
+        error_list=None
+    )
+    addr = ('127.0.0.1', 5000)
+    agent._admit(raw, addr)
+    agent._admit(raw, addr)  # fila cheia → descartado
+
+    assert len(agent.sock.sent) == 1
+    dec = proto.decode_message(agent.sock.sent[0][0])
+    assert dec['message_id'] == MESSAGE_ID_STR
+    assert dec['error_list'] == [OverloadError.code]
+    assert agent.counters["shed_queue_full"] == 1
+
+def test_subscription_sends_decodable_notification():
+    agent = Agent(host='localhost', port=0, manager_address=('127.0.0.1', 9999),
+                  notification_window=0)
+    class FakeSock:
+        def __init__(self): self.sent = []
+        def sendto(self, pdu, addr): self.sent.append((pdu, addr))
+    agent.sock = FakeSock()
+
+    agent.subscribe([IID_DEV_BEACON], "delta", 1)
+    agent.subscriptions.poll()
+    agent.mib.set_value_by_iid(IID_DEV_BEACON, "45")
+    agent.subscriptions.subscriptions[1].next_due = 0
+    agent.subscriptions.poll()
+
+    assert len(agent.sock.sent) == 2
+    dec = Protocol().decode_message(agent.sock.sent[1][0])
+    assert dec['type'] == 'N'
+    assert len(dec['message_id']) == 16
+    assert dec['iid_list'] == [IID_DEV_BEACON]
+    assert dec['value_list'] == [('I', ['45'])]
+
+def test_range_and_history_get_decode():
+    sensors = [Sensor(id=f"S{i}", type="temp", min_value=0, max_value=100) for i in range(3)]
+    agent = Agent(host='localhost', port=0, sensors=sensors)
+    proto = Protocol()
+    raw = proto.encode_message(
+        msg_type='G',
+        timestamp=generate_date_timestamp(),
+        message_id=MESSAGE_ID_STR,
+        iid_list=[[2, 3, 0, 0], [4, 1, 1]],
+        value_list=None,
+        error_list=None
+    )
+    dec = proto.decode_message(agent.handle_request(raw))
+    assert dec['error_list'] == [0, 0]
+    assert dec['value_list'][0][0] == 'I' and len(dec['value_list'][0][1]) == 3
+    # o GET ao intervalo fez uma leitura de cada sensor
+    assert dec['value_list'][1] == ('I', [str(sensors[0].current_value)])
+
+def test_atomic_set_pdu_is_all_or_nothing():
+    a1 = Actuator(id="A1", type="light", min_value=0, max_value=10)
+    a2 = Actuator(id="A2", type="light", min_value=0, max_value=10)
+    agent = Agent(host='localhost', port=0, actuators=[a1, a2], atomic_sets=True)
+
+    proto = Protocol()
+    raw = proto.encode_message(
+        msg_type='S',
+        timestamp=generate_date_timestamp(),
+        message_id=MESSAGE_ID_STR,
+        iid_list=[[3, 3, 1], [3, 3, 2]],
+        value_list=[('I', ['4']), ('I', ['40'])],
+        error_list=[]
+    )
+    dec = proto.decode_message(agent.handle_request(raw))
+    assert dec['error_list'] == [UnsupportedValueError.code, UnsupportedValueError.code]
+    assert (a1.status, a2.status) == (0, 0)
+
+def test_agent_warm_restart_from_snapshot(tmp_path):
+    path = str(tmp_path / "agent.snap")
+    a = Actuator(id="A1", type="light", min_value=0, max_value=10)
+    agent = Agent(host='localhost', port=0, actuators=[a], snapshot_path=path)
+    agent.mib.set_value_by_iid([3, 3, 1], "6")
+    agent.mib.save_snapshot(path)
+    agent.sock.close()
+
+    # o mesmo atuador passado de novo não é registado duas vezes
+    restarted = Agent(host='localhost', port=0, actuators=[Actuator(id="A1", type="light", min_value=0, max_value=10)],
+                      snapshot_path=path)
+    assert restarted.mib.device_info["nActuators"] == 1
+    assert restarted.mib.actuators._index is None   # encontrado pela posição, sem índice por id
+    assert restarted.mib.get_value_by_iid([3, 3, 1]) == 6
+
+def test_warm_restart_keeps_the_callers_devices(tmp_path):
+    from devices.drivers import SensorDriver
+    class FixedDriver(SensorDriver):
+        def read(self, sensor):
+            return 42
+    path = str(tmp_path / "agent.snap")
+    agent = Agent(host='localhost', port=0, sensors=[Sensor("s1", "temperature", 0, 100)],
+                  actuators=[Actuator(id="A1", type="light", min_value=0, max_value=10),
+                             Actuator(id="A2", type="light", min_value=0, max_value=10)], snapshot_path=path)
+    agent.mib.set_value_by_iid([3, 3, 2], "6")
+    agent.mib.save_snapshot(path)
+    agent.mib.sensor_reader.close()
+    agent.sock.close()
+
+    s = Sensor("s1", "temperature", 0, 100)
+    s.driver = FixedDriver()
+    # A2 passado noutra posição: encontrado pelo id
+    a2, a1 = Actuator(id="A2", type="light", min_value=0, max_value=10), Actuator(id="A1", type="light", min_value=0, max_value=10)
+    restarted = Agent(host='localhost', port=0, sensors=[s], actuators=[a2, a1], snapshot_path=path)
+    try:
+        assert restarted.mib.sensors["s1"] is s and restarted.mib.actuators["A2"] is a2
+        assert restarted.mib.device_info["nActuators"] == 2
+        assert a2.status == 6   # estado restaurado copiado para o objeto de quem chamou
+        assert restarted.mib.get_value_by_iid([2, 3, 1]) == 42
+        a2.configure_value(3)   # escrita feita pelo dono do objeto
+        assert restarted.mib.get_value_by_iid([3, 3, 2]) == 3
+        assert a2.version > restarted.mib.actuators["A1"].version
+    finally:
+        restarted.mib.sensor_reader.close()
+        restarted.sock.close()
+
+def test_agent_replays_set_journal(tmp_path):
+    journal = str(tmp_path / "set.journal")
+    agent = Agent(host='localhost', port=0, actuators=[Actuator(id="A1", type="light", min_value=0, max_value=10)],
+                  journal_path=journal)
+    agent.mib.set_value_by_iid([3, 3, 1], "8")
+    agent.journal.close()
+    agent.sock.close()
+
+    restarted = Agent(host='localhost', port=0, actuators=[Actuator(id="A1", type="light", min_value=0, max_value=10)],
+                      journal_path=journal)
+    assert restarted.mib.get_value_by_iid([3, 3, 1]) == 8
+
+def _set_profiling(agent, proto, mode):
+    raw = proto.encode_message(msg_type='S', timestamp=generate_date_timestamp(), message_id=MESSAGE_ID_STR,
+                               iid_list=[[1, 11]], value_list=[('I', [str(mode)])], error_list=[])
+    return proto.decode_message(agent.handle_request(raw))['error_list']
+
+@pytest.mark.parametrize("mode, extensions", [(1, {"prof", "txt"}), (2, {"folded", "txt"}), (3, {"txt"})])
+def test_profiling_session_toggled_by_set(tmp_path, mode, extensions):
+    agent = Agent(host='localhost', port=0, actuators=[Actuator(id="A1", type="light", min_value=0, max_value=10)],
+                  profile_dir=str(tmp_path))
+    proto = Protocol()
+    assert agent.profiling is None
+    assert _set_profiling(agent, proto, mode) == [0]
+    assert agent.profiling is not None
+    assert agent.mib.get_value_by_iid([1, 11]) == mode
+    raw_get = proto.encode_message(msg_type='G', timestamp=generate_date_timestamp(), message_id=MESSAGE_ID_STR,
+                                   iid_list=[[3, 1, 1]])
+    for _ in range(20):
+        agent.handle_request(raw_get)
+    assert _set_profiling(agent, proto, 0) == [0]
+    assert agent.profiling is None
+    assert list(tmp_path.iterdir()) == [] and agent._idle_timeout() == 0   # escritos fora do SET
+    agent.housekeeping()
+    assert {path.suffix[1:] for path in tmp_path.iterdir()} == extensions
+
+def test_profiling_rejects_unknown_mode_and_stops_when_expired(tmp_path):
+    agent = Agent(host='localhost', port=0, profile_dir=str(tmp_path), profile_max_seconds=0)
+    proto = Protocol()
+    assert _set_profiling(agent, proto, 9) == [UnsupportedValueError.code]
+    assert _set_profiling(agent, proto, 1) == [0]
+    assert agent._idle_timeout() == 0
+    assert agent.profiling.expired()
+    agent.housekeeping()   # para a sessão expirada e escreve os resultados
+    assert agent.profiling is None and agent.mib.get_value_by_iid([1, 11]) == 0
+    assert len(list(tmp_path.iterdir())) == 2
+
+def test_profiling_field_goes_back_to_0_when_the_session_cannot_start(tmp_path, monkeypatch):
+    from profiling import CProfileSession
+    def start(session):
+        raise ValueError("Another profiling tool is already active")
+    monkeypatch.setattr(CProfileSession, "start", start)
+    agent = Agent(host='localhost', port=0, profile_dir=str(tmp_path))
+    assert _set_profiling(agent, Protocol(), 1) == [0]
+    assert agent.profiling is None and agent.mib.get_value_by_iid([1, 11]) == 0
@@ -0,0 +1,64 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import socket
+import pytest
+from agent_host import AgentHost, clone_devices
+from devices.sensor import Sensor
+from devices.actuator import Actuator
+from protocol import Protocol
+from utils.timestamp_utils import generate_date_timestamp
+
+SENSORS = [Sensor("s1", "temperature", 0, 40)]
+ACTUATORS = [Actuator("a1", "light", 0, 1)]
+
+
+def get_device_ids(host, agents, protocol):
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    client.settimeout(2.0)
+    ids = []
+    for n, agent in enumerate(agents):
+        message_id = f"host{n:012d}"
+        client.sendto(protocol.encode_message("G", generate_date_timestamp(), message_id, [[1, 1]]),
+                      agent.sock.getsockname())
+        assert host.run_once(2.0) == 1
+        data, addr = client.recvfrom(65536)
+        reply = protocol.decode_message(data)
+        assert reply["message_id"] == message_id
+        assert addr == agent.sock.getsockname()
+        ids.append(reply["value_list"][0][1][0])
+    client.close()
+    return ids
+
+
+def test_clone_devices_shares_strings():
+    clones = clone_devices(SENSORS)
+    assert clones[0] is not SENSORS[0]
+    assert clones[0].id is SENSORS[0].id
+
+
+def test_agents_with_own_sockets():
+    host = AgentHost()
+    agents = host.spawn(3, SENSORS, ACTUATORS, host="127.0.0.1")
+    try:
+        assert len(host) == 3
+        assert get_device_ids(host, agents, Protocol()) == ["agent1", "agent2", "agent3"]
+        # cada agente tem os seus próprios dispositivos
+        assert agents[0].mib.actuators["a1"] is not agents[1].mib.actuators["a1"]
+        # mas um só leitor (e pool de threads) de sensores
+        assert all(agent.mib.sensor_reader is host.sensor_reader for agent in agents)
+    finally:
+        host.close()
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="IP_PKTINFO and 127.0.0.0/8 routing")
+def test_agents_sharing_one_socket():
+    host = AgentHost()
+    agents = host.spawn(3, SENSORS, ACTUATORS, shared_port=0, network="127.1.0.0")
+    try:
+        assert len(host.shared_sockets) == 1
+        assert [agent.sock.getsockname()[0] for agent in agents] == ["127.1.0.1", "127.1.0.2", "127.1.0.3"]
+        assert get_device_ids(host, agents, Protocol()) == ["agent1", "agent2", "agent3"]
+    finally:
+        host.close()
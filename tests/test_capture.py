@@ -0,0 +1,81 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from agent import Agent
+from capture import CaptureWriter, CaptureReader, CaptureFormatError
+from loadgen import build_template
+from replay import replay_in_process, replay_config
+
+def test_records_round_trip(tmp_path):
+    path = str(tmp_path / "traffic.cap")
+    ticks = iter(range(1000, 2000, 10))
+    writer = CaptureWriter(path, clock=lambda: next(ticks))
+    writer.record(b"first", ("127.0.0.1", 5000))
+    writer.record(b"\x00garbage\xff", ("10.0.0.2", 6000))
+    writer.record(b"", None)
+    writer.close()
+    with CaptureReader(path) as reader:
+        records = [(r.time_ns, r.addr, r.data) for r in reader]
+    assert records == [(1000, ("127.0.0.1", 5000), b"first"),
+                       (1010, ("10.0.0.2", 6000), b"\x00garbage\xff"),
+                       (1020, None, b"")]
+
+def test_partial_record_is_ignored_and_cut_before_appending(tmp_path):
+    path = str(tmp_path / "traffic.cap")
+    writer = CaptureWriter(path)
+    writer.record(b"one", ("127.0.0.1", 1))
+    writer.close()
+    with open(path, "ab") as f:
+        f.write(b"\x01\x02\x03")   # registo a meio (crash)
+    with CaptureReader(path) as reader:
+        assert [r.data for r in reader] == [b"one"]
+    writer = CaptureWriter(path)
+    writer.record(b"two", ("127.0.0.1", 1))
+    writer.close()
+    with CaptureReader(path) as reader:
+        assert [r.data for r in reader] == [b"one", b"two"]
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"not a capture at all")
+    with pytest.raises(CaptureFormatError):
+        CaptureReader(str(path))
+    with pytest.raises(CaptureFormatError):
+        CaptureWriter(str(path))
+
+def test_agent_records_and_replays(tmp_path):
+    path = str(tmp_path / "traffic.cap")
+    agent = Agent(port=0, capture_path=path)
+    head, tail = build_template(agent.protocol, "G", [[1, 1]])
+    agent._admit(head + b"abcdefgh12345678" + tail, ("127.0.0.1", 4000))
+    agent._admit(b"garbage", ("127.0.0.1", 4000))
+    agent.capture.close()
+    agent.sock.close()
+
+    replayed = Agent(port=0)
+    with CaptureReader(path) as reader:
+        result = replay_in_process(replayed, reader)
+    replayed.sock.close()
+    assert result["requests"] == {"GET": 1, "malformed": 1}
+    assert result["phases"].histograms["decode"].count == 2
+    assert result["phases"].histograms["mib read"].count == 1
+
+def test_replay_config_leaves_the_real_agent_alone(tmp_path):
+    from main import load_config
+    (tmp_path / "mib.snap").write_bytes(b"snapshot")
+    config = load_config()
+    config.update(snapshot_path=str(tmp_path / "mib.snap"), journal_path=str(tmp_path / "sets.journal"),
+                  shared_mib_name="lsnmp-real", sensor_feed=str(tmp_path / "sensors.feed"),
+                  manager_address=("127.0.0.1", 16000), capture_path=str(tmp_path / "traffic.cap"))
+    workdir = tmp_path / "replay"
+    workdir.mkdir()
+    replayed = replay_config(config, str(workdir))
+    assert replayed["snapshot_path"] == str(workdir / "mib.snap")
+    assert (workdir / "mib.snap").read_bytes() == b"snapshot"
+    assert replayed["journal_path"] == str(workdir / "sets.journal")
+    assert replayed["profile_dir"].startswith(str(workdir))
+    assert replayed["port"] == 0 and not replayed["beacons"]
+    assert replayed["shared_mib_name"] is replayed["sensor_feed"] is replayed["capture_path"] is None
+    assert replayed["manager_address"] is None and config["shared_mib_name"] == "lsnmp-real"
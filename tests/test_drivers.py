@@ -0,0 +1,79 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import pytest
+from agent import Agent
+from devices.sensor import Sensor
+from devices.drivers import SensorDriver, SensorReader, SimulatedLatencyDriver, AsyncSimulatedLatencyDriver
+from exceptions import SensorTimeoutError, SensorReadError
+from protocol import Protocol
+from utils.timestamp_utils import generate_date_timestamp
+
+class FixedDriver(SensorDriver):
+    def __init__(self, value, timeout=None):
+        super().__init__(timeout)
+        self.value = value
+    def read(self, sensor):
+        return self.value
+
+class BrokenBusDriver(SensorDriver):
+    def read(self, sensor):
+        raise OSError(5, "I/O error")
+
+def slow_sensors(count, driver):
+    sensors = [Sensor(f"s{i + 1}", "temperature", 0, 100) for i in range(count)]
+    for sensor in sensors:
+        sensor.driver = driver
+    return sensors
+
+def test_sensor_reads_through_its_driver():
+    sensor = Sensor("s1", "temperature", 0, 40)
+    sensor.driver = FixedDriver(30)
+    assert sensor.read_value() == 30
+    assert sensor.status == 75
+    assert sensor.version == 1 and len(sensor.history) == 1
+
+@pytest.mark.parametrize("driver_class", [SimulatedLatencyDriver, AsyncSimulatedLatencyDriver])
+def test_range_reads_run_concurrently(driver_class):
+    reader = SensorReader(max_workers=8)
+    sensors = slow_sensors(8, driver_class(latency=0.1, timeout=2.0))
+    start = time.perf_counter()
+    values = reader.read_many(sensors)
+    elapsed = time.perf_counter() - start
+    reader.close()
+    assert elapsed < 0.5   # 8 leituras de 0.1 s em série levariam 0.8 s
+    assert [sensor.current_value for sensor in sensors] == values
+
+def test_timed_out_read_is_an_error_code_in_the_reply():
+    sensors = slow_sensors(2, SimulatedLatencyDriver(latency=0.5, timeout=0.05))
+    sensors[1].driver = FixedDriver(10, timeout=0.05)
+    agent = Agent(host="127.0.0.1", port=0, sensors=sensors)
+    protocol = Protocol()
+    request = protocol.encode_message("G", generate_date_timestamp(), "abcdefgh12345678",
+                                      [[2, 3, 1], [2, 3, 2], [2, 3, 0, 0]])
+    start = time.perf_counter()
+    reply = protocol.decode_message(agent.handle_request(request))
+    assert time.perf_counter() - start < 0.4
+    assert reply["error_list"] == [SensorTimeoutError.code, 0, SensorTimeoutError.code]
+    assert agent.mib.sensor_reader.counters["timeouts"] == 2
+    agent.mib.sensor_reader.close()
+    agent.sock.close()
+
+@pytest.mark.parametrize("timeout", [None, 1.0])
+def test_driver_failures_are_error_codes(timeout):
+    sensors = [Sensor("s1", "temperature", 0, 40), Sensor("s2", "temperature", 0, 40), Sensor("s3", "light", 0, 40)]
+    sensors[0].driver = BrokenBusDriver(timeout)
+    sensors[1].driver = FixedDriver(21.5, timeout)
+    sensors[2].driver = FixedDriver("n/a", timeout)
+    agent = Agent(host="127.0.0.1", port=0, sensors=sensors)
+    protocol = Protocol()
+    request = protocol.encode_message("G", generate_date_timestamp(), "abcdefgh12345678",
+                                      [[2, 3, 1], [2, 3, 2], [2, 3, 3], [2, 3, 0, 0]])
+    reply = protocol.decode_message(agent.handle_request(request))
+    code = SensorReadError.code
+    assert reply["error_list"] == [code, 0, code, code]
+    assert sensors[1].current_value == 22 and sensors[1].history.count == 1
+    agent.mib.sensor_reader.close()
+    agent.sock.close()
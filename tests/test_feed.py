@@ -0,0 +1,70 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import subprocess
+import pytest
+from agent import Agent
+from devices.sensor import Sensor
+from devices.feed import SensorFeedWriter, SensorFeed, MmapFeedDriver, FeedFormatError
+from exceptions import SensorTimeoutError
+from protocol import Protocol
+from utils.timestamp_utils import generate_date_timestamp
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def test_reader_sees_the_last_sample(tmp_path):
+    path = str(tmp_path / "sensors.feed")
+    writer = SensorFeedWriter(path, ["s1", "s2"], ring_size=4)
+    with SensorFeed(path) as feed:
+        assert feed.latest("s1") is None and feed.latest("unknown") is None
+        for value in range(10):   # dá várias voltas ao anel
+            writer.write("s1", value, time_ns=1000 + value)
+        writer.write("s2", 42)
+        assert feed.latest("s1") == (9, 1009)
+        assert feed.latest("s2")[0] == 42
+        assert feed.count("s1") == 10
+    writer.close(unlink=True)
+    (tmp_path / "junk").write_bytes(b"not a feed at all, no")
+    with pytest.raises(FeedFormatError):
+        SensorFeed(str(tmp_path / "junk"))
+
+def test_reader_follows_a_recreated_feed(tmp_path):
+    path = str(tmp_path / "sensors.feed")
+    first = SensorFeedWriter(path, ["s1"])
+    first.write("s1", 5)
+    feed = SensorFeed(path)
+    assert feed.latest("s1")[0] == 5
+    second = SensorFeedWriter(path, ["s1", "s2"])
+    second.write("s2", 7)
+    assert feed.latest("s2")[0] == 7 and feed.latest("s1") is None
+    feed.close()
+    first.close()
+    second.close()
+
+def test_agent_serves_values_of_another_process(tmp_path):
+    path = str(tmp_path / "sensors.feed")
+    writer = SensorFeedWriter(path, ["s1", "s2"])
+    sensors = [Sensor("s1", "temperature", 0, 40), Sensor("s2", "humidity", 0, 100), Sensor("s3", "light", 0, 10)]
+    agent = Agent(host="127.0.0.1", port=0, sensors=sensors, sensor_feed=path)
+    try:
+        assert isinstance(sensors[0].driver, MmapFeedDriver) and sensors[2].driver is None
+        # o produtor é outro processo: escreve no ficheiro já mapeado pelo agente
+        subprocess.run([sys.executable, "-c", "import sys; sys.path.insert(0, sys.argv[1]); "
+                        "from devices.feed import SensorFeedWriter; w = SensorFeedWriter.attach(sys.argv[2]); "
+                        "w.write('s1', 30); w.write('s1', 10); w.close()", ROOT, path], check=True)
+        protocol = Protocol()
+        request = protocol.encode_message("G", generate_date_timestamp(), "abcdefgh12345678",
+                                          [[2, 3, 1], [2, 3, 2], [2, 3, 0, 0]])
+        reply = protocol.decode_message(agent.handle_request(request))
+        assert reply["error_list"] == [0, SensorTimeoutError.code, SensorTimeoutError.code]
+        assert sensors[0].current_value == 10 and sensors[0].status == 25
+        writer.write("s2", 50)
+        reply = protocol.decode_message(agent.handle_request(request))
+        assert reply["error_list"] == [0, 0, 0]
+        assert sensors[1].status == 50
+    finally:
+        agent.sensor_feed.close()
+        agent.mib.sensor_reader.close()
+        agent.sock.close()
+        writer.close()
@@ -0,0 +1,40 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import random
+from utils.histogram import LatencyHistogram
+
+def test_small_values_are_exact():
+    histogram = LatencyHistogram()
+    for value in range(1, 101):
+        histogram.record(value)
+    assert histogram.percentile(50) == 50
+    assert histogram.percentile(99) == 99
+    assert histogram.percentile(100) == 100
+    assert histogram.min == 1 and histogram.max == 100
+
+def test_large_values_within_relative_error():
+    rng = random.Random(1)
+    values = sorted(rng.randint(1, 10**7) for _ in range(10000))
+    histogram = LatencyHistogram(precision_bits=7)
+    for value in values:
+        histogram.record(value)
+    for p in (50, 90, 99, 99.9):
+        exact = values[int(len(values) * p / 100 + 0.999999) - 1]
+        assert abs(histogram.percentile(p) - exact) <= exact / 2**7
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(99) is None
+    assert histogram.mean is None
+
+def test_merge_and_serialization():
+    a, b = LatencyHistogram(), LatencyHistogram()
+    for value in range(1000):
+        a.record(value)
+        b.record(value + 1000)
+    a.merge(LatencyHistogram.from_dict(b.to_dict()))
+    assert a.count == 2000
+    assert a.min == 0 and a.max == 1999
+    assert abs(a.percentile(50) - 999) <= 999 / 2**7
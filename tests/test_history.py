@@ -0,0 +1,41 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from devices.history import SampleHistory, NS_PER_MINUTE
+
+def test_keeps_only_last_samples():
+    h = SampleHistory(capacity=4)
+    for t in range(10):
+        h.append(t, t * 10)
+    assert len(h) == 4
+    assert list(h.since(0)) == [(6, 60), (7, 70), (8, 80), (9, 90)]
+
+def test_since_returns_samples_from_timestamp():
+    h = SampleHistory(capacity=8)
+    for t in range(0, 100, 10):
+        h.append(t, t)
+    assert [v for _, v in h.since(55)] == [60, 70, 80, 90]
+    assert list(h.since(1000)) == []
+
+def test_empty_history():
+    h = SampleHistory(capacity=4)
+    assert list(h.since(0)) == []
+    assert list(h.rollups_since(0)) == []
+
+def test_minute_rollups():
+    h = SampleHistory(capacity=4, rollup_capacity=2)
+    for minute, values in enumerate([(1, 5, 3), (10, 20), (7,)]):
+        for i, v in enumerate(values):
+            h.append(minute * NS_PER_MINUTE + i, v)
+    # só cabem os dois últimos minutos
+    assert list(h.rollups_since(0)) == [
+        (1 * NS_PER_MINUTE, 10, 20, 15.0),
+        (2 * NS_PER_MINUTE, 7, 7, 7.0),
+    ]
+    assert [r[0] for r in h.rollups_since(2 * NS_PER_MINUTE + 30)] == [2 * NS_PER_MINUTE]
+
+def test_invalid_capacity():
+    with pytest.raises(ValueError):
+        SampleHistory(capacity=0)
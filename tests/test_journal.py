@@ -0,0 +1,77 @@
+# tests/test_journal.py
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from journal import SetJournal
+from l_mibvs import MIB
+from devices.actuator import Actuator
+
+
+class FakeClock:
+    def __init__(self): self.now = 0.0
+    def __call__(self): return self.now
+
+
+def test_group_commit_on_interval(tmp_path):
+    clock = FakeClock()
+    path = str(tmp_path / "set.journal")
+    journal = SetJournal(path, commit_interval=0.05, clock=clock)
+    journal.record([3, 3, 1], 5)
+    journal.record([1, 3], 30)
+    assert journal.commit_if_due() is False
+    assert os.path.getsize(path) == 0
+    assert journal.time_until_commit() == 0.05
+
+    clock.now = 0.06
+    assert journal.commit_if_due() is True
+    assert journal.commits == 1
+    assert list(SetJournal.read_records(path)) == [([3, 3, 1], "5"), ([1, 3], "30")]
+    assert journal.time_until_commit() is None
+
+def test_commit_on_byte_threshold(tmp_path):
+    journal = SetJournal(str(tmp_path / "set.journal"), commit_bytes=64, clock=FakeClock())
+    for i in range(10):
+        journal.record([3, 3, 1], i)
+    assert journal.commits >= 1
+    assert journal.buffered_bytes < 64
+
+def test_torn_tail_is_ignored_and_truncated(tmp_path):
+    path = str(tmp_path / "set.journal")
+    journal = SetJournal(path)
+    journal.record([3, 3, 1], 5)
+    journal.close()
+    with open(path, "ab") as f:
+        f.write(SetJournal.encode([([3, 3, 1], 6)])[:-2])   # escrita interrompida
+
+    journal = SetJournal(path)
+    journal.record([3, 3, 2], 7)
+    journal.commit()
+    assert list(journal.replay()) == [([3, 3, 1], "5"), ([3, 3, 2], "7")]
+
+def test_compaction_keeps_last_value_per_iid(tmp_path):
+    path = str(tmp_path / "set.journal")
+    journal = SetJournal(path, compact_bytes=1)
+    for i in range(5):
+        journal.record([3, 3, 1], i)
+        journal.record([1, 3], 10 + i)
+        journal.commit()
+        journal.wait_compaction()
+    journal.record([3, 3, 2], 9)
+    journal.commit()
+    journal.wait_compaction()
+    assert list(journal.replay()) == [([3, 3, 1], "4"), ([1, 3], "14"), ([3, 3, 2], "9")]
+
+def test_journal_as_mib_observer(tmp_path):
+    path = str(tmp_path / "set.journal")
+    mib = MIB()
+    mib.register_actuator(Actuator("a1", "light", 0, 10))
+    journal = SetJournal(path)
+    mib.add_observer(journal.record)
+    mib.set_values_by_iid([([3, 3, 1], "4"), ([1, 3], "20")])
+    journal.close()
+
+    restored = MIB()
+    restored.register_actuator(Actuator("a1", "light", 0, 10))
+    restored.set_values_by_iid(list(SetJournal.read_records(path)))
+    assert restored.get_value_by_iid([3, 3, 1]) == 4
+    assert restored.get_value_by_iid([1, 3]) == 20
@@ -4,7 +4,8 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from devices.actuator import Actuator
 from devices.sensor import Sensor
-from l_mibvs import MIB
+from l_mibvs import MIB, ActuatorRows
+from exceptions import InvalidIIDError, NoDevicesRegisteredError, UnsupportedValueError
 
 def test_register_sensor():
     mib = MIB()
@@ -117,3 +118,257 @@ def test_actuator_state_change_reflected_in_mib():
     a.configure_value(1)
 
     assert mib.get_actuator_state("a1")["status"] == 1  # valor alterado
+
+def test_sensor_history_iid():
+    mib = MIB()
+    sensor = Sensor("s1", "temperature", 0, 50)
+    mib.register_sensor(sensor)
+
+    assert mib.get_value_by_iid([4, 1, 1]) == []
+    values = [mib.get_value_by_iid([2, 3, 1]) for _ in range(3)]  # cada GET faz uma leitura
+    assert mib.get_value_by_iid([4, 1, 1]) == [v for _, v in sensor.history.since(0)]
+    assert len(mib.get_value_by_iid([4, 1, 1, 0])) == 3
+    times = mib.get_value_by_iid([4, 2, 1])
+    assert times == sorted(times) and times[0] >= 0
+    assert mib.get_value_by_iid([4, 1, 1, times[-1] + 1000]) == []
+    assert len(mib.get_value_by_iid([4, 5, 1])) == 1
+    assert mib.get_value_by_iid([4, 0]) == len(MIB.HISTORY_OBJECTS)
+
+def test_sensor_history_iid_errors():
+    mib = MIB()
+    mib.register_sensor(Sensor("s1", "temperature", 0, 50))
+    for iid in ([4, 9, 1], [4, 1, 2], [4, 1]):
+        try:
+            mib.get_value_by_iid(iid)
+            assert False
+        except InvalidIIDError:
+            pass
+
+def test_unknown_structure_raises():
+    mib = MIB()
+    try:
+        mib.get_value_by_iid([42, 1])
+        assert False
+    except InvalidIIDError:
+        pass
+
+def test_actuator_aggregates():
+    mib = MIB()
+    for i, status in enumerate([2, 8, 5, 1]):
+        a = Actuator(f"a{i}", "light", 0, 10)
+        a.configure_value(status)
+        mib.register_actuator(a)
+
+    assert mib.get_value_by_iid([6, 1]) == 4
+    assert mib.get_value_by_iid([6, 2]) == 1
+    assert mib.get_value_by_iid([6, 3, 0, 0]) == 8
+    assert mib.get_value_by_iid([6, 4]) == 4       # 16 / 4
+    assert mib.get_value_by_iid([6, 5]) == 16
+    assert mib.get_value_by_iid([6, 5, 2, 3]) == 13
+    assert mib.get_value_by_iid([6, 0]) == len(MIB.AGGREGATE_FUNCTIONS)
+
+def test_sensor_aggregates_sample_each_sensor_once():
+    mib = MIB()
+    sensors = [Sensor(f"s{i}", "temperature", 0, 50) for i in range(3)]
+    for s in sensors:
+        mib.register_sensor(s)
+    total = mib.get_value_by_iid([5, 5])
+    assert total == sum(s.status for s in sensors)
+    assert all(len(s.history) == 1 for s in sensors)
+
+def test_aggregate_errors():
+    mib = MIB()
+    assert mib.get_value_by_iid([5, 1]) == 0
+    for iid, exc in (([5, 2], NoDevicesRegisteredError), ([6, 9], InvalidIIDError), ([6, 5, 1, 3], InvalidIIDError)):
+        try:
+            mib.get_value_by_iid(iid)
+            assert False
+        except exc:
+            pass
+
+def test_filtered_actuator_read():
+    mib = MIB()
+    for i, status in enumerate([0, 3, 0, 7]):
+        a = Actuator(f"a{i}", "light", 0, 10)
+        a.configure_value(status)
+        mib.register_actuator(a)
+
+    assert mib.get_value_by_iid([8, 3, 2, 0]) == [2, 3, 4, 7]     # status != 0
+    assert mib.get_value_by_iid([8, 3, 6, 5]) == [4, 7]           # status >= 5
+    assert mib.get_value_by_iid([8, 5, 1, 10]) == [1, 10, 2, 10, 3, 10, 4, 10]
+    assert mib.get_value_by_iid([8, 3, 3, 0]) == []               # status < 0
+
+def test_filtered_sensor_read_samples_status():
+    mib = MIB()
+    sensors = [Sensor(f"s{i}", "temperature", 0, 50) for i in range(4)]
+    for s in sensors:
+        mib.register_sensor(s)
+    result = mib.get_value_by_iid([7, 3, 6, 0])
+    assert result[0::2] == [1, 2, 3, 4]
+    assert result[1::2] == [s.status for s in sensors]
+
+def test_filtered_read_errors():
+    mib = MIB()
+    for iid in ([8, 1, 1, 0], [8, 3, 9, 0], [8, 3, 1]):
+        try:
+            mib.get_value_by_iid(iid)
+            assert False
+        except InvalidIIDError:
+            pass
+
+def test_delta_read_returns_only_changed_rows():
+    mib = MIB()
+    actuators = [Actuator(f"a{i}", "light", 0, 10) for i in range(5)]
+    for a in actuators:
+        mib.register_actuator(a)
+
+    full = mib.get_value_by_iid([10, 3, 0])
+    token = full[0]
+    assert full[1:] == [1, 0, 2, 0, 3, 0, 4, 0, 5, 0]
+
+    # nada mudou: só o token volta
+    assert mib.get_value_by_iid([10, 3, token]) == [token]
+
+    mib.set_value_by_iid([3, 3, 2], "4")
+    actuators[4].configure_value(9)
+    delta = mib.get_value_by_iid([10, 3, token])
+    assert delta[0] > token
+    assert delta[1:] == [2, 4, 5, 9]
+    assert mib.get_value_by_iid([10, 3, delta[0]]) == [delta[0]]
+
+def test_delta_read_of_sensors_does_not_sample():
+    mib = MIB()
+    sensor = Sensor("s1", "temperature", 0, 50)
+    mib.register_sensor(sensor)
+    token = mib.get_value_by_iid([9, 3, 0])[0]
+    assert mib.get_value_by_iid([9, 3, token]) == [token]
+    sensor.read_value()
+    assert mib.get_value_by_iid([9, 3, token])[1:] == [1, sensor.status]
+
+def test_delta_read_of_device_fields():
+    mib = MIB()
+    token = mib.get_value_by_iid([11, 0])[0]
+    mib.set_value_by_iid([1, 3], "30")
+    delta = mib.get_value_by_iid([11, token])
+    assert delta[1:] == [3, 8]   # beaconRate e lastTimeUpdated
+    assert mib.get_value_by_iid([11, delta[0]]) == [delta[0]]
+
+def test_snapshot_is_not_affected_by_later_sets():
+    mib = MIB()
+    mib.register_actuator(Actuator("a1", "light", 0, 10))
+    mib.register_actuator(Actuator("a2", "light", 0, 10))
+    mib.set_value_by_iid([1, 3], "30")
+
+    snapshot = mib.snapshot()
+    mib.set_value_by_iid([3, 3, 1], "7")
+    mib.set_value_by_iid([1, 3], "45")
+
+    assert mib.get_value_by_iid([3, 3, 1], snapshot) == 0
+    assert mib.get_value_by_iid([3, 3, 0, 0], snapshot) == [0, 0]
+    assert mib.get_value_by_iid([1, 3], snapshot) == 30
+    assert mib.get_value_by_iid([6, 5, 1, 2], snapshot) == 0   # soma dos estados
+    # leituras sem snapshot (e um snapshot novo) veem os valores atuais
+    assert mib.get_value_by_iid([3, 3, 1]) == 7
+    assert mib.get_value_by_iid([3, 3, 1], mib.snapshot()) == 7
+    assert mib.get_value_by_iid([1, 3], mib.snapshot()) == 45
+
+def test_snapshot_is_shared_until_something_changes():
+    mib = MIB()
+    mib.register_actuator(Actuator("a1", "light", 0, 10))
+    actuator = Actuator("a2", "light", 0, 10)
+    mib.register_actuator(actuator)
+
+    first = mib.snapshot()
+    assert mib.snapshot() is first
+    mib.set_value_by_iid([3, 3, 2], "3")
+    second = mib.snapshot()
+    assert second is not first
+    # só a linha alterada é reconstruída
+    assert second.actuators[0] is first.actuators[0]
+
+    # alterações feitas diretamente no atuador também chegam ao próximo snapshot
+    actuator.configure_value(5)
+    assert mib.get_value_by_iid([3, 3, 2], mib.snapshot()) == 5
+
+def test_write_batch_publishes_once():
+    mib = MIB()
+    mib.register_actuator(Actuator("a1", "light", 0, 10))
+    mib.register_actuator(Actuator("a2", "light", 0, 10))
+    before = mib.snapshot()
+    with mib.write_batch():
+        mib.set_value_by_iid([3, 3, 1], "1")
+        assert mib._snapshot is before   # ainda não publicado
+        mib.set_value_by_iid([3, 3, 2], "2")
+    assert mib.get_value_by_iid([3, 3, 0, 0], mib.snapshot()) == [1, 2]
+
+def test_batched_set_uses_one_timestamp_and_one_version():
+    mib = MIB()
+    actuators = [Actuator(f"a{i}", "light", 0, 10) for i in range(4)]
+    for a in actuators:
+        mib.register_actuator(a)
+    before = mib.actuator_versions.value
+
+    errors = mib.set_values_by_iid([([3, 3, i], str(i)) for i in range(1, 5)])
+    assert errors == [None] * 4
+    assert [a.status for a in actuators] == [1, 2, 3, 4]
+    assert mib.actuator_versions.value == before + 1
+    assert len({a.last_control_time for a in actuators}) == 1
+    assert mib.device_info["lastTimeUpdated"] == actuators[0].last_control_time
+    assert mib.get_value_by_iid([3, 3, 0, 0], mib.snapshot()) == [1, 2, 3, 4]
+
+def test_batched_set_bumps_the_device_table_once():
+    mib = MIB()
+    mib.register_actuator(Actuator("a1", "light", 0, 10))
+    seen = []
+    mib.add_observer(lambda iid, value: seen.append((iid, value)))
+    before = mib.device_versions.value
+
+    errors = mib.set_values_by_iid([([1, 3], "7"), ([1, 6], "01:02:2025:10:00:00:000"), ([3, 3, 1], "4")])
+    assert errors == [None] * 3
+    assert mib.device_versions.value == before + 1
+    assert {mib.device_field_versions[field] for field in (3, 6, 8)} == {before + 1}
+    assert seen == [([1, 3], 7), ([1, 6], "01:02:2025:10:00:00:000"), ([3, 3, 1], 4)]
+    # sem alterações, a versão não muda
+    assert mib.set_values_by_iid([([1, 3], "7")]) == [None]
+    assert mib.device_versions.value == before + 1
+
+def test_set_rebuilds_only_the_block_of_its_actuator():
+    mib = MIB()
+    n = ActuatorRows.BLOCK_SIZE * 3 + 5
+    mib.register_many([Actuator(f"a{i}", "light", 0, 10) for i in range(n)])
+    before = mib.snapshot().actuators
+    assert len(before.blocks) == 4 and list(before) == before[:]
+    mib.set_value_by_iid([3, 3, ActuatorRows.BLOCK_SIZE + 2], "7")
+    after = mib.snapshot().actuators
+    assert after[ActuatorRows.BLOCK_SIZE + 1].status == 7 and before[ActuatorRows.BLOCK_SIZE + 1].status == 0
+    assert [a is b for a, b in zip(before.blocks, after.blocks)] == [True, False, True, True]
+    assert after[-1].id == f"a{n - 1}" and [row.id for row in after[1:3]] == ["a1", "a2"]
+    assert mib.get_value_by_iid([3, 3, 0, 0], mib.snapshot()).count(7) == 1
+
+def test_batched_set_partial_and_atomic():
+    mib = MIB()
+    a1 = Actuator("a1", "light", 0, 10)
+    a2 = Actuator("a2", "light", 0, 10)
+    mib.register_actuator(a1)
+    mib.register_actuator(a2)
+
+    # atómico: um valor inválido impede todos
+    errors = mib.set_values_by_iid([([3, 3, 1], "5"), ([3, 3, 2], "50")], atomic=True)
+    assert isinstance(errors[0], UnsupportedValueError)
+    assert isinstance(errors[1], UnsupportedValueError)
+    assert (a1.status, a2.status) == (0, 0)
+
+    # não atómico: os válidos são aplicados
+    errors = mib.set_values_by_iid([([3, 3, 1], "5"), ([3, 3, 2], "50"), ([2, 3, 1], "1")])
+    assert errors[0] is None
+    assert isinstance(errors[1], UnsupportedValueError)
+    assert isinstance(errors[2], UnsupportedValueError)
+    assert (a1.status, a2.status) == (5, 0)
+
+def test_sensor_reads_see_sensors_registered_later():
+    mib = MIB()
+    mib.register_sensor(Sensor("s1", "temp", 0, 10))
+    assert mib.get_value_by_iid([2, 1, 1]) == "s1"
+    mib.register_many([Sensor("s2", "temp", 0, 10), Sensor("s3", "hum", 0, 10)])
+    assert mib.get_value_by_iid([2, 1, 3]) == "s3"
+    assert mib.get_value_by_iid([2, 2, 2, 3]) == ["temp", "hum"]
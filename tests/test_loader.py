@@ -0,0 +1,67 @@
+# tests/test_loader.py
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import pytest
+from l_mibvs import MIB
+from devices.sensor import Sensor
+from devices.actuator import Actuator
+from devices.loader import load_devices, DeviceDefinitionError
+
+def write_jsonl(path, rows):
+    path.write_text("\n".join(json.dumps(r) for r in rows) + "\n")
+
+def test_register_many_updates_counters_once():
+    mib = MIB()
+    before = mib.device_versions.value
+    count = mib.register_many([Sensor("s1", "temp", 0, 10), Actuator("a1", "light", 0, 1),
+                               Sensor("s2", "temp", 0, 10)])
+    assert count == 3
+    assert mib.device_info["nSensors"] == 2
+    assert mib.device_info["nActuators"] == 1
+    assert mib.device_versions.value == before + 1
+    assert mib.sensors["s1"].version == mib.sensors["s2"].version
+
+def test_register_many_is_all_or_nothing():
+    mib = MIB()
+    mib.register_sensor(Sensor("s1", "temp", 0, 10))
+    with pytest.raises(ValueError):
+        mib.register_many([Sensor("s2", "temp", 0, 10), Sensor("s1", "temp", 0, 10)])
+    with pytest.raises(ValueError):
+        mib.register_many([Actuator("a1", "light", 0, 1), Actuator("a1", "light", 0, 1)])
+    assert list(mib.sensors) == ["s1"]
+    assert len(mib.actuators) == 0
+
+def test_load_jsonl_in_batches(tmp_path):
+    path = tmp_path / "devices.jsonl"
+    write_jsonl(path, [{"kind": "sensor", "id": f"s{i}", "type": "temp", "min_value": 0, "max_value": 40}
+                       for i in range(25)] +
+                      [{"kind": "actuator", "id": "a1", "type": "light", "min_value": 0, "max_value": 10}])
+    mib = MIB()
+    assert load_devices(mib, str(path), batch_size=10) == 26
+    assert mib.device_info["nSensors"] == 25
+    assert mib.get_value_by_iid([3, 5, 1]) == 10
+
+def test_load_csv(tmp_path):
+    path = tmp_path / "devices.csv"
+    path.write_text("kind,id,type,min_value,max_value\n"
+                    "actuator,a1,light,0,10\n"
+                    "sensor,s1,temp,-5,30\n")
+    mib = MIB()
+    assert load_devices(mib, str(path)) == 2
+    assert mib.get_value_by_iid([2, 4, 1]) == -5
+
+def test_invalid_rows(tmp_path):
+    path = tmp_path / "devices.jsonl"
+    write_jsonl(path, [{"kind": "sensor", "id": "s1", "type": "temp", "min_value": 0, "max_value": 40},
+                       {"kind": "lamp", "id": "x", "type": "t", "min_value": 0, "max_value": 1},
+                       {"kind": "actuator", "id": "a1", "type": "light", "min_value": 9, "max_value": 1}])
+    with pytest.raises(DeviceDefinitionError) as info:
+        load_devices(MIB(), str(path))
+    assert info.value.line == 2
+
+    errors = []
+    mib = MIB()
+    assert load_devices(mib, str(path), errors=errors) == 1
+    assert [e.line for e in errors] == [2, 3]
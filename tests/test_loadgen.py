@@ -0,0 +1,32 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import threading
+from agent import Agent
+from devices.actuator import Actuator
+from loadgen import run, report, build_template, PLACEHOLDER_ID
+from protocol import Protocol
+
+def test_template_splits_at_message_id():
+    protocol = Protocol()
+    head, tail = build_template(protocol, "G", [[1, 1]])
+    decoded = protocol.decode_message(head + b"abcdefgh12345678" + tail)
+    assert decoded["message_id"] == "abcdefgh12345678"
+    assert PLACEHOLDER_ID.encode() not in head + tail
+
+def test_run_against_agent():
+    agent = Agent(host="127.0.0.1", port=0, actuators=[Actuator("a1", "light", 0, 1)])
+    threading.Thread(target=agent.listen, daemon=True).start()
+    result = run([agent.sock.getsockname()], rate=200, duration=0.25, get_iids=[[1, 1], [9, 9]],
+                 set_pairs=[([3, 3, 1], "1")], set_ratio=0.5, ports=2, timeout=2.0)
+    counters = result["counters"]
+    assert counters["sent"] == 50
+    assert counters["sent SET"] == 25
+    assert counters["received"] == 50
+    assert counters.get("lost", 0) == 0
+    assert result["histogram"].count == 50
+    # GETs: um valor válido e um IID inválido; SETs: um valor aplicado
+    assert result["errors"] == {0: 50, 5: 25}
+    summary = report(result)
+    assert summary["errors"] == {"ok": 50, "InvalidIIDError": 25}
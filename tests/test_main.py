@@ -0,0 +1,42 @@
+# tests/test_main.py
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import pytest
+from main import load_config, main, DEFAULT_CONFIG
+
+def test_load_config_defaults():
+    assert load_config() == DEFAULT_CONFIG
+
+def test_load_config_overrides(tmp_path):
+    path = tmp_path / "agent.json"
+    path.write_text(json.dumps({"port": 0, "manager_address": ["localhost", 16200]}))
+    config = load_config(str(path))
+    assert config["port"] == 0
+    assert config["manager_address"] == ("localhost", 16200)
+    assert config["host"] == DEFAULT_CONFIG["host"]
+
+def test_load_config_rejects_unknown_options(tmp_path):
+    path = tmp_path / "agent.json"
+    path.write_text(json.dumps({"prot": 0}))
+    with pytest.raises(ValueError):
+        load_config(str(path))
+
+def test_main_check_reports_startup_time(tmp_path, capsys):
+    path = tmp_path / "agent.json"
+    path.write_text(json.dumps({"port": 0}))
+    assert main(["--config", str(path), "--check"]) == 0
+    assert "started in" in capsys.readouterr().err
+
+def test_main_check_releases_the_shared_mib(tmp_path):
+    from shared_mib import SharedMIBReader, SharedMIBError
+    name = "test_check_%d" % os.getpid()
+    path = tmp_path / "agent.json"
+    path.write_text(json.dumps({"port": 0, "shared_mib_name": name}))
+    assert main(["--config", str(path), "--check"]) == 0
+    with pytest.raises(SharedMIBError):
+        SharedMIBReader(name)
+
+def test_main_invalid_config(tmp_path):
+    assert main(["--config", str(tmp_path / "missing.json"), "--check"]) == 2
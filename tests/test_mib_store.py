@@ -0,0 +1,93 @@
+# tests/test_mib_store.py
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from l_mibvs import MIB
+from mib_store import SnapshotFormatError, LazyDeviceTable
+from devices.sensor import Sensor
+from devices.actuator import Actuator
+
+def make_mib(n=5):
+    mib = MIB()
+    for i in range(n):
+        mib.register_sensor(Sensor(f"s{i}", "temperature", 0, 40 + i))
+        mib.register_actuator(Actuator(f"a{i}", "light", 0, 10))
+    mib.set_value_by_iid([3, 3, 2], "7")
+    mib.set_value_by_iid([1, 3], "15")
+    return mib
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "mib.snap")
+    original = make_mib()
+    original.save_snapshot(path)
+
+    mib = MIB()
+    mib.load_snapshot(path)
+    assert mib.device_info["beaconRate"] == 15
+    assert mib.device_info["nSensors"] == 5
+    assert mib.device_info["nActuators"] == 5
+    assert mib.get_value_by_iid([3, 3, 0, 0]) == [0, 7, 0, 0, 0]
+    assert mib.get_value_by_iid([3, 6, 2]) == original.get_value_by_iid([3, 6, 2])
+    assert mib.get_value_by_iid([2, 5, 5]) == 44
+    assert list(mib.sensors) == [f"s{i}" for i in range(5)]
+
+def test_load_is_lazy(tmp_path):
+    path = str(tmp_path / "mib.snap")
+    make_mib(50).save_snapshot(path)
+
+    mib = MIB()
+    mib.load_snapshot(path)
+    assert isinstance(mib.actuators, LazyDeviceTable)
+    assert mib.actuators.materialized == 0
+
+    # um SET e um GET com snapshot só materializam o atuador escrito
+    mib.set_value_by_iid([3, 3, 10], "3")
+    assert mib.get_value_by_iid([3, 3, 10], mib.snapshot()) == 3
+    assert mib.get_value_by_iid([3, 3, 2], mib.snapshot()) == 7
+    assert mib.actuators.materialized == 1
+
+    # re-gravar não obriga a materializar os restantes
+    mib.save_snapshot(path)
+    assert mib.actuators.materialized == 1
+    again = MIB()
+    again.load_snapshot(path)
+    assert again.get_value_by_iid([3, 3, 10]) == 3
+
+def test_devices_registered_after_load(tmp_path):
+    path = str(tmp_path / "mib.snap")
+    make_mib(2).save_snapshot(path)
+    mib = MIB()
+    mib.load_snapshot(path)
+    mib.register_actuator(Actuator("new", "light", 0, 5))
+    with pytest.raises(ValueError):
+        mib.register_actuator(Actuator("a0", "light", 0, 5))
+    assert mib.get_value_by_iid([3, 1, 3]) == "new"
+    assert mib.device_info["nActuators"] == 3
+
+def test_invalid_snapshot_is_rejected(tmp_path):
+    path = tmp_path / "bad.snap"
+    path.write_bytes(b"not a snapshot at all, just some bytes......")
+    with pytest.raises(SnapshotFormatError):
+        MIB().load_snapshot(str(path))
+
+def test_delta_tokens_survive_a_warm_restart(tmp_path):
+    path = str(tmp_path / "mib.snap")
+    original = MIB()
+    for i in range(3):
+        original.register_actuator(Actuator(f"a{i}", "light", 0, 10))
+    token = original.get_value_by_iid([10, 3, 0])[0]
+    original.set_value_by_iid([3, 3, 2], "5")
+    before = original.get_value_by_iid([10, 3, 0])
+    device_token = original.get_value_by_iid([11, 0])[0]
+    original.save_snapshot(path)
+
+    mib = MIB()
+    mib.load_snapshot(path)
+    after = mib.get_value_by_iid([10, 3, 0])
+    assert after[0] > before[0] and after[1:] == before[1:]   # token 0: tudo, como antes do restart
+    assert mib.get_value_by_iid([10, 3, token])[1:] == [2, 5]
+    assert mib.get_value_by_iid([10, 3, before[0]])[1:] == []
+    # um token posterior ao snapshot (alterações perdidas) leva a uma ressincronização completa
+    assert mib.get_value_by_iid([10, 3, after[0] + 100])[1:] == before[1:]
+    assert mib.get_value_by_iid([11, device_token])[1:] == list(range(1, 12))
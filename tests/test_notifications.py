@@ -0,0 +1,90 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from notifications import SubscriptionManager
+from exceptions import InvalidIIDError
+
+class FakeClock:
+    def __init__(self): self.now = 0.0
+    def __call__(self): return self.now
+
+class FakeMIB:
+    def __init__(self): self.values = {}; self.reads = 0
+    def get_value_by_iid(self, iid):
+        self.reads += 1
+        if tuple(iid) not in self.values:
+            raise InvalidIIDError("unknown")
+        return self.values[tuple(iid)]
+
+MANAGER = ('127.0.0.1', 9999)
+
+def make_manager(window=0.0):
+    clock, mib, sent = FakeClock(), FakeMIB(), []
+    manager = SubscriptionManager(mib, lambda addr, iids, vals: sent.append((addr, iids, vals)),
+                                  coalesce_window=window, clock=clock)
+    return manager, mib, clock, sent
+
+def test_delta_fires_only_on_large_changes():
+    manager, mib, clock, sent = make_manager()
+    mib.values[(2, 3, 1)] = 20
+    manager.subscribe([[2, 3, 1]], "delta", 5, MANAGER)
+
+    manager.poll()                       # primeiro valor é sempre notificado
+    for value in (22, 24, 26):
+        clock.now += 1
+        mib.values[(2, 3, 1)] = value
+        manager.poll()
+    assert sent == [(MANAGER, [[2, 3, 1]], [20]), (MANAGER, [[2, 3, 1]], [26])]
+
+def test_threshold_fires_on_crossing_only():
+    manager, mib, clock, sent = make_manager()
+    manager.subscribe([[2, 3, 1]], "threshold", 50, MANAGER)
+    for value in (10, 40, 60, 70, 30):
+        mib.values[(2, 3, 1)] = value
+        manager.poll()
+        clock.now += 1
+    assert [vals for _, _, vals in sent] == [[60], [30]]
+
+def test_period_respects_interval():
+    manager, mib, clock, sent = make_manager()
+    mib.values[(1, 3)] = 60
+    manager.subscribe([[1, 3]], "period", 10, MANAGER)
+    for _ in range(25):
+        manager.poll()
+        clock.now += 1
+    assert len(sent) == 3   # t = 0, 10, 20
+
+def test_changes_within_window_are_coalesced():
+    manager, mib, clock, sent = make_manager(window=2.0)
+    mib.values[(2, 3, 1)] = 1
+    mib.values[(2, 3, 2)] = 1
+    manager.subscribe([[2, 3, 1]], "delta", 1, MANAGER, sample_interval=1)
+    manager.subscribe([[2, 3, 2]], "delta", 1, MANAGER, sample_interval=1)
+
+    manager.poll()
+    assert sent == []
+    clock.now += 1
+    mib.values[(2, 3, 1)] = 5
+    manager.poll()
+    assert sent == []
+    clock.now += 1
+    manager.poll()
+    assert sent == [(MANAGER, [[2, 3, 1], [2, 3, 2]], [5, 1])]
+    assert manager.time_until_next() == pytest.approx(1.0)   # próxima amostragem
+
+def test_shared_iids_are_sampled_once_per_poll():
+    manager, mib, clock, sent = make_manager()
+    mib.values[(2, 3, 1)] = 1
+    for _ in range(5):
+        manager.subscribe([[2, 3, 1]], "delta", 1, MANAGER)
+    manager.poll()
+    assert mib.reads == 1
+
+def test_invalid_subscription_rejected():
+    manager, _, _, _ = make_manager()
+    with pytest.raises(ValueError):
+        manager.subscribe([[1, 3]], "sometimes", 1, MANAGER)
+    with pytest.raises(ValueError):
+        manager.subscribe([[1, 3]], "period", 0, MANAGER)
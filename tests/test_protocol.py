@@ -530,3 +530,56 @@ def test_encode_notification_message():
     assert b'OFF\0' in encoded
     assert b'S\0' in encoded
 
+
+
+######################
+# TESTES DE CONTAGENS DECLARADAS
+######################
+
+def test_declared_iid_count_exceeds_message_size():
+    p = Protocol()
+    huge_iids = b"1000000\0" + b"D\0" + b"2\0" + b"1\0" + b"1\0"
+    msg = TAG + msg_type_get + timestamp + message_id + huge_iids + value_empty + error_list_empty
+    try:
+        p.decode_message(msg)
+        assert False, "Should raise DecodingError"
+    except DecodingError as e:
+        assert "Declared IID count exceeds message size." == str(e)
+
+def test_declared_value_count_exceeds_message_size():
+    p = Protocol()
+    huge_values = b"1000000\0" + b"I\0" + b"1\0" + b"42\0"
+    msg = TAG + b"R" + b"T\0" + b"5\0" + b"0\0" * 5 + message_id + iid_section + huge_values + error_list_empty
+    try:
+        p.decode_message(msg)
+        assert False, "Should raise DecodingError"
+    except DecodingError as e:
+        assert "Declared value count exceeds message size." == str(e)
+
+def test_declared_error_count_exceeds_message_size():
+    p = Protocol()
+    huge_errors = b"1000000\0" + b"1\0"
+    msg = TAG + b"R" + b"T\0" + b"5\0" + b"0\0" * 5 + message_id + iid_section + value_empty + huge_errors
+    try:
+        p.decode_message(msg)
+        assert False, "Should raise DecodingError"
+    except DecodingError as e:
+        assert "Declared error count exceeds message size." == str(e)
+
+def test_negative_iid_count_rejected():
+    p = Protocol()
+    negative_iids = b"-1\0"
+    msg = TAG + msg_type_get + timestamp + message_id + negative_iids + value_empty + error_list_empty
+    try:
+        p.decode_message(msg)
+        assert False, "Should raise DecodingError"
+    except DecodingError as e:
+        assert "Invalid IID List length format." == str(e)
+
+def test_message_too_short():
+    p = Protocol()
+    try:
+        p.decode_message(TAG + msg_type_get + b"T\0")
+        assert False, "Should raise DecodingError"
+    except DecodingError as e:
+        assert "Message too short." == str(e)
@@ -0,0 +1,162 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import contextlib
+import socket
+import threading
+import time
+import pytest
+from agent import Agent
+from agent_host import AgentHost
+from devices.sensor import Sensor
+from devices.actuator import Actuator
+from manager import ManagerClient
+from protocol import Protocol
+from proxy import ProxyAgent
+from utils.timestamp_utils import generate_date_timestamp, generate_uptime_timestamp
+
+@pytest.fixture
+def downstream():
+    # o agente imprime cada pedido: a saída é descartada
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        agent = Agent(host="127.0.0.1", port=0, sensors=[Sensor("s1", "temperature", 0, 40)],
+                      actuators=[Actuator("a1", "light", 0, 1)])
+        threading.Thread(target=agent.listen, daemon=True).start()
+        yield agent
+
+@contextlib.contextmanager
+def serving(proxy):
+    # o proxy e o socket do seu cliente servidos pelo mesmo loop, como em proxy.main()
+    host = AgentHost()
+    host.add(proxy)
+    host.watch(proxy.client.sock, proxy.client.poll)
+    try:
+        yield host
+    finally:
+        host.close()
+        proxy.close()
+
+def send(proxy, msg_type, iids, values=None, message_id="abcdefgh12345678"):
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    client.setblocking(False)
+    data = Protocol().encode_message(msg_type, generate_date_timestamp(), message_id, iids, values)
+    client.sendto(data, proxy.sock.getsockname())
+    return client
+
+def receive(host, client, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    try:
+        while time.monotonic() < deadline:
+            host.run_once(0.01)
+            try:
+                return Protocol().decode_message(client.recv(65536))
+            except BlockingIOError:
+                pass
+        return None
+    finally:
+        client.close()
+
+def request(host, proxy, msg_type, iids, values=None, timeout=2.0):
+    return receive(host, send(proxy, msg_type, iids, values), timeout)
+
+def test_gets_are_served_from_the_cache_until_the_ttl(downstream):
+    proxy = ProxyAgent(downstream.sock.getsockname(), ttl=0.2, host="127.0.0.1", port=0)
+    with serving(proxy) as host:
+        first = request(host, proxy, 'G', [[1, 1], [2, 3, 1], [2, 3, 0, 0]])
+        assert first["message_id"] == "abcdefgh12345678" and first["error_list"] == [0, 0, 0]
+        assert first["value_list"][0] == ('S', ["agent1"])
+        for _ in range(10):
+            assert request(host, proxy, 'G', [[2, 3, 1], [1, 1]])["value_list"] == first["value_list"][1::-1]
+        assert proxy.counters["downstream_gets"] == 1
+        partial = request(host, proxy, 'G', [[2, 3, 1], [3, 3, 1]])
+        assert proxy.counters["downstream_gets"] == 2 and partial["error_list"] == [0, 0]
+        time.sleep(0.25)
+        request(host, proxy, 'G', [[2, 3, 1]])
+        assert proxy.counters["downstream_gets"] == 3
+
+def test_sets_are_forwarded_and_empty_the_cache(downstream):
+    proxy = ProxyAgent(downstream.sock.getsockname(), ttl=60.0, host="127.0.0.1", port=0)
+    with serving(proxy) as host:
+        assert request(host, proxy, 'G', [[3, 3, 1]])["value_list"] == [('I', ["0"])]
+        reply = request(host, proxy, 'S', [[3, 3, 1], [3, 3, 9]], [('I', ["1"]), ('I', ["1"])])
+        assert reply["error_list"][0] == 0 and reply["error_list"][1] != 0
+        assert downstream.mib.actuators["a1"].status == 1
+        assert len(proxy.cache) == 0
+        assert request(host, proxy, 'G', [[3, 3, 1]])["value_list"] == [('I', ["1"])]
+
+def test_notifications_refresh_the_cache(downstream):
+    proxy = ProxyAgent(downstream.sock.getsockname(), ttl=60.0, host="127.0.0.1", port=0)
+    with serving(proxy) as host:
+        request(host, proxy, 'G', [[3, 3, 1], [3, 3, 0, 0]])
+        downstream.subscribe([[3, 3, 1]], "delta", 1, address=proxy.client.address, sample_interval=0.01)
+        # SET feito por outro gestor, diretamente no agente
+        other = ManagerClient(bind=("127.0.0.1", 0))
+        other.set(downstream.sock.getsockname(), [[3, 3, 1]], [('I', ["1"])])
+        other.close()
+        deadline = time.monotonic() + 2.0
+        while proxy.cache.counters["invalidations"] == 0 and time.monotonic() < deadline:
+            host.run_once(0.01)
+        reply = request(host, proxy, 'G', [[3, 3, 1], [3, 3, 0, 0]])
+        assert reply["value_list"] == [('I', ["1"]), ('I', ["1"])]
+        assert proxy.counters["downstream_gets"] == 2   # o intervalo invalidado é lido de novo
+
+def test_unanswered_downstream_leaves_the_request_unanswered():
+    silent = ManagerClient(bind=("127.0.0.1", 0))   # socket que não responde
+    proxy = ProxyAgent(silent.address, ManagerClient(timeout=0.05, retries=1), host="127.0.0.1", port=0)
+    with serving(proxy) as host:
+        assert request(host, proxy, 'G', [[1, 1]], timeout=0.5) is None
+        assert proxy.counters["downstream_timeouts"] == 1 and proxy.client.counters["retransmissions"] == 1
+        assert not proxy.requests and not proxy.inflight
+    proxy.client.close()
+    silent.close()
+
+def test_pending_misses_share_one_downstream_get():
+    downstream = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)   # agente a jusante manual
+    downstream.bind(("127.0.0.1", 0))
+    downstream.settimeout(2.0)
+    proxy = ProxyAgent(downstream.getsockname(), ttl=60.0, host="127.0.0.1", port=0)
+    with serving(proxy) as host:
+        first = send(proxy, 'G', [[2, 3, 1]], message_id="first00000000000")
+        second = send(proxy, 'G', [[1, 1], [2, 3, 1]], message_id="second0000000000")
+        deadline = time.monotonic() + 2.0
+        while proxy.counters["coalesced_misses"] == 0 and time.monotonic() < deadline:
+            host.run_once(0.01)   # não bloqueia à espera da resposta de jusante
+        assert proxy.counters["coalesced_misses"] == 1
+        protocol = Protocol()
+        data, addr = downstream.recvfrom(65536)
+        fetch = protocol.decode_message(data)
+        assert fetch["iid_list"] == [[2, 3, 1]]
+        data, addr = downstream.recvfrom(65536)
+        assert protocol.decode_message(data)["iid_list"] == [[1, 1]]
+        reply = protocol.encode_message('R', generate_uptime_timestamp(time.time()), fetch["message_id"],
+                                        [[2, 3, 1]], [('I', ["21"])], [0])
+        downstream.sendto(reply, addr)
+        assert receive(host, first)["value_list"] == [('I', ["21"])]
+        # o segundo pedido espera ainda pelo IID que pediu a jusante sozinho
+        assert proxy.cache.get([2, 3, 1]) == ('I', ["21"]) and len(proxy.requests) == 1
+    downstream.close()
+
+def test_unanswered_sets_also_empty_the_cache():
+    downstream = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)   # agente a jusante manual
+    downstream.bind(("127.0.0.1", 0))
+    downstream.settimeout(2.0)
+    proxy = ProxyAgent(downstream.getsockname(), ManagerClient(timeout=0.05, retries=0), ttl=60.0,
+                       host="127.0.0.1", port=0)
+    with serving(proxy) as host:
+        protocol = Protocol()
+        client = send(proxy, 'G', [[3, 3, 1]])
+        host.run_once(0.5)
+        data, addr = downstream.recvfrom(65536)
+        fetch = protocol.decode_message(data)
+        reply = protocol.encode_message('R', generate_uptime_timestamp(time.time()), fetch["message_id"],
+                                        [[3, 3, 1]], [('I', ["0"])], [0])
+        downstream.sendto(reply, addr)
+        assert receive(host, client)["value_list"] == [('I', ["0"])]
+        # o SET chega a jusante mas a resposta perde-se: pode ter sido aplicado
+        client = send(proxy, 'S', [[3, 3, 1]], [('I', ["1"])], message_id="set0000000000000")
+        assert receive(host, client, timeout=0.5) is None
+        downstream.recvfrom(65536)
+        assert proxy.counters["downstream_timeouts"] == 1
+        assert len(proxy.cache) == 0 and not proxy.inflight
+    downstream.close()
@@ -0,0 +1,39 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.rate_limit import TokenBucket, TokenBucketMap
+
+class FakeClock:
+    def __init__(self): self.now = 0.0
+    def __call__(self): return self.now
+
+def test_bucket_allows_burst_then_refuses():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, burst=3, clock=clock)
+    assert [bucket.consume() for _ in range(4)] == [True, True, True, False]
+
+def test_bucket_refills_over_time():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=2, clock=clock)
+    assert bucket.consume() and bucket.consume()
+    assert not bucket.consume()
+    clock.now += 0.5  # +1 token
+    assert bucket.consume()
+    assert not bucket.consume()
+
+def test_bucket_never_exceeds_burst():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=100, burst=2, clock=clock)
+    clock.now += 60
+    assert [bucket.consume() for _ in range(3)] == [True, True, False]
+
+def test_bucket_map_is_per_key_and_bounded():
+    clock = FakeClock()
+    buckets = TokenBucketMap(rate=0, burst=1, max_keys=2, clock=clock)
+    assert buckets.consume("a")
+    assert not buckets.consume("a")
+    assert buckets.consume("b")
+    assert buckets.consume("c")  # expulsa "a"
+    assert len(buckets.buckets) == 2
+    assert "a" not in buckets.buckets
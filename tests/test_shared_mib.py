@@ -0,0 +1,80 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import subprocess
+import pytest
+from agent import Agent
+from devices.sensor import Sensor
+from devices.actuator import Actuator
+from l_mibvs import MIB
+from protocol import Protocol
+from shared_mib import SharedMIBWriter, SharedMIBReader, SharedMIBError
+from utils.timestamp_utils import generate_date_timestamp
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def make_mib(sensors=2, actuators=1):
+    mib = MIB()
+    for i in range(sensors):
+        mib.register_sensor(Sensor(f"s{i + 1}", "temperature", 0, 40))
+    for i in range(actuators):
+        mib.register_actuator(Actuator(f"a{i + 1}", "light", 0, 1))
+    return mib
+
+def test_reader_sees_published_values():
+    mib = make_mib()
+    writer = SharedMIBWriter(mib)
+    try:
+        with SharedMIBReader(writer.name) as reader:
+            state = reader.read()
+            assert state["device"]["nSensors"] == 2 and state["device"]["id"] == "agent1"
+            assert state["sensors"]["s1"]["value"] is None
+            assert state["actuators"]["a1"]["status"] == 0
+
+            mib.get_value_by_iid([2, 3, 0, 0])
+            mib.set_value_by_iid([3, 3, 1], "1")
+            sequence = reader.sequence()
+            assert writer.publish() and not writer.publish()
+            assert reader.sequence() != sequence
+            state = reader.read()
+            assert state["sensors"]["s2"]["status"] == mib.sensors["s2"].status
+            assert reader.sensor_status() == [mib.sensors["s1"].status, mib.sensors["s2"].status]
+            assert reader.actuator_status() == [1]
+    finally:
+        writer.close()
+    with pytest.raises(SharedMIBError):
+        SharedMIBReader(writer.name)
+
+def test_reader_follows_segment_recreated_bigger():
+    mib = make_mib(sensors=2)
+    writer = SharedMIBWriter(mib, sensor_capacity=2)
+    try:
+        with SharedMIBReader(writer.name) as reader:
+            assert len(reader.read()["sensors"]) == 2
+            for i in range(3, 11):
+                mib.register_sensor(Sensor(f"s{i}", "humidity", 0, 100))
+            writer.publish()
+            assert list(reader.read()["sensors"]) == [f"s{i}" for i in range(1, 11)]
+    finally:
+        writer.close()
+
+def test_agent_exports_to_another_process():
+    agent = Agent(host="127.0.0.1", port=0, sensors=[Sensor("s1", "temperature", 0, 40)],
+                  actuators=[Actuator("a1", "light", 0, 1)], shared_mib_name=f"lsnmp-test-{os.getpid()}")
+    try:
+        protocol = Protocol()
+        agent.handle_request(protocol.encode_message("S", generate_date_timestamp(), "abcdefgh12345678",
+                                                     [[3, 3, 1]], [("I", ["1"])]))
+        agent.handle_request(protocol.encode_message("G", generate_date_timestamp(), "abcdefgh12345679",
+                                                     [[2, 3, 1]]))
+        agent.housekeeping()
+        code = ("import sys; sys.path.insert(0, sys.argv[1]); from shared_mib import SharedMIBReader; "
+                "r = SharedMIBReader(sys.argv[2]); s = r.read(); "
+                "print(s['actuators']['a1']['status'], s['sensors']['s1']['status']); r.close()")
+        result = subprocess.run([sys.executable, "-c", code, ROOT, agent.shared_mib.name],
+                                capture_output=True, text=True, check=True)
+        assert result.stdout.split() == ["1", str(agent.mib.sensors["s1"].status)]
+    finally:
+        agent.shared_mib.close()
+        agent.sock.close()
@@ -0,0 +1,54 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import contextlib
+import io
+import time
+from simulation import Simulator, simulate_fleet
+from utils.clock import VirtualClock, use_clock, get_clock, wall_time
+from utils.timestamp_utils import generate_uptime_timestamp
+from devices.sensor import Sensor
+from l_mibvs import MIB
+
+def test_virtual_clock_drives_timestamps_devices_and_mib():
+    clock = VirtualClock(start=1_704_067_200.0)
+    with use_clock(clock):
+        mib = MIB()
+        sensor = Sensor("s1", "temperature", 0, 40)
+        assert sensor.start_time == mib.start_time == 1_704_067_200.0
+        clock.advance(3 * 86400 + 3661.5)
+        assert generate_uptime_timestamp(mib.start_time) == "3:1:1:1:500"
+        assert mib.get_value_by_iid([1, 7]) == "3:1:1:1:500"
+    assert get_clock() is not clock
+    assert abs(wall_time() - time.time()) < 5
+
+def test_events_run_in_time_order():
+    sim = Simulator()
+    ran = []
+    sim.schedule(5, ran.append, "b")
+    sim.schedule(1, ran.append, "a")
+    sim.schedule(5, ran.append, "c")   # mesmo instante: pela ordem de agendamento
+    sim.schedule(9, ran.append, "d").cancel()
+    assert sim.run(until=10) == 3
+    assert ran == ["a", "b", "c"]
+    assert sim.now() == 10
+
+def test_every_repeats_until_cancelled():
+    sim = Simulator()
+    times = []
+    handle = sim.every(60, lambda: times.append(sim.now()))
+    sim.run(until=3600)
+    assert times == [60.0 * i for i in range(1, 61)]
+    handle.cancel()
+    sim.run(until=7200)
+    assert len(times) == 60
+
+def test_fleet_simulation_is_reproducible():
+    with contextlib.redirect_stdout(io.StringIO()):
+        first = simulate_fleet(agents=3, duration=1800, beacon_rate=60, request_rate=0.2, seed=5)
+        second = simulate_fleet(agents=3, duration=1800, beacon_rate=60, request_rate=0.2, seed=5)
+    assert first == second
+    assert first["uptime"] == "0:0:30:0:000"
+    assert first["replies"] == first["requests"] > 0
+    assert first["min_beacons_per_agent"] >= 29
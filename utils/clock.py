@@ -0,0 +1,111 @@
+import time
+from contextlib import contextmanager
+
+
+class SystemClock:
+    """
+    The real clocks of the system (the default clock of the process).
+    """
+
+    time_ns = staticmethod(time.time_ns)
+    monotonic = staticmethod(time.monotonic)
+    monotonic_ns = staticmethod(time.monotonic_ns)
+    sleep = staticmethod(time.sleep)
+    time = staticmethod(time.time)   # por último: dentro da classe, `time` passa a ser este atributo
+
+
+class VirtualClock:
+    """
+    Clock that only moves when told to (advance / advance_to), for simulations and tests.
+    Time is kept in integer nanoseconds, so a simulation is exactly reproducible however long it runs.
+    Attributes:
+        epoch_ns (int): Wall-clock time (ns since the epoch) at monotonic time 0.
+        now_ns (int): Current monotonic time, in nanoseconds.
+    """
+
+    def __init__(self, start: float = 1_704_067_200.0, monotonic: float = 0.0):
+        """
+        :param start: wall-clock time at the start, in seconds since the epoch (default 2024-01-01 UTC)
+        :param monotonic: monotonic time at the start, in seconds
+        """
+        self.now_ns = int(monotonic * 1e9)
+        self.epoch_ns = int(start * 1e9) - self.now_ns
+
+    def time(self) -> float:
+        return (self.epoch_ns + self.now_ns) / 1e9
+
+    def time_ns(self) -> int:
+        return self.epoch_ns + self.now_ns
+
+    def monotonic(self) -> float:
+        return self.now_ns / 1e9
+
+    def monotonic_ns(self) -> int:
+        return self.now_ns
+
+    def advance(self, seconds: float):
+        if seconds < 0:
+            raise ValueError("A clock cannot go backwards.")
+        self.now_ns += int(seconds * 1e9)
+
+    def advance_to(self, monotonic: float):
+        """
+        Moves the clock to a monotonic time (never backwards).
+        """
+        self.advance_to_ns(int(monotonic * 1e9))
+
+    def advance_to_ns(self, monotonic_ns: int):
+        if monotonic_ns > self.now_ns:
+            self.now_ns = monotonic_ns
+
+    # dormir num relógio virtual é só avançá-lo
+    sleep = advance
+
+
+_clock = SystemClock()
+
+
+def get_clock():
+    return _clock
+
+
+def set_clock(clock):
+    """
+    Makes `clock` the clock of the process, used by the timestamps, the devices, the MIB and
+    the default clock of the agent's components (see the functions below).
+    :return: The previous clock.
+    """
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
+
+
+@contextmanager
+def use_clock(clock):
+    """
+    Uses `clock` as the clock of the process inside a with block.
+    """
+    previous = set_clock(clock)
+    try:
+        yield clock
+    finally:
+        set_clock(previous)
+
+
+# Funções usadas em vez de time.*: leem o relógio atual em cada chamada, por isso podem ser
+# usadas como valor por omissão de parâmetros clock=... e seguem um set_clock() posterior.
+
+def wall_time() -> float:
+    return _clock.time()
+
+
+def wall_time_ns() -> int:
+    return _clock.time_ns()
+
+
+def monotonic() -> float:
+    return _clock.monotonic()
+
+
+def monotonic_ns() -> int:
+    return _clock.monotonic_ns()
@@ -0,0 +1,112 @@
+class LatencyHistogram:
+    """
+    Histogram of non-negative integer values (e.g. latencies in microseconds) with bounded
+    relative error, in the style of HdrHistogram.
+
+    Values below 2 * 2^precision_bits are counted exactly; above that, each power of two is
+    split in 2^precision_bits equal buckets, so a value is reported with a relative error of
+    at most 2^-precision_bits (under 1% with the default of 7 bits), whatever its magnitude.
+    Recording is O(1) and histograms of several threads / processes can be merged.
+    """
+
+    def __init__(self, precision_bits: int = 7):
+        """
+        :param precision_bits: log2 of the number of buckets per power of two
+        """
+        self.precision_bits = precision_bits
+        self.sub_buckets = 1 << precision_bits
+        self.counts = []
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value: int) -> int:
+        if value < 2 * self.sub_buckets:
+            return value
+        shift = value.bit_length() - self.precision_bits - 1
+        return (shift + 1) * self.sub_buckets + (value >> shift) - self.sub_buckets
+
+    def _highest_value(self, index: int) -> int:
+        """
+        Largest value counted in the bucket at `index`.
+        """
+        if index < 2 * self.sub_buckets:
+            return index
+        shift = index // self.sub_buckets - 1
+        sub = index % self.sub_buckets + self.sub_buckets
+        return ((sub + 1) << shift) - 1
+
+    def record(self, value: int, count: int = 1):
+        """
+        Counts `value` (negative values are counted as 0).
+        """
+        value = max(0, int(value))
+        index = self._index(value)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += count
+        self.count += count
+        self.total += value * count
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other: "LatencyHistogram"):
+        """
+        Adds the values counted by `other` (with the same precision) to this histogram.
+        """
+        if other.precision_bits != self.precision_bits:
+            raise ValueError("Histograms with different precisions cannot be merged.")
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, percent: float) -> int | None:
+        """
+        Value below or at which `percent` % of the recorded values are (within the precision
+        of the histogram, and never above the largest value recorded).
+        :return: The value, or None if the histogram is empty.
+        """
+        if self.count == 0:
+            return None
+        target = max(1, -(-self.count * percent // 100))   # arredondado para cima
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._highest_value(index), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float | None:
+        return self.total / self.count if self.count else None
+
+    def to_dict(self) -> dict:
+        """
+        Serializable form (only the non-empty buckets), e.g. to send it between processes.
+        """
+        return {"precision_bits": self.precision_bits, "count": self.count, "total": self.total,
+                "min": self.min, "max": self.max,
+                "buckets": {index: count for index, count in enumerate(self.counts) if count}}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        histogram = cls(data["precision_bits"])
+        buckets = {int(index): count for index, count in data["buckets"].items()}
+        histogram.counts = [0] * (max(buckets) + 1 if buckets else 0)
+        for index, count in buckets.items():
+            histogram.counts[index] = count
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
@@ -0,0 +1,70 @@
+from utils.clock import monotonic
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to `burst` tokens and refills at `rate` tokens per second.
+    Each admitted event consumes one token; events arriving with an empty bucket are refused.
+    """
+
+    def __init__(self, rate: float, burst: float, clock=monotonic):
+        """
+        :param rate: Refill rate, in tokens per second.
+        :param burst: Bucket capacity (maximum number of back-to-back events).
+        :param clock: Function returning the current time in seconds (monotonic).
+        """
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self.last_refill = clock()
+
+    def consume(self, tokens: float = 1) -> bool:
+        """
+        Tries to take `tokens` from the bucket.
+        :return: True if the event is admitted, False if it must be refused.
+        """
+        now = self.clock()
+        elapsed = now - self.last_refill
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.last_refill = now
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+
+class TokenBucketMap:
+    """
+    One TokenBucket per key (e.g. per source address), created on first use.
+    The number of tracked keys is bounded: when full, the least recently created
+    bucket is dropped, so a flood of spoofed sources cannot grow memory without limit.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 4096, clock=monotonic):
+        """
+        :param rate: Refill rate of each bucket, in tokens per second.
+        :param burst: Capacity of each bucket.
+        :param max_keys: Maximum number of buckets kept at the same time.
+        :param clock: Function returning the current time in seconds (monotonic).
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.clock = clock
+        self.buckets = {}
+
+    def consume(self, key, tokens: float = 1) -> bool:
+        """
+        Tries to take `tokens` from the bucket of `key`.
+        :return: True if the event is admitted, False if it must be refused.
+        """
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.max_keys:
+                # dicts mantêm a ordem de inserção: o primeiro é o mais antigo
+                del self.buckets[next(iter(self.buckets))]
+            bucket = TokenBucket(self.rate, self.burst, self.clock)
+            self.buckets[key] = bucket
+        return bucket.consume(tokens)
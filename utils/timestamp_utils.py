@@ -1,16 +1,16 @@
 from datetime import datetime
-import time
+from utils.clock import wall_time
 
 def generate_date_timestamp(ts: float = None) -> str:
     '''
     Generates a timestamp based on the current date and time or a given timestamp.
-    :param ts: Optional; if provided, it should be a timestamp in seconds since the epoch.
+    :param ts: Optional; if provided, it should be a timestamp in seconds since the epoch
+               (by default, the current time of the process clock, see utils.clock).
     :return: A formatted string representing the date and time in the format: day:month:year:hour:minute:second:milliseconds
     '''
     if ts is None:
-        currentDate = datetime.now()
-    else:
-        currentDate = datetime.fromtimestamp(ts)
+        ts = wall_time()
+    currentDate = datetime.fromtimestamp(ts)
 
 
     # Milliseconds are not directly available in datetime, so we calculate them
@@ -34,7 +34,8 @@ def generate_uptime_timestamp(start_time: float) -> str:
     #uses time nstead of datetime to calculate uptime since is a timestamp and not a date
 
     #elapsed_time is the total time in seconds since the start_time
-    elapsed_time = time.time() - start_time
+    now = wall_time()
+    elapsed_time = now - start_time
 
     day_seconds = 24 * 60 * 60
     hours_seconds = 60 * 60
@@ -61,7 +62,7 @@ def generate_uptime_timestamp(start_time: float) -> str:
     uptime_timestamp = f"{days}:{hours}:{minutes}:{seconds}:{milliseconds:03d}"
 
     print("\nstart_time: " + str(start_time))
-    print("\ncurrent time: " + str(time.time()))
+    print("\ncurrent time: " + str(now))
     print("\nUptime timestamp: " + uptime_timestamp)
 
     return uptime_timestamp
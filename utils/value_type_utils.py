@@ -20,7 +20,7 @@ def get_value_type_from_iid(iid: list[int]) -> Union[Type[int], Type[str], Liter
         device_map = {
             0: int, 1: str, 2: str, 3: int, 4: int,
             5: int, 6: "timestamp", 7: "timestamp",
-            8: "timestamp", 9: int, 10: int
+            8: "timestamp", 9: int, 10: int, 11: int
         }
         return device_map.get(object_id)
 
@@ -49,4 +49,18 @@ def get_value_type_from_iid(iid: list[int]) -> Union[Type[int], Type[str], Liter
             return "timestamp"
         return field.type
 
+    # SENSOR HISTORY (4.x) → listas de amostras
+    if structure == 4:
+        if object_id == 0:
+            return int
+        return "list"
+
+    # AGGREGATES (5.x sensores, 6.x atuadores) → um único inteiro
+    if structure in (5, 6):
+        return int
+
+    # FILTERED READS (7.x, 8.x) e DELTA READS (9.x, 10.x, 11.x) → listas de inteiros
+    if structure in (7, 8, 9, 10, 11):
+        return "list"
+
     return None
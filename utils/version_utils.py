@@ -0,0 +1,17 @@
+class VersionCounter:
+    """
+    Monotonically increasing version counter.
+    The MIB keeps one per table and shares it with the rows of that table: every change to a
+    row takes the next version of its table, so both the row and the table record the change.
+    """
+
+    def __init__(self, value: int = 0):
+        self.value = value
+
+    def bump(self) -> int:
+        """
+        Advances the counter.
+        :return: The new version.
+        """
+        self.value += 1
+        return self.value